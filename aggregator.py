@@ -0,0 +1,261 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import storage
+import rollup
+import archive
+import rf_analytics
+from alert_engine import AlertEngine
+from fleet import TABLE_COLUMNS
+
+AGGREGATOR_PORT = 8060
+FLEET_TOKEN = os.environ.get('FLEET_TOKEN')
+MAX_BODY_BYTES = 32 * 1024 * 1024        # ขนาด batch ที่บีบอัดแล้วสูงสุด
+MAX_DECODED_BYTES = 256 * 1024 * 1024    # ขนาดหลังคลายการบีบอัดสูงสุด (กัน gzip bomb)
+MAINTENANCE_INTERVAL = 60                # วินาทีระหว่างรอบ rollup/ลบข้อมูลเก่า
+RETENTION_HOURS = 50                     # เหมือน metrics_collector.RETENTION_HOURS
+ALERT_BATCH_ROWS = 5000                  # แถวต่อครั้งที่อ่านมาประเมินกฎแจ้งเตือน
+
+
+class BatchError(ValueError):
+    pass
+
+
+def decode_batch(body, encoding=None):
+    if encoding == 'gzip':
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        body = decoder.decompress(body, MAX_DECODED_BYTES)
+        if decoder.unconsumed_tail:
+            raise BatchError('batch too large')
+    try:
+        batch = json.loads(body)
+    except ValueError as e:
+        raise BatchError(f'invalid JSON: {e}')
+    if not isinstance(batch, dict) or not batch.get('probe_id') or not batch.get('batch_id'):
+        raise BatchError('probe_id and batch_id are required')
+    tables = batch.get('tables', {})
+    if not isinstance(tables, dict):
+        raise BatchError('tables must be an object')
+    for table, payload in tables.items():
+        if table not in TABLE_COLUMNS:
+            raise BatchError(f'unknown table {table}')
+        if not isinstance(payload, dict) or not isinstance(payload.get('columns'), list) \
+                or not isinstance(payload.get('rows'), list):
+            raise BatchError(f'{table}: columns and rows must be lists')
+        columns = payload['columns']
+        if not all(isinstance(column, str) for column in columns) or len(set(columns)) != len(columns):
+            raise BatchError(f'{table}: columns must be distinct names')
+        unknown = set(columns) - set(TABLE_COLUMNS[table])
+        if unknown:
+            raise BatchError(f"unknown column(s) for {table}: {', '.join(sorted(unknown))}")
+        for row in payload['rows']:
+            if not isinstance(row, list) or len(row) != len(columns):
+                raise BatchError(f'{table}: every row must have {len(columns)} values')
+    return batch
+
+
+# เขียน batch ทั้งก้อนใน transaction เดียว ทุกแถวติด probe_id
+# batch_id ที่เคยรับแล้วถูกข้าม (collector ส่งซ้ำได้เมื่อไม่ได้รับคำตอบ) คืนค่า (จำนวนแถว, ซ้ำหรือไม่)
+# ค่าที่ฐานข้อมูลไม่รับ (เช่น list ในช่องข้อมูล) เป็น BatchError ให้ probe แยก batch ไว้แทนการส่งซ้ำไม่รู้จบ
+def ingest_batch(batch, path=None):
+    probe_id = str(batch['probe_id'])
+    now = int(time.time())
+    tables = batch.get('tables', {})
+    total = sum(len(payload['rows']) for payload in tables.values())
+
+    def _write():
+        with storage.transaction(path) as conn:
+            inserted = conn.execute(
+                'INSERT OR IGNORE INTO ingest_batches (probe_id, batch_id, received_at, rows) VALUES (?, ?, ?, ?)',
+                (probe_id, str(batch['batch_id']), now, total)).rowcount
+            if not inserted:
+                return 0, True
+            for table, payload in tables.items():
+                columns = list(payload['columns']) + ['probe_id']
+                sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+                conn.executemany(sql, (list(row) + [probe_id] for row in payload['rows']))
+            # batch ที่ค้างใน spool ของ probe มาถึงหลัง bucket ปิดไปแล้ว: ให้ run_rollups คำนวณ bucket นั้นใหม่
+            metrics = tables.get('network_metrics')
+            if metrics and 'ts' in metrics['columns']:
+                ts_index = metrics['columns'].index('ts')
+                rollup.mark_dirty(conn, (row[ts_index] for row in metrics['rows']), now - RETENTION_HOURS * 3600)
+            conn.execute('''
+                INSERT INTO probes (probe_id, hostname, first_seen, last_seen, batches, rows) VALUES (?, ?, ?, ?, 1, ?)
+                ON CONFLICT (probe_id) DO UPDATE SET
+                    hostname = excluded.hostname, last_seen = excluded.last_seen,
+                    batches = batches + 1, rows = rows + excluded.rows
+            ''', (probe_id, batch.get('hostname'), now, now, total))
+            return total, False
+    try:
+        return storage.with_retry(_write)
+    except (sqlite3.IntegrityError, sqlite3.ProgrammingError, OverflowError) as e:
+        raise BatchError(f'rejected by database: {e}')
+
+
+class IngestHandler(BaseHTTPRequestHandler):
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path != '/ingest':
+            self._reply(404, {'error': 'not found'})
+            return
+        if FLEET_TOKEN and self.headers.get('Authorization') != f'Bearer {FLEET_TOKEN}':
+            self._reply(401, {'error': 'unauthorized'})
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        if length > MAX_BODY_BYTES:
+            self._reply(413, {'error': 'batch too large'})
+            return
+        body = self.rfile.read(length)
+        start = time.perf_counter()
+        try:
+            batch = decode_batch(body, self.headers.get('Content-Encoding'))
+            rows, duplicate = ingest_batch(batch, self.server.db_path)
+        except BatchError as e:
+            self._reply(400, {'error': str(e)})
+            return
+        self.server.record(rows, duplicate, time.perf_counter() - start)
+        self._reply(200, {'rows': rows, 'duplicate': duplicate})
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._reply(200, self.server.stats())
+        elif self.path == '/probes':
+            rows = storage.query('SELECT probe_id, hostname, first_seen, last_seen, batches, rows FROM probes ORDER BY probe_id',
+                                 (), self.server.db_path)
+            self._reply(200, [dict(zip(['probe_id', 'hostname', 'first_seen', 'last_seen', 'batches', 'rows'], row))
+                              for row in rows])
+        else:
+            self._reply(404, {'error': 'not found'})
+
+    def log_message(self, format, *args):
+        pass
+
+
+class AggregatorServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, db_path=None):
+        super().__init__(address, IngestHandler)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.duplicates = 0
+        self.rows = 0
+        self.write_seconds = 0.0
+
+    def record(self, rows, duplicate, seconds):
+        with self._lock:
+            self.batches += 1
+            self.duplicates += int(duplicate)
+            self.rows += rows
+            self.write_seconds += seconds
+
+    def stats(self):
+        with self._lock:
+            return {
+                'batches': self.batches,
+                'duplicates': self.duplicates,
+                'rows': self.rows,
+                'rows_per_second_written': self.rows / self.write_seconds if self.write_seconds else 0.0,
+            }
+
+
+# ประเมินกฎแจ้งเตือนกับแถวใหม่จาก probe (probe ไม่ได้ส่งตาราง alerts มา incident ของ fleet จึงเกิดที่นี่)
+# แถวของ collector ในเครื่องนี้ (probe_id เป็น NULL) เป็นหน้าที่ของ AlertEngine ใน metrics_collector
+def run_alerts(engine, path=None):
+    state = storage.query_one("SELECT last_id FROM alert_state WHERE name = 'fleet'", (), path)
+    last_id = state[0] if state else 0
+    columns = ['id', 'ts', 'ssid', 'probe_id'] + sorted({rule.column for rule in engine.rules})
+    processed = 0
+    while True:
+        rows = storage.query(f'''
+            SELECT {', '.join(columns)} FROM network_metrics
+            WHERE id > ? AND probe_id IS NOT NULL ORDER BY id LIMIT ?
+        ''', (last_id, ALERT_BATCH_ROWS), path)
+        if not rows:
+            return processed
+        for row in rows:
+            for event, incident in engine.process(dict(zip(columns, row))):
+                engine.on_event(event, incident)
+        last_id = rows[-1][0]
+        processed += len(rows)
+        # เขียน incident ก่อนแล้วจึงเลื่อน last_id (ถ้าหยุดระหว่างนั้นแถวชุดนี้ถูกประเมินซ้ำ ไม่หาย)
+        engine.flush()
+        storage.execute_write('INSERT OR REPLACE INTO alert_state (name, last_id) VALUES (?, ?)', ('fleet', last_id), path)
+        if len(rows) < ALERT_BATCH_ROWS:
+            return processed
+
+
+# rollup, alert และย้ายข้อมูลดิบเก่าของทั้ง fleet ไป archive (ฝั่ง aggregator ไม่มี collector มาทำให้)
+# alert_engine ควรเป็นตัวเดิมทุกรอบ (นับ sample ที่เกินติดกันข้ามรอบ) ถ้าไม่ระบุจะสร้างใหม่จาก incident ที่เปิดอยู่
+def run_maintenance(path=None, archive_dir=None, alert_engine=None):
+    rollup.run_rollups(path=path)
+    if alert_engine is None:
+        alert_engine = AlertEngine(path=path)
+        alert_engine.load_open()
+    run_alerts(alert_engine, path)
+    rf_analytics.update(path)
+    archive.compact(path=path, archive_dir=archive_dir, retention_hours=RETENTION_HOURS)
+    cutoff = int(time.time()) - RETENTION_HOURS * 3600
+
+    def _delete():
+        with storage.transaction(path) as conn:
+            conn.execute('DELETE FROM ssids WHERE last_seen < ?', (cutoff,))
+            conn.execute('DELETE FROM ingest_batches WHERE received_at < ?', (cutoff,))
+    storage.with_retry(_delete)
+    rollup.delete_old_rollups(path=path)
+    rf_analytics.delete_old(path=path)
+
+
+def _maintenance_loop(path, archive_dir, stop):
+    alert_engine = None
+    while not stop.wait(MAINTENANCE_INTERVAL):
+        try:
+            if alert_engine is None:
+                alert_engine = AlertEngine(path=path)
+                alert_engine.load_open()
+            run_maintenance(path, archive_dir, alert_engine)
+        except Exception as e:
+            print(f"Aggregator maintenance error: {e}")
+
+
+# python aggregator.py [--port 8060] [--db fleet.db]
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Central ingest endpoint for fleet probes')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=AGGREGATOR_PORT)
+    parser.add_argument('--db', help='database path (default: WIFI_DB_PATH or network_metrics.db)')
+    parser.add_argument('--archive-dir', help='Parquet archive for aged rows (default: WIFI_ARCHIVE_DIR or ./archive)')
+    args = parser.parse_args(argv)
+
+    storage.setup_database(args.db)
+    server = AggregatorServer((args.host, args.port), args.db)
+    stop = threading.Event()
+    threading.Thread(target=_maintenance_loop, args=(args.db, args.archive_dir, stop), name='aggregator-maintenance', daemon=True).start()
+    print(f"Aggregator listening on http://{args.host}:{args.port}/ingest")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,238 @@
+import datetime
+import queue
+import threading
+import time
+from collections import namedtuple
+
+import storage
+
+FLUSH_INTERVAL = 5.0   # วินาทีระหว่างการเขียน incident ที่เปลี่ยนลงฐานข้อมูล (ทุกตัวใน transaction เดียว)
+MAX_QUEUE = 1000       # แถวที่รอประเมินได้
+
+# กฎหนึ่งข้อ: เปิด incident เมื่อค่าเกิน threshold ติดกัน for_samples ครั้ง และปิดเมื่อค่ากลับมาผ่าน clear (hysteresis)
+# ถ้าเกินอีกภายใน cooldown วินาทีหลังปิด จะเปิด incident เดิมต่อแทนการสร้างแถวใหม่
+# op: 'gt' = ค่ามากเกินไป, 'lt' = ค่าน้อยเกินไป / scale, unit ใช้แสดงผล
+AlertRule = namedtuple('AlertRule', ['name', 'column', 'op', 'threshold', 'clear', 'for_samples', 'cooldown',
+                                     'label', 'scale', 'unit'])
+
+# หน่วยเดียวกับคอลัมน์ใน network_metrics (latency วินาที, packet_loss สัดส่วน, download_speed bps, bandwidth %)
+DEFAULT_RULES = [
+    AlertRule('high_latency', 'latency', 'gt', 0.2, 0.15, 2, 600, 'Latency', 1000, ' ms'),
+    AlertRule('packet_loss', 'packet_loss', 'gt', 0.05, 0.01, 2, 600, 'Packet loss', 100, '%'),
+    AlertRule('low_download', 'download_speed', 'lt', 5e6, 10e6, 1, 1800, 'Download speed', 1e-6, ' Mbps'),
+    AlertRule('high_utilization', 'bandwidth', 'gt', 90, 70, 3, 600, 'Bandwidth utilization', 1, '%'),
+    AlertRule('device_count', 'device_count', 'gt', 50, 45, 1, 1800, 'Device count', 1, ''),
+]
+
+INSERT_ALERT_SQL = '''
+    INSERT INTO alerts (timestamp, ts, alert_message, rule, ssid, probe_id, state, value, samples, last_ts, resolved_ts)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+UPDATE_ALERT_SQL = '''
+    UPDATE alerts SET alert_message = ?, state = ?, value = ?, samples = ?, last_ts = ?, resolved_ts = ?
+    WHERE id = ?
+'''
+
+
+def _format(rule, value):
+    return f'{value * rule.scale:.4g}{rule.unit}'
+
+
+# เหตุการณ์หนึ่งครั้งของกฎหนึ่งข้อบน SSID หนึ่งของ probe หนึ่ง (หนึ่งแถวในตาราง alerts, probe_id None = เครื่องนี้)
+class Incident:
+    __slots__ = ('rule', 'ssid', 'probe_id', 'row_id', 'opened_ts', 'last_ts', 'value', 'samples', 'state',
+                 'resolved_ts')
+
+    def __init__(self, rule, ssid, opened_ts, value, samples, row_id=None, probe_id=None):
+        self.rule = rule
+        self.ssid = ssid
+        self.probe_id = probe_id
+        self.row_id = row_id
+        self.opened_ts = opened_ts
+        self.last_ts = opened_ts
+        self.value = value
+        self.samples = samples
+        self.state = 'open'
+        self.resolved_ts = None
+
+    def message(self):
+        direction = 'above' if self.rule.op == 'gt' else 'below'
+        label = f'{self.probe_id}/{self.ssid}' if self.probe_id else self.ssid
+        return (f'[{label}] {self.rule.label} {direction} {_format(self.rule, self.rule.threshold)} '
+                f'(worst {_format(self.rule, self.value)}, {self.samples} sample(s))')
+
+
+# ประเมินแต่ละแถวของ network_metrics ครั้งเดียวฝั่ง collector (ไม่ขึ้นกับจำนวน tab ของ dashboard)
+# แล้วเขียนเฉพาะ incident ที่เปลี่ยนเป็น batch: ตาราง alerts จึงโตตามจำนวนเหตุการณ์ ไม่ใช่จำนวนครั้งที่เปิดหน้า
+class AlertEngine:
+    def __init__(self, rules=DEFAULT_RULES, flush_interval=FLUSH_INTERVAL, max_queue=MAX_QUEUE, path=None,
+                 on_event=None):
+        self.rules = list(rules)
+        self.flush_interval = flush_interval
+        self.path = path
+        self.on_event = on_event or (lambda event, incident: print(f"Alert {event}: {incident.message()}"))
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._breaches = {}    # (rule, probe_id, ssid) -> จำนวน sample ที่เกินติดกันก่อนเปิด incident
+        self._incidents = {}   # (rule, probe_id, ssid) -> incident ล่าสุด (เปิดอยู่ หรือปิดแล้วแต่ยังใช้ตรวจ cooldown)
+        self._dirty = {}       # id(incident) -> incident ที่ต้องเขียน
+        self._stop = threading.Event()
+        self._thread = None
+        self.dropped_rows = 0
+        self.written = 0
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    # โหลด incident ที่ยังเปิดอยู่จากฐานข้อมูล (restart แล้วไม่เปิดซ้ำ)
+    def load_open(self):
+        rules = {rule.name: rule for rule in self.rules}
+        rows = storage.query("SELECT id, rule, ssid, probe_id, ts, last_ts, value, samples FROM alerts WHERE state = 'open'",
+                             (), self.path)
+        for row_id, name, ssid, probe_id, opened_ts, last_ts, value, samples in rows:
+            if name not in rules:
+                continue
+            incident = Incident(rules[name], ssid, opened_ts, value, samples or 0, row_id, probe_id)
+            incident.last_ts = last_ts or opened_ts
+            self._incidents[(name, probe_id, ssid)] = incident
+        return len(rows)
+
+    def _mark(self, incident):
+        self._dirty[id(incident)] = incident
+
+    # ประเมินแถวหนึ่งแถว คืนค่า list ของ (event, incident) โดย event เป็น 'opened', 'reopened' หรือ 'resolved'
+    def process(self, row):
+        ssid = row.get('ssid') or 'unknown'
+        probe_id = row.get('probe_id')
+        ts = row['ts']
+        events = []
+        for rule in self.rules:
+            value = row.get(rule.column)
+            if value is None:
+                continue
+            key = (rule.name, probe_id, ssid)
+            if rule.op == 'gt':
+                breach, cleared = value > rule.threshold, value < rule.clear
+            else:
+                breach, cleared = value < rule.threshold, value > rule.clear
+            incident = self._incidents.get(key)
+
+            if incident is not None and incident.state == 'open':
+                if breach:
+                    incident.samples += 1
+                    incident.last_ts = ts
+                    incident.value = max(incident.value, value) if rule.op == 'gt' else min(incident.value, value)
+                    self._mark(incident)
+                elif cleared:
+                    incident.state = 'resolved'
+                    incident.resolved_ts = ts
+                    self._mark(incident)
+                    events.append(('resolved', incident))
+                # ค่าอยู่ระหว่าง threshold กับ clear: คงสถานะเดิม
+                continue
+
+            if not breach:
+                self._breaches.pop(key, None)
+                continue
+            count = self._breaches.get(key, 0) + 1
+            if count < rule.for_samples:
+                self._breaches[key] = count
+                continue
+            self._breaches.pop(key, None)
+
+            if incident is not None and ts - incident.resolved_ts < rule.cooldown:
+                incident.state = 'open'
+                incident.resolved_ts = None
+                incident.samples += count
+                incident.last_ts = ts
+                incident.value = max(incident.value, value) if rule.op == 'gt' else min(incident.value, value)
+                events.append(('reopened', incident))
+            else:
+                incident = self._incidents[key] = Incident(rule, ssid, ts, value, count, probe_id=probe_id)
+                events.append(('opened', incident))
+            self._mark(incident)
+        return events
+
+    def open_incidents(self):
+        return [incident for incident in self._incidents.values() if incident.state == 'open']
+
+    # เขียน incident ที่เปลี่ยนทั้งหมดใน transaction เดียว (แถวใหม่ INSERT, แถวเดิม UPDATE)
+    def flush(self):
+        dirty, self._dirty = list(self._dirty.values()), {}
+        if not dirty:
+            return 0
+
+        def _write():
+            inserted = []
+            with storage.transaction(self.path) as conn:
+                for incident in dirty:
+                    message = incident.message()
+                    if incident.row_id is None:
+                        timestamp = datetime.datetime.fromtimestamp(incident.opened_ts, datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+                        cursor = conn.execute(INSERT_ALERT_SQL, (
+                            timestamp, incident.opened_ts, message, incident.rule.name, incident.ssid, incident.probe_id,
+                            incident.state, incident.value, incident.samples, incident.last_ts, incident.resolved_ts))
+                        inserted.append((incident, cursor.lastrowid))
+                    else:
+                        conn.execute(UPDATE_ALERT_SQL, (message, incident.state, incident.value, incident.samples,
+                                                        incident.last_ts, incident.resolved_ts, incident.row_id))
+            return inserted
+
+        try:
+            inserted = storage.with_retry(_write)
+        except Exception:
+            # เขียนไม่สำเร็จ เก็บไว้เขียนรอบหน้า
+            for incident in dirty:
+                self._dirty.setdefault(id(incident), incident)
+            raise
+        # กำหนด id หลัง commit สำเร็จเท่านั้น (ถ้า retry ทั้ง transaction จะไม่ได้ id ของรอบที่ rollback)
+        for incident, row_id in inserted:
+            incident.row_id = row_id
+        self.written += len(dirty)
+        return len(dirty)
+
+    # ส่งแถวเข้าคิว (ไม่บล็อกรอบการเก็บข้อมูล)
+    def submit(self, row):
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            self.dropped_rows += 1
+            return False
+
+    def start(self):
+        if self._thread is None:
+            self.load_open()
+            self._thread = threading.Thread(target=self._run, name='alert-engine', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        # ปลุก thread ที่รออยู่ใน get() ให้เขียนรอบสุดท้ายทันที ไม่ต้องรอครบ flush_interval (คิวเต็มแปลว่า get() ไม่ได้รออยู่)
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        deadline = time.monotonic() + self.flush_interval
+        while not self._stop.is_set() or not self._queue.empty():
+            try:
+                row = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                for event, incident in self.process(row) if row is not None else ():
+                    self.on_event(event, incident)
+            except queue.Empty:
+                pass
+            except Exception as e:
+                print(f"Alert engine error: {e}")
+            if time.monotonic() >= deadline or self._stop.is_set():
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"Error writing alerts: {e}")
+                deadline = time.monotonic() + self.flush_interval
+        storage.close_connection()
@@ -1,104 +1,257 @@
-import sqlite3
 import dash
-from dash import dcc, html
+from dash import dcc, html, Patch, ctx
+from flask import Response, g, request
 import plotly.graph_objs as go
 import pandas as pd
 import dash_bootstrap_components as dbc
 from dash.dependencies import Input, Output, State
-import requests
-from ddos_detection import *
+import time
+import psutil
+import storage
+import rollup
+from query_cache import QueryCache
+import figure_builder
+import push
+import tracing
+import isp
+import rf_analytics
+
+# ข้อมูลดิบเก็บไว้กี่ชั่วโมง และ collector เขียนทุกกี่วินาที (ตรงกับ metrics_collector.py)
+RAW_RETENTION = 50 * 3600
+RAW_INTERVAL = 60
+
+# จำนวนจุดสูงสุดต่อเส้นที่ยอมส่งไปที่เบราว์เซอร์ ใช้เลือก tier ของ rollup
+MAX_POINTS_PER_TRACE = 2500
+
+# เขตเวลาที่ใช้แสดงบนกราฟ (เหมือนเวลาที่ collector บันทึก)
+DISPLAY_TZ = 'Asia/Bangkok'
+
+# ช่วงเวลาที่เลือกได้บน dashboard (วินาที)
+TIME_RANGES = [
+    {'label': 'Last 1 hour', 'value': 3600},
+    {'label': 'Last 6 hours', 'value': 6 * 3600},
+    {'label': 'Last 24 hours', 'value': 24 * 3600},
+    {'label': 'Last 7 days', 'value': 7 * 24 * 3600},
+    {'label': 'Last 30 days', 'value': 30 * 24 * 3600},
+    {'label': 'Last 365 days', 'value': 365 * 24 * 3600},
+]
+DEFAULT_TIME_RANGE = 24 * 3600
+
+# cache ผลลัพธ์ query ใช้ร่วมกันทุก tab: collector เขียนทุก RAW_INTERVAL วินาที
+# tab ที่เปิดพร้อมกันได้ key เดียวกันภายในช่วง TTL
+QUERY_CACHE_TTL = 10
+QUERY_CACHE_SIZE = 256
+query_cache = QueryCache(ttl=QUERY_CACHE_TTL, maxsize=QUERY_CACHE_SIZE)
+
+# วาดกราฟใหม่ทั้งรูปทุกกี่วินาที เพื่อตัดจุดที่หลุดออกจากช่วงเวลาทิ้ง (ระหว่างนั้นส่งเฉพาะจุดใหม่)
+FULL_REDRAW_INTERVAL = 10 * 60
+
+# ข้อมูลใหม่ถูก push ผ่าน /events (SSE) ทันทีที่ collector เขียน การ poll เหลือไว้เป็นทางสำรองเท่านั้น
+FALLBACK_POLL_INTERVAL = 60
+
+# จำนวนแถวต่อหน้าของประวัติการแจ้งเตือน
+ALERT_HISTORY_PAGE_SIZE = 20
+
+# heatmap ช่องสัญญาณ: ช่วงเวลาที่ยาวกว่านี้ใช้ช่องละหนึ่งวันแทนหนึ่งชั่วโมง / จำนวน AP ข้างเคียงที่แสดง
+RF_DAILY_AFTER = 14 * 24 * 3600
+RF_NEIGHBOUR_ROWS = 50
+push_broker = push.PushBroker()
 
 # สร้างแอป Dash
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.CYBORG])
 
-# ฟังก์ชันดึงข้อมูล ISP
+# ข้อมูล ISP ดึงใน background (มี timeout และ cache บนดิสก์) หน้าเว็บไม่ต้องรอ
+isp_lookup = isp.IspInfo()
+
 def get_isp_info():
-    try:
-        response = requests.get("https://ipinfo.io/json")
-        data = response.json()
-        return {
-            "ip": data.get("ip", "N/A"),
-            "isp": data.get("org", "N/A"),
-            "city": data.get("city", "N/A"),
-            "country": data.get("country", "N/A")
-        }
-    except Exception as e:
-        return {"ip": "N/A", "isp": "N/A", "city": "N/A", "country": "N/A"}
+    return isp_lookup.get()
+
+# แปลงค่าจาก dropdown SSID (ค่าเดียวหรือ list) เป็น list โดย 'All' หมายถึงไม่กรอง
+def normalize_ssids(ssid_filter):
+    ssids = [ssid_filter] if isinstance(ssid_filter, str) else list(ssid_filter or [])
+    return [] if 'All' in ssids else ssids
 
 # ฟังก์ชันดึงข้อมูลจาก SQLite
-def get_data_from_db(ssid_filter=None):
-    conn = sqlite3.connect('network_metrics.db')
+# ไม่จำกัดจำนวนแถว: ช่วงเวลาถูกจำกัดด้วย since (ไม่ระบุ = เท่าที่ข้อมูลดิบยังเก็บอยู่)
+# ช่วงที่ยาวกว่านั้นใช้ rollup (pick_graph_tier) และ figure_builder ลดจำนวนจุดตามความกว้างกราฟเอง
+def get_data_from_db(ssid_filter=None, since=None, probe_filter=None):
+    if since is None:
+        since = int(time.time()) - RAW_RETENTION
     query = """
-    SELECT timestamp, ssid, download_speed, upload_speed, latency, 
-           packet_loss, bytes_sent, bytes_recv, device_count
+    SELECT ts, timestamp, ssid, download_speed, upload_speed, latency, 
+           packet_loss, bytes_sent, bytes_recv, device_count, bandwidth, rx_rate, tx_rate, probe_id
     FROM network_metrics
     """
-    if ssid_filter and ssid_filter != 'All':
-        query += f" WHERE ssid = '{ssid_filter}'"
-    query += " ORDER BY timestamp DESC LIMIT 10000"
-    
-    df = pd.read_sql(query, conn)
-    conn.close()
+    # dropdown เป็นแบบ multi จึงอาจได้ list ของ SSID กลับมา (ใช้ parameter แทนการต่อ string)
+    ssids = normalize_ssids(ssid_filter)
+    conditions = []
+    params = []
+    if ssids:
+        conditions.append(f"ssid IN ({', '.join('?' * len(ssids))})")
+        params.extend(ssids)
+    conditions.append("ts >= ?")
+    params.append(since)
+    # ข้อมูลจากหลาย probe ใน fleet (ค่าว่าง = ทุก probe)
+    probes = normalize_ssids(probe_filter)
+    if probes:
+        conditions.append(f"probe_id IN ({', '.join('?' * len(probes))})")
+        params.extend(probes)
+    query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY ts DESC"
+
+    return storage.read_sql(query, tuple(params))
+
+# เลือก tier ของข้อมูลสำหรับกราฟ (None = ข้อมูลดิบ)
+def pick_graph_tier(y_column, time_range):
+    tier = rollup.pick_tier(time_range, RAW_RETENTION, RAW_INTERVAL, MAX_POINTS_PER_TRACE)
+    return tier if y_column in rollup.ROLLUP_METRICS else None
+
+# อ่านข้อมูลดิบผ่าน cache: key คือ (ชุด SSID, เวลาเริ่ม, ชุด probe) ทุก tab ที่ขอช่วงเดียวกันจึงใช้ผลเดียวกัน
+def load_raw_data(ssid_filter=None, since=None, probe_filter=None):
+    ssids = tuple(sorted(normalize_ssids(ssid_filter)))
+    probes = tuple(sorted(normalize_ssids(probe_filter)))
+    return query_cache.get_or_load(('raw', ssids, since, probes), lambda: get_data_from_db(list(ssids), since, list(probes)))
+
+# อ่านข้อมูลกราฟผ่าน cache: key คือ (ชุด SSID, metric, tier, เวลาเริ่ม, ชุด probe)
+def load_graph_data(y_column, ssid_filter=None, since=0, tier=None, probe_filter=None):
+    if tier is None:
+        return load_raw_data(ssid_filter, since, probe_filter)
+    ssids = tuple(sorted(normalize_ssids(ssid_filter)))
+    probes = tuple(sorted(normalize_ssids(probe_filter)))
+    return query_cache.get_or_load(('rollup', ssids, y_column, tier, since, probes),
+                                   lambda: get_graph_data(y_column, list(ssids), since, tier, list(probes)))
+
+# ดึงข้อมูลสำหรับกราฟตั้งแต่เวลา since: ช่วงสั้นใช้ข้อมูลดิบ ช่วงยาวใช้ rollup ที่สรุปไว้แล้ว (แยกตาม probe เหมือนข้อมูลดิบ)
+def get_graph_data(y_column, ssid_filter=None, since=0, tier=None, probe_filter=None):
+    if tier is None:
+        return get_data_from_db(ssid_filter, since, probe_filter)
+
+    df = rollup.read_rollups(tier, y_column, since, normalize_ssids(ssid_filter), probes=normalize_ssids(probe_filter))
+    df[y_column] = df['avg']
     return df
 
-# ฟังก์ชันสร้างกราฟ
-def create_graph(y_column, title, y_label, ssid_filter=None):
-    df = get_data_from_db(ssid_filter)
-    traces = []
-    
-    for ssid in df['ssid'].unique():
-        ssid_data = df[df['ssid'] == ssid]
-        trace = go.Scatter(
-            x=ssid_data['timestamp'],
-            y=ssid_data[y_column],
-            mode='lines+markers',
-            name=f'{title} - {ssid}'
-        )
-        traces.append(trace)
+# ชื่อเส้นกราฟของแต่ละ SSID (key = 'ssid' หรือ 'probe/ssid' จาก figure_builder.series_keys)
+def trace_name(title, key, tier=None):
+    return f'{title} - {key}' if tier is None else f'{title} - {key} ({tier} avg)'
+
+def trace_mode(tier=None):
+    return 'lines+markers' if tier is None else 'lines'
+
+# สร้างรูปกราฟจาก DataFrame ที่ดึงมาแล้ว คืนค่า (figure, key ของแต่ละเส้นตามลำดับ, ใช้ WebGL หรือไม่)
+# จุดถูกลดให้พอดีกับความกว้างกราฟ (pixel_width) ก่อนส่งไปที่เบราว์เซอร์
+def build_figure(df, y_column, title, y_label, tier=None, pixel_width=None):
+    traces, trace_keys, use_webgl = figure_builder.build_traces(
+        df, y_column, DISPLAY_TZ, lambda key: trace_name(title, key, tier), trace_mode(tier), pixel_width)
         
     layout = go.Layout(
-        title=title,
+        title=title if tier is None else f'{title} ({tier} buckets)',
         xaxis=dict(title='Timestamp'),
         yaxis=dict(title=y_label),
         template='plotly_dark'
     )
-    return {'data': traces, 'layout': layout}
-
-# ฟังก์ชันสร้างตารางบันทึกการแจ้งเตือนในฐานข้อมูล
-def create_alerts_table():
-    conn = sqlite3.connect('network_metrics.db')
-    cursor = conn.cursor()
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS alerts (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        timestamp TEXT,
-        alert_message TEXT
-    )
-    """)
-    conn.commit()
-    conn.close()
+    return {'data': traces, 'layout': layout}, trace_keys, use_webgl
 
-create_alerts_table()
+# ฟังก์ชันสร้างกราฟ
+def create_graph(y_column, title, y_label, ssid_filter=None, time_range=DEFAULT_TIME_RANGE, pixel_width=None):
+    tier = pick_graph_tier(y_column, time_range)
+    df = get_graph_data(y_column, ssid_filter, int(time.time()) - time_range, tier)
+    figure, _, _ = build_figure(df, y_column, title, y_label, tier, pixel_width)
+    return figure
 
-# ฟังก์ชันบันทึกการแจ้งเตือน
-def log_alert(alert_message):
-    conn = sqlite3.connect('network_metrics.db')
-    cursor = conn.cursor()
-    timestamp = pd.to_datetime('now').strftime('%Y-%m-%d %H:%M:%S')
-    cursor.execute("INSERT INTO alerts (timestamp, alert_message) VALUES (?, ?)", (timestamp, alert_message))
-    conn.commit()
-    conn.close()
+# ต่อจุดใหม่เข้ากับกราฟที่มีอยู่ด้วย Patch (ส่งเฉพาะจุดใหม่ไปที่เบราว์เซอร์)
+def patch_figure(df, y_column, title, trace_keys, tier=None, use_webgl=False):
+    patched = Patch()
+    Trace = figure_builder.trace_class(use_webgl)
+    for key, x, y in figure_builder.patch_series(df, y_column, DISPLAY_TZ):
+        if key in trace_keys:
+            index = trace_keys.index(key)
+            patched['data'][index]['x'].extend(x)
+            patched['data'][index]['y'].extend(y)
+        else:
+            patched['data'].append(Trace(x=x, y=y, mode=trace_mode(tier), name=trace_name(title, key, tier)).to_plotly_json())
+            trace_keys.append(key)
+    return patched
 
-# ดึงข้อมูล ISP
-isp_info = get_isp_info()
+# ตรวจค่าเกิน threshold จากแถวที่ดึงมา คืนค่าข้อความแจ้งเตือน
+def check_thresholds(df, threshold_download, threshold_latency, threshold_packet_loss):
+    alert_message = ""
+    if df.empty:
+        return alert_message
+    if threshold_download and df['download_speed'].min() < threshold_download:
+        alert_message += f"⚠️  Download Speed lower than {threshold_download} Mbps!\n"
+    if threshold_latency and df['latency'].max() > threshold_latency:
+        alert_message += f"⚠️ Latency more than {threshold_latency} ms!\n"
+    if threshold_packet_loss and df['packet_loss'].max() > threshold_packet_loss:
+        alert_message += f"⚠️ Packet Loss more than {threshold_packet_loss}%!\n"
+    return alert_message
 
-# Header แสดงข้อมูล ISP
-header = dbc.Card(
-    dbc.CardBody([ 
-        html.H4("🌐 Network Information", className="card-title"),
+# incident ที่ยังเปิดอยู่ (alert_engine ใน collector เป็นผู้เขียน) อ่านผ่าน cache ร่วมกันทุก tab
+def load_open_alerts():
+    return query_cache.get_or_load('open-alerts', lambda: storage.query(
+        "SELECT id, alert_message FROM alerts WHERE state = 'open' ORDER BY ts DESC LIMIT 20"))
+
+# ประวัติการแจ้งเตือนทีละหน้า กรองตามกฎและ SSID ได้ คืนค่า (แถวของหน้านั้น, จำนวนทั้งหมด)
+def get_alert_history(rule=None, ssid=None, page=1, page_size=ALERT_HISTORY_PAGE_SIZE):
+    conditions = []
+    params = []
+    if rule:
+        conditions.append("rule = ?")
+        params.append(rule)
+    if ssid:
+        conditions.append("ssid = ?")
+        params.append(ssid)
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    total = storage.query_one(f"SELECT COUNT(*) FROM alerts{where}", tuple(params))[0]
+    rows = storage.query(f"""
+        SELECT id, timestamp, alert_message, rule, ssid, state, resolved_ts FROM alerts{where}
+        ORDER BY ts DESC, id DESC LIMIT ? OFFSET ?
+    """, tuple(params) + (page_size, (page - 1) * page_size))
+    return rows, total
+
+# heatmap ของช่องสัญญาณ (แกน x = เวลา, แกน y = ช่อง) จาก rf_analytics.channel_heatmap
+def build_channel_heatmap(df, value, band):
+    label = 'Interference score' if value == 'interference' else 'BSSIDs per scan'
+    layout = go.Layout(
+        title=f'{band} channel {label.lower()}',
+        xaxis=dict(title='Time'),
+        yaxis=dict(title='Channel', type='category'),
+        template='plotly_dark'
+    )
+    if df.empty:
+        return {'data': [], 'layout': layout}
+    grid = df.pivot(index='channel', columns='bucket', values=value).sort_index()
+    x = figure_builder.to_local_datetime(grid.columns.to_numpy(), DISPLAY_TZ)
+    heatmap = go.Heatmap(z=grid.to_numpy(), x=x, y=[str(channel) for channel in grid.index],
+                         colorscale='Inferno', colorbar=dict(title=label), hoverongaps=False)
+    return {'data': [heatmap], 'layout': layout}
+
+# ตาราง AP ข้างเคียงจาก rf_analytics.neighbours
+def neighbours_table(df):
+    if df.empty:
+        return html.P("No scan data for this range.", className="text-muted")
+    df = df.head(RF_NEIGHBOUR_ROWS).copy()
+    df['last_seen'] = pd.to_datetime(df['last_seen'], unit='s', utc=True).dt.tz_convert(DISPLAY_TZ).dt.strftime('%Y-%m-%d %H:%M')
+    df['interference'] = df['interference'].round(2)
+    df = df.rename(columns={'bssid': 'BSSID', 'ssid': 'SSID', 'band': 'Band', 'channel': 'Channel', 'samples': 'Samples',
+                            'p10': 'Signal p10', 'p50': 'Signal p50', 'p90': 'Signal p90', 'max_signal': 'Max',
+                            'co_channel': 'Co-channel APs', 'interference': 'Interference', 'last_seen': 'Last seen',
+                            'probes': 'Probes'})
+    return dbc.Table.from_dataframe(df, striped=True, bordered=False, hover=True, size='sm', color='dark')
+
+# เนื้อหา header จากข้อมูล ISP
+def isp_details(isp_info):
+    return [
         html.P(f"🆔 IP Address: {isp_info['ip']}"),
         html.P(f"🏢 ISP: {isp_info['isp']}"),
         html.P(f"📍 Location: {isp_info['city']}, {isp_info['country']}"),
+    ]
+
+# Header แสดงข้อมูล ISP (เติมโดย callback เมื่อได้ข้อมูล ไม่ดึงตอน import)
+header = dbc.Card(
+    dbc.CardBody([ 
+        html.H4("🌐 Network Information", className="card-title"),
+        html.Div(id="isp-info", children=isp_details(isp.UNKNOWN)),
+        dcc.Interval(id='isp-poll', interval=2000, max_intervals=5),
     ]), 
     className="mb-3 text-light bg-dark"
 )
@@ -113,6 +266,12 @@ sidebar = dbc.Card(
                 html.H5("📡 Select SSID", className="text-light"),
                 dcc.Dropdown(id='wifi-ssid-dropdown', multi=True, placeholder="Select SSID...", style={'color': 'black'}),
                 html.Hr(),
+                html.H5("🛰️ Select Probe", className="text-light"),
+                dcc.Dropdown(id='probe-dropdown', multi=True, placeholder="All probes", style={'color': 'black'}),
+                html.Hr(),
+                html.H5("🕒 Time Range", className="text-light"),
+                dcc.Dropdown(id='time-range-dropdown', options=TIME_RANGES, value=DEFAULT_TIME_RANGE, clearable=False, style={'color': 'black'}),
+                html.Hr(),
                 html.H5("📊 Select Data Type", className="text-light"),
                 dcc.RadioItems(
                     id='data-type-radio',
@@ -122,6 +281,8 @@ sidebar = dbc.Card(
                         {'label': 'Latency', 'value': 'latency'},
                         {'label': 'Packet Loss', 'value': 'packet_loss'},
                         {'label': 'Bandwidth Utilization', 'value': 'bandwidth'},
+                        {'label': 'Receive Rate', 'value': 'rx_rate'},
+                        {'label': 'Transmit Rate', 'value': 'tx_rate'},
                         {'label': 'Device Count', 'value': 'device_count'}
                     ],
                     value='download_speed',
@@ -151,7 +312,14 @@ history_button = dbc.Button("📜 View Alert History", id="view-alert-history",
 alert_history_modal = dbc.Modal(
     [
         dbc.ModalHeader("⚠️ Alert History"),
-        dbc.ModalBody(id="alert-history-body"),
+        dbc.ModalBody([
+            dbc.Row([
+                dbc.Col(dcc.Dropdown(id="alert-rule-filter", placeholder="All rules", style={'color': 'black'})),
+                dbc.Col(dcc.Dropdown(id="alert-ssid-filter", placeholder="All SSIDs", style={'color': 'black'})),
+            ], className="mb-3"),
+            html.Div(id="alert-history-body"),
+            dbc.Pagination(id="alert-history-page", max_value=1, active_page=1, fully_expanded=False, className="mt-2"),
+        ]),
         dbc.ModalFooter(
             dbc.Button("Close", id="close-modal", className="ml-auto", color="secondary")
         ),
@@ -159,6 +327,25 @@ alert_history_modal = dbc.Modal(
     id="alert-history-modal",
 )
 
+# heatmap ช่องสัญญาณและ AP ข้างเคียง (อ่านจากตารางสรุปของ rf_analytics ใช้ช่วงเวลาและ probe จาก sidebar)
+rf_panel = dbc.Card(
+    dbc.CardBody([
+        html.H4("📡 Channel Congestion", className="card-title"),
+        dbc.Row([
+            dbc.Col(dcc.RadioItems(id='rf-band', options=rf_analytics.BANDS, value='2.4 GHz', inline=True,
+                                   labelStyle={'margin-right': '1rem'})),
+            dbc.Col(dcc.RadioItems(id='rf-value', inline=True, value='interference', labelStyle={'margin-right': '1rem'},
+                                   options=[{'label': 'Interference score', 'value': 'interference'},
+                                            {'label': 'BSSIDs per scan', 'value': 'bssids'}])),
+        ]),
+        html.Div(id='rf-recommendation', className="mt-2"),
+        dcc.Graph(id='channel-heatmap'),
+        html.H5("AP Neighbours", className="mt-3"),
+        html.Div(id='ap-neighbours'),
+    ]),
+    className="mt-3 text-light bg-dark"
+)
+
 # Layout ของ Dash App
 app.layout = dbc.Container([
     header,  # แสดงข้อมูล ISP ด้านบน
@@ -166,87 +353,228 @@ app.layout = dbc.Container([
         dbc.Col(sidebar, width=3),
         dbc.Col([ 
             html.H3("📶 Wi-Fi Performance Dashboard", className="text-center text-light mb-4"),
-            dcc.Interval(id='interval-update', interval=10*1000, n_intervals=1),
+            dcc.Interval(id='interval-update', interval=FALLBACK_POLL_INTERVAL*1000, n_intervals=1),
+            dcc.Store(id='live-push', storage_type='memory'),  # assets/live_push.js เขียน event จาก /events ลงที่นี่
             dbc.Alert(id='alert-message', color='danger', is_open=False, dismissable=True, className="mt-3"),
             history_button,  # ปุ่มดูประวัติ
             alert_history_modal,  # Modal สำหรับแสดงประวัติ
-            dcc.Graph(id='wifi-graph', className="mt-3")
+            dcc.Graph(id='wifi-graph', className="mt-3"),
+            dcc.Store(id='graph-state', storage_type='memory'),
+            dcc.Store(id='graph-width', storage_type='memory'),
+            rf_panel
         ], width=9)
     ])
 ], fluid=True)
 
+# Callback สำหรับแสดงข้อมูล ISP (ถามซ้ำไม่กี่ครั้งช่วงแรกระหว่างรอ lookup แล้วตามรอบ fallback)
+@app.callback(
+    Output('isp-info', 'children'),
+    Input('isp-poll', 'n_intervals'),
+    Input('interval-update', 'n_intervals')
+)
+def update_isp_info(n_poll, n):
+    return isp_details(get_isp_info())
+
 # Callback สำหรับอัปเดตตัวเลือก SSID
 @app.callback(
     Output('wifi-ssid-dropdown', 'options'),
-    Input('interval-update', 'n_intervals')
+    Input('interval-update', 'n_intervals'),
+    Input('live-push', 'data'),
+    State('wifi-ssid-dropdown', 'options')
 )
-def update_ssid_options(n):
-    conn = sqlite3.connect('network_metrics.db')
-    ssids = pd.read_sql("SELECT DISTINCT ssid FROM network_metrics WHERE ssid IS NOT NULL", conn)['ssid'].dropna().tolist()
-    conn.close()
+def update_ssid_options(n, live_event, options):
+    # event ที่ push มาไม่มี SSID ใหม่ ไม่ต้องอ่านฐานข้อมูล
+    if ctx.triggered_id == 'live-push' and options and set(live_event['ssids']) <= {option['value'] for option in options}:
+        return dash.no_update
+    # อ่านจากตาราง ssids (ขนาดเท่าจำนวน SSID) แทน SELECT DISTINCT บน network_metrics ทั้งตาราง
+    ssids = query_cache.get_or_load('ssid-options', lambda: [row[0] for row in storage.query("SELECT ssid FROM ssids ORDER BY ssid")])
     return [{'label': ssid, 'value': ssid} for ssid in ['All'] + ssids]
 
+# Callback สำหรับอัปเดตตัวเลือก probe (จากตาราง probes ที่ aggregator อัปเดต)
+@app.callback(
+    Output('probe-dropdown', 'options'),
+    Input('interval-update', 'n_intervals')
+)
+def update_probe_options(n):
+    probes = query_cache.get_or_load('probe-options', lambda: [row[0] for row in storage.query("SELECT probe_id FROM probes ORDER BY probe_id")])
+    return [{'label': probe, 'value': probe} for probe in ['All'] + probes]
+
+# Callback สำหรับ heatmap ช่องสัญญาณ ช่องที่แนะนำ และตาราง AP ข้างเคียง
+@app.callback(
+    Output('channel-heatmap', 'figure'),
+    Output('rf-recommendation', 'children'),
+    Output('ap-neighbours', 'children'),
+    Input('rf-band', 'value'),
+    Input('rf-value', 'value'),
+    Input('time-range-dropdown', 'value'),
+    Input('probe-dropdown', 'value'),
+    Input('interval-update', 'n_intervals')
+)
+def update_rf_views(band, value, time_range, selected_probes, n):
+    now = int(time.time()) // QUERY_CACHE_TTL * QUERY_CACHE_TTL
+    time_range = time_range or DEFAULT_TIME_RANGE
+    since = now - time_range
+    probes = tuple(normalize_ssids(selected_probes))
+    width = 24 * 3600 if time_range > RF_DAILY_AFTER else 3600
+    heatmap = query_cache.get_or_load(('rf-heatmap', band, probes, since, width),
+                                      lambda: rf_analytics.channel_heatmap(since, band, list(probes), width))
+    scores = query_cache.get_or_load(('rf-scores', band, probes, since),
+                                     lambda: rf_analytics.channel_scores(since, band, list(probes)))
+    aps = query_cache.get_or_load(('rf-neighbours', band, probes, since),
+                                  lambda: rf_analytics.neighbours(since, band, list(probes)))
+
+    best = rf_analytics.recommend_channel(scores)
+    if best is None:
+        recommendation = html.P(f"No {band} scan data for this range.", className="text-muted")
+    else:
+        ranking = ', '.join(f"{int(row.channel)}: {row.interference:.2f}" for row in scores[scores['candidate']].itertuples())
+        recommendation = html.P(f"✅ Least congested {band} channel: {best} (average interference per scan — {ranking})")
+    return build_channel_heatmap(heatmap, value, band), recommendation, neighbours_table(aps)
+
+# แถวใหม่ตั้งแต่ since จาก buffer ของ push_broker (อ่านจากฐานข้อมูลครั้งเดียวแล้วใช้ร่วมกันทุก tab)
+# คืนค่า None ถ้า buffer ไม่ครอบคลุมช่วงนั้น
+def live_raw_data(ssid_filter=None, since=0, probe_filter=None):
+    rows = push_broker.rows_since(since)
+    if rows is None:
+        return None
+    df = pd.DataFrame(rows, columns=push.LIVE_COLUMNS)
+    ssids = normalize_ssids(ssid_filter)
+    if ssids:
+        df = df[df['ssid'].isin(ssids)]
+    probes = normalize_ssids(probe_filter)
+    if probes:
+        df = df[df['probe_id'].isin(probes)]
+    return df.sort_values('ts', ascending=False)
+
 # Callback สำหรับอัปเดตกราฟและแจ้งเตือน
+# state ต่อ session เก็บ high-water mark (ts ล่าสุดที่ส่งไปแล้ว) ทุก event จึงดึงและส่งเฉพาะแถวใหม่
 @app.callback(
     [Output('wifi-graph', 'figure'),
      Output('alert-message', 'children'),
-     Output('alert-message', 'is_open')],
+     Output('alert-message', 'is_open'),
+     Output('graph-state', 'data')],
     [Input('wifi-ssid-dropdown', 'value'),
+     Input('probe-dropdown', 'value'),
      Input('data-type-radio', 'value'),
-     Input('interval-update', 'n_intervals')],
+     Input('time-range-dropdown', 'value'),
+     Input('interval-update', 'n_intervals'),
+     Input('live-push', 'data')],
     [State('threshold-download', 'value'),
      State('threshold-latency', 'value'),
-     State('threshold-packet-loss', 'value')]
+     State('threshold-packet-loss', 'value'),
+     State('graph-state', 'data'),
+     State('graph-width', 'data')]
 )
-def update_graph_and_alert(selected_ssids, data_type, n, threshold_download, threshold_latency, threshold_packet_loss):
-    df = get_data_from_db(selected_ssids)
-    
-    alert_message = ""
-    is_alert = False
-    
-    if not df.empty:
-        if threshold_download and df['download_speed'].min() < threshold_download:
-            alert_message += f"⚠️  Download Speed lower than {threshold_download} Mbps!\n"
-            is_alert = True
-        if threshold_latency and df['latency'].max() > threshold_latency:
-            alert_message += f"⚠️ Latency more than {threshold_latency} ms!\n"
-            is_alert = True
-        if threshold_packet_loss and df['packet_loss'].max() > threshold_packet_loss:
-            alert_message += f"⚠️ Packet Loss more than {threshold_packet_loss}%!\n"
-            is_alert = True
-        
-        # บันทึกการแจ้งเตือน
-        if is_alert and alert_message:
-            log_alert(alert_message)
-    
-    figure = create_graph(data_type, f"{data_type} Over Time", data_type, selected_ssids)
-    return figure, alert_message, is_alert
-
-# Callback สำหรับแสดงประวัติการแจ้งเตือน
+@tracing.traced('callback.update_graph_and_alert')
+def update_graph_and_alert(selected_ssids, selected_probes, data_type, time_range, n, live_event, threshold_download, threshold_latency, threshold_packet_loss, graph_state, graph_width):
+    # ปัดเวลาให้ตรงกับรอบ TTL เพื่อให้ tab ที่เปิดพร้อมกันได้ key เดียวกัน
+    now = int(time.time()) // QUERY_CACHE_TTL * QUERY_CACHE_TTL
+    time_range = time_range or DEFAULT_TIME_RANGE
+    probes = normalize_ssids(selected_probes)
+    tier = pick_graph_tier(data_type, time_range)
+    title = f"{data_type} Over Time"
+    view = [normalize_ssids(selected_ssids), data_type, time_range, probes]
+
+    incremental = (
+        ctx.triggered_id in ('interval-update', 'live-push')
+        and graph_state is not None
+        and graph_state['view'] == view
+        and graph_state['tier'] == tier
+        and now - graph_state['drawn_at'] < FULL_REDRAW_INTERVAL
+    )
+
+    if incremental:
+        # ดึงเฉพาะแถวที่ใหม่กว่า high-water mark (จาก buffer ของ push ถ้ามี ไม่งั้นจากฐานข้อมูล)
+        raw_df = live_raw_data(selected_ssids, graph_state['raw_hwm'] + 1, probes) if ctx.triggered_id == 'live-push' else None
+        if raw_df is None:
+            raw_df = load_raw_data(selected_ssids, graph_state['raw_hwm'] + 1, probes)
+        graph_df = raw_df if tier is None else load_graph_data(data_type, selected_ssids, graph_state['hwm'] + 1, tier, probes)
+    else:
+        raw_df = load_raw_data(selected_ssids, now - min(time_range, RAW_RETENTION), probes)
+        graph_df = raw_df if tier is None else load_graph_data(data_type, selected_ssids, now - time_range, tier, probes)
+
+    # incident ที่เปิดใหม่ตั้งแต่ครั้งก่อน (บันทึกโดย alert_engine ฝั่ง collector ไม่ใช่ที่นี่)
+    # และ threshold ของ tab นี้เฉพาะแถวที่ยังไม่เคยตรวจ (แสดงเท่านั้น ไม่บันทึก)
+    open_alerts = load_open_alerts()
+    seen = set(graph_state.get('alerts', [])) if graph_state is not None else set()
+    unchecked = raw_df if graph_state is None or incremental else raw_df[raw_df['ts'] > graph_state['raw_hwm']]
+    alert_message = ''.join(f"⚠️ {message}\n" for row_id, message in open_alerts if row_id not in seen)
+    alert_message += check_thresholds(unchecked, threshold_download, threshold_latency, threshold_packet_loss)
+    is_alert = bool(alert_message)
+
+    if incremental:
+        state = dict(graph_state)
+        state['raw_hwm'] = int(raw_df['ts'].max()) if not raw_df.empty else graph_state['raw_hwm']
+        state['hwm'] = int(graph_df['ts'].max()) if not graph_df.empty else graph_state['hwm']
+        state['traces'] = list(graph_state['traces'])
+        state['alerts'] = [row_id for row_id, _ in open_alerts]
+        with tracing.span('figure.patch', rows=len(graph_df)):
+            figure = patch_figure(graph_df, data_type, title, state['traces'], tier, graph_state['webgl']) if not graph_df.empty else dash.no_update
+        if not is_alert:
+            return figure, dash.no_update, dash.no_update, state
+        return figure, alert_message, is_alert, state
+
+    with tracing.span('figure.build', rows=len(graph_df), tier=tier):
+        figure, trace_keys, use_webgl = build_figure(graph_df, data_type, title, data_type, tier, graph_width)
+    state = {
+        'view': view,
+        'tier': tier,
+        'hwm': int(graph_df['ts'].max()) if not graph_df.empty else now - time_range,
+        'raw_hwm': int(raw_df['ts'].max()) if not raw_df.empty else now - min(time_range, RAW_RETENTION),
+        'traces': trace_keys,
+        'webgl': use_webgl,
+        'drawn_at': now,
+        'alerts': [row_id for row_id, _ in open_alerts],
+    }
+    return figure, alert_message, is_alert, state
+
+# อ่านความกว้างของกราฟจากเบราว์เซอร์ (ใช้กำหนดจำนวนจุดหลังลดข้อมูล)
+app.clientside_callback(
+    """
+    function(id) {
+        var graph = document.getElementById(id);
+        return Math.round(graph ? graph.clientWidth : window.innerWidth * 0.75);
+    }
+    """,
+    Output('graph-width', 'data'),
+    Input('wifi-graph', 'id')
+)
+
+# Callback สำหรับแสดงประวัติการแจ้งเตือน (ทีละหน้า กรองตามกฎและ SSID)
 @app.callback(
     Output("alert-history-body", "children"),
+    Output("alert-history-page", "max_value"),
+    Output("alert-history-page", "active_page"),
+    Output("alert-rule-filter", "options"),
+    Output("alert-ssid-filter", "options"),
     Input("view-alert-history", "n_clicks"),
+    Input("alert-history-page", "active_page"),
+    Input("alert-rule-filter", "value"),
+    Input("alert-ssid-filter", "value"),
     prevent_initial_call=True
 )
-def show_alert_history(n_clicks):
-    conn = sqlite3.connect('network_metrics.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM alerts ORDER BY timestamp DESC LIMIT 10")
-    rows = cursor.fetchall()
-    conn.close()
-    
+def show_alert_history(n_clicks, page, rule, ssid):
+    # เปลี่ยนตัวกรองหรือเปิด modal ใหม่ เริ่มที่หน้าแรก
+    if ctx.triggered_id != "alert-history-page":
+        page = 1
+    rows, total = get_alert_history(rule, ssid, page or 1)
+    max_page = max(1, -(-total // ALERT_HISTORY_PAGE_SIZE))
+    rules = [row[0] for row in storage.query("SELECT DISTINCT rule FROM alerts WHERE rule IS NOT NULL ORDER BY rule")]
+    ssids = [row[0] for row in storage.query("SELECT DISTINCT ssid FROM alerts WHERE ssid IS NOT NULL ORDER BY ssid")]
+
     if not rows:
-        return "No alerts found."
-    
-    alert_list = []
-    for row in rows:
+        return "No alerts found.", max_page, page, rules, ssids
+
+    alert_list = [html.P(f"{total} alert(s)", className="text-muted")]
+    for row_id, timestamp, message, rule_name, alert_ssid, state, resolved_ts in rows:
+        status = "open" if state == 'open' else f"resolved {pd.Timestamp(resolved_ts, unit='s', tz='UTC').strftime('%Y-%m-%d %H:%M:%S')}" if resolved_ts else state
         alert_list.append(html.Div([
-            html.P(f"Timestamp: {row[1]}", className="font-weight-bold"),
-            html.P(f"Message: {row[2]}"),
+            html.P(f"Timestamp: {timestamp} | Rule: {rule_name or '-'} | Status: {status}", className="font-weight-bold"),
+            html.P(f"Message: {message}"),
             html.Hr()
         ]))
-    
-    return alert_list
+
+    return alert_list, max_page, page, rules, ssids
 
 # Callback สำหรับเปิด/ปิด modal
 @app.callback(
@@ -270,7 +598,85 @@ def toggle_modal(n1, n2, is_open):
 def toggle_sidebar(n_clicks):
     return {"display": "block" if n_clicks % 2 == 1 else "none"}
 
-# เรียกใช้งานแอป
+# ดูสถิติ cache (hit/miss) ของ query
+@app.server.route('/debug/cache')
+def cache_stats():
+    return query_cache.stats()
+
+# ช่องทาง push ข้อมูลใหม่แบบ server-sent events (หนึ่ง connection ต่อ tab)
+@app.server.route('/events')
+def live_events():
+    return Response(push.event_stream(push_broker), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# ตรวจ/สร้าง schema ครั้งเดียวก่อนคำขอแรก (ไม่ทำตอน import)
+@app.server.before_request
+def prepare_database():
+    storage.ensure_schema()
+
+# span ของทั้งคำขอ callback (รวมการแปลง figure เป็น JSON ที่ Dash ทำหลัง callback คืนค่า)
+@app.server.before_request
+def start_request_span():
+    if tracing.ENABLED and request.path == '/_dash-update-component':
+        body = request.get_json(silent=True) or {}
+        g.trace_span = tracing.span('dash.request', output=body.get('output', ''))
+
+@app.server.teardown_request
+def end_request_span(exc):
+    span = g.pop('trace_span', None)
+    if span is not None:
+        span.end()
+
+# หน้าเวลาของ span ล่าสุด (?on=1 / ?on=0 เปิดปิด tracing) และ export เป็น Chrome trace
+@app.server.route('/debug/timings')
+def debug_timings():
+    tracing.apply_controls(request.args)
+    return tracing.timings_page()
+
+@app.server.route('/debug/trace.json')
+def debug_trace():
+    return tracing.chrome_trace()
+
+# sampling profiler ทั้ง process: /debug/profile?seconds=10 คืนค่า folded stacks
+@app.server.route('/debug/profile')
+def debug_profile():
+    return Response(tracing.profile(request.args.get('seconds', 10)), mimetype='text/plain')
+
+# เวลาตั้งแต่ process เริ่มจนเสิร์ฟหน้าแรกได้ (วินาที)
+STARTUP_BUDGET = 5.0
+_first_page = {'served': False}
+
+def seconds_since_process_start():
+    return time.time() - psutil.Process().create_time()
+
+@app.server.after_request
+def record_first_page(response):
+    if not _first_page['served'] and request.path == '/':
+        _first_page['served'] = True
+        elapsed = seconds_since_process_start()
+        status = 'within' if elapsed <= STARTUP_BUDGET else 'OVER'
+        print(f"First page served {elapsed:.2f}s after process start ({status} {STARTUP_BUDGET:.0f}s budget)")
+    return response
+
+# วัด cold start: import + schema + หน้าแรก + layout + dependencies ใน process ใหม่ คืนค่า exit code 1 ถ้าเกิน budget
+def startup_check():
+    client = app.server.test_client()
+    for path in ('/', '/_dash-layout', '/_dash-dependencies'):
+        response = client.get(path)
+        if response.status_code != 200:
+            print(f"{path}: HTTP {response.status_code}")
+            return 1
+    elapsed = seconds_since_process_start()
+    print(f"Cold start to first page: {elapsed:.2f}s (budget {STARTUP_BUDGET:.1f}s)")
+    return 0 if elapsed <= STARTUP_BUDGET else 1
+
+# เรียกใช้งานแอป: python app.py [--startup-check]
 if __name__ == '__main__':
-    app.run_server(debug=True)
+    import sys
+
+    if '--startup-check' in sys.argv:
+        sys.exit(startup_check())
+    storage.ensure_schema()
+    get_isp_info()  # เริ่ม lookup ใน background ก่อนหน้าแรกถูกขอ
+    app.run(debug=True)
 
@@ -0,0 +1,314 @@
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import time
+from urllib.parse import quote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+import storage
+import tracing
+
+# ข้อมูลดิบที่เก่ากว่า retention ย้ายจาก SQLite มาเป็นไฟล์ Parquet แบ่งตามวัน (UTC) และ SSID:
+#   archive/<table>/day=2024-05-01/ssid=HomeNet/part-<id แรก>-<id สุดท้าย>.parquet
+ARCHIVE_DIR = os.environ.get('WIFI_ARCHIVE_DIR', 'archive')
+RETENTION_HOURS = 50          # เหมือน metrics_collector.RETENTION_HOURS
+ARCHIVE_RETENTION_DAYS = 400  # ลบไฟล์ archive ที่เก่ากว่านี้ (ข้อมูลสำหรับวางแผน capacity ย้อนหลังหลายเดือน)
+BATCH_ROWS = 50000            # แถวต่อ row group และต่อ transaction ที่ลบ
+MAX_DAYS_PER_RUN = 1          # วันที่ย้ายต่อการเรียกหนึ่งครั้ง (ไม่ให้รอบของ collector ยาวเกินไป)
+VACUUM_PAGES = 2000           # หน้าที่คืนให้ระบบไฟล์ต่อรอบ (incremental vacuum)
+COMPRESSION = 'zstd'
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'  # ค่าที่ pyarrow อ่านกลับเป็น null
+
+# คอลัมน์ที่เก็บในไฟล์ (ssid อยู่ในชื่อโฟลเดอร์แทน)
+SCHEMAS = {
+    'network_metrics': pa.schema([
+        ('id', pa.int64()), ('timestamp', pa.string()), ('ts', pa.int64()),
+        ('download_speed', pa.float64()), ('upload_speed', pa.float64()), ('latency', pa.float64()),
+        ('packet_loss', pa.float64()), ('bytes_sent', pa.int64()), ('bytes_recv', pa.int64()),
+        ('device_count', pa.int64()), ('bandwidth', pa.float64()), ('rx_rate', pa.float64()),
+        ('tx_rate', pa.float64()), ('probe_id', pa.string()),
+    ]),
+    'metrics': pa.schema([
+        ('id', pa.int64()), ('timestamp', pa.string()), ('ts', pa.int64()), ('bssid', pa.string()),
+        ('signal_strength', pa.int64()), ('frequency', pa.string()), ('channel', pa.string()),
+        ('probe_id', pa.string()),
+    ]),
+}
+
+PARTITION_SCHEMA = pa.schema([('day', pa.string()), ('ssid', pa.string())])
+
+
+def day_of(ts):
+    return datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).strftime('%Y-%m-%d')
+
+
+def partition_dir(archive_dir, table, day, ssid):
+    name = NULL_PARTITION if ssid is None else quote(ssid, safe='')
+    return os.path.join(archive_dir, table, f'day={day}', f'ssid={name}')
+
+
+# ชื่อไฟล์ของแถว id first_id..last_id ที่ยังไม่มีในโฟลเดอร์
+# รอบที่เขียนซ้ำหลังลบไม่ครบอาจได้ช่วง id เดียวกันแต่แถวน้อยกว่า จึงเติมเลขต่อท้ายแทนการทับไฟล์เดิม
+def part_path(directory, first_id, last_id):
+    name = f'part-{first_id}-{last_id}'
+    candidate = os.path.join(directory, f'{name}.parquet')
+    n = 0
+    while os.path.exists(candidate):
+        n += 1
+        candidate = os.path.join(directory, f'{name}-{n}.parquet')
+    return candidate
+
+
+# ย้ายแถวของหนึ่งวัน [day_start, day_start + 1 วัน) ไปเป็นไฟล์ Parquet แล้วลบออกจากตาราง คืนค่าจำนวนแถว
+# อ่านด้วย cursor เดียวเรียงตาม (ts, id) บน index ของ ts แล้วเขียนทีละ BATCH_ROWS เป็น row group
+# ไฟล์ถูก rename เข้าที่หลังเขียนครบเท่านั้น ถ้าหยุดกลางทางระหว่างลบ รอบถัดไปจะเขียนแถวที่เหลือซ้ำเป็นไฟล์ใหม่
+# (read_history ตัดแถวซ้ำด้วย id) โดยไม่ทับไฟล์เดิม (part_path)
+def archive_day(table, day_start, path=None, archive_dir=None, batch_rows=BATCH_ROWS):
+    archive_dir = archive_dir or ARCHIVE_DIR
+    schema = SCHEMAS[table]
+    day = day_of(day_start)
+    writers = {}     # ssid -> [ParquetWriter, ไฟล์ชั่วคราว, id น้อยสุด, id มากสุด]
+    rows = 0
+    max_id = 0
+    cursor = storage.get_connection(path).execute(
+        f"SELECT ssid, {', '.join(schema.names)} FROM {table} WHERE ts >= ? AND ts < ? ORDER BY ts, id",
+        (day_start, day_start + 86400))
+    try:
+        while True:
+            batch = cursor.fetchmany(batch_rows)
+            if not batch:
+                break
+            by_ssid = {}
+            for row in batch:
+                by_ssid.setdefault(row[0], []).append(row[1:])
+            for ssid, values in by_ssid.items():
+                columns = list(zip(*values))
+                chunk = pa.Table.from_arrays([pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                                             schema=schema)
+                first_id = min(columns[0])
+                if ssid not in writers:
+                    directory = partition_dir(archive_dir, table, day, ssid)
+                    os.makedirs(directory, exist_ok=True)
+                    tmp = os.path.join(directory, f'.part-{first_id}.parquet.tmp')
+                    writers[ssid] = [pq.ParquetWriter(tmp, schema, compression=COMPRESSION), tmp, first_id, first_id]
+                writer = writers[ssid]
+                writer[0].write_table(chunk)
+                writer[2] = min(writer[2], first_id)
+                writer[3] = max(writer[3], max(columns[0]))
+                max_id = max(max_id, writer[3])
+            rows += len(batch)
+    finally:
+        cursor.close()
+        for writer, tmp, first_id, last_id in writers.values():
+            writer.close()
+    for writer, tmp, first_id, last_id in writers.values():
+        os.replace(tmp, part_path(os.path.dirname(tmp), first_id, last_id))
+
+    # ลบทีละ batch_rows ใน transaction แยกกัน (collector เขียนแทรกได้ระหว่างนั้น)
+    # id <= max_id: แถวของวันนั้นที่เพิ่งเข้ามาหลังอ่าน (เช่น probe ส่งช้า) ยังไม่ถูกลบจนกว่าจะย้ายรอบหน้า
+    def _delete():
+        with storage.transaction(path) as conn:
+            return conn.execute(
+                f'DELETE FROM {table} WHERE id IN (SELECT id FROM {table} WHERE ts >= ? AND ts < ? AND id <= ? LIMIT ?)',
+                (day_start, day_start + 86400, max_id, batch_rows)).rowcount
+    while rows and storage.with_retry(_delete):
+        pass
+    return rows
+
+
+# คืนพื้นที่ว่างในไฟล์ฐานข้อมูลไม่เกิน pages หน้า (ทำได้เมื่อไฟล์เป็น auto_vacuum=INCREMENTAL) คืนค่าจำนวนหน้าที่คืน
+def incremental_vacuum(path=None, pages=VACUUM_PAGES):
+    conn = storage.get_connection(path)
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        return 0
+    before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    # executescript รันจนจบ (execute ธรรมดาคืนหน้าแค่หน้าเดียว)
+    conn.executescript(f'PRAGMA incremental_vacuum({int(pages)});')
+    return before - conn.execute('PRAGMA freelist_count').fetchone()[0]
+
+
+# เปลี่ยนฐานข้อมูลเดิมให้เป็น auto_vacuum=INCREMENTAL (VACUUM ทั้งไฟล์หนึ่งครั้ง ควรทำตอน collector หยุด)
+def enable_incremental_vacuum(path=None):
+    conn = storage.get_connection(path)
+    conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+    conn.execute('VACUUM')
+    return conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+
+
+# ลบโฟลเดอร์วันที่เก่ากว่า keep_days
+def prune_archive(now=None, archive_dir=None, keep_days=ARCHIVE_RETENTION_DAYS):
+    archive_dir = archive_dir or ARCHIVE_DIR
+    oldest = day_of((now or time.time()) - keep_days * 86400)
+    removed = 0
+    for table in SCHEMAS:
+        base = os.path.join(archive_dir, table)
+        if not os.path.isdir(base):
+            continue
+        for name in os.listdir(base):
+            if name.startswith('day=') and name[4:] < oldest:
+                shutil.rmtree(os.path.join(base, name))
+                removed += 1
+    return removed
+
+
+# ย้ายวันที่เก่ากว่า retention ทั้งวัน (ไฟล์ละหนึ่งวันต่อ SSID แทนไฟล์เล็ก ๆ ทุกรอบ) แล้วคืนพื้นที่
+# ตารางจึงเก็บข้อมูลดิบไว้ระหว่าง retention ถึง retention + 1 วัน คืนค่า {table: จำนวนแถวที่ย้าย}
+def compact(now=None, path=None, archive_dir=None, retention_hours=RETENTION_HOURS, max_days=MAX_DAYS_PER_RUN):
+    now = int(now or time.time())
+    cutoff = now - retention_hours * 3600
+    moved = {}
+    with tracing.span('archive.compact'):
+        for table in SCHEMAS:
+            moved[table] = 0
+            for _ in range(max_days):
+                oldest = storage.query_one(f'SELECT MIN(ts) FROM {table}', (), path)[0]
+                if oldest is None:
+                    break
+                day_start = oldest - oldest % 86400
+                if day_start + 86400 > cutoff:
+                    break
+                with tracing.span('archive.day', table=table, day=day_of(day_start)):
+                    moved[table] += archive_day(table, day_start, path, archive_dir)
+        if any(moved.values()):
+            incremental_vacuum(path)
+            prune_archive(now, archive_dir)
+    return moved
+
+
+def dataset_schema(table):
+    return pa.unify_schemas([SCHEMAS[table], PARTITION_SCHEMA])
+
+
+def dataset(table, archive_dir=None):
+    base = os.path.join(archive_dir or ARCHIVE_DIR, table)
+    if not os.path.isdir(base):
+        return None
+    # use_mmap: อ่านไฟล์ผ่าน memory map (ไม่คัดลอกทั้งไฟล์เข้าหน่วยความจำ)
+    return ds.dataset(base, schema=dataset_schema(table), format='parquet',
+                      partitioning=ds.partitioning(PARTITION_SCHEMA, flavor='hive'),
+                      filesystem=fs.LocalFileSystem(use_mmap=True))
+
+
+# เวลาเริ่ม (epoch, UTC) ของทุกวันที่มีใน archive ของตาราง เรียงจากเก่าไปใหม่
+def archived_days(table, archive_dir=None):
+    base = os.path.join(archive_dir or ARCHIVE_DIR, table)
+    if not os.path.isdir(base):
+        return []
+    days = []
+    for name in os.listdir(base):
+        if name.startswith('day='):
+            day = datetime.datetime.strptime(name[4:], '%Y-%m-%d').replace(tzinfo=datetime.timezone.utc)
+            days.append(int(day.timestamp()))
+    return sorted(days)
+
+
+def _filter(since=None, until=None, ssids=None):
+    conditions = []
+    # เงื่อนไขบน day ตัดทั้งโฟลเดอร์ออกโดยไม่ต้องเปิดไฟล์ เงื่อนไขบน ts ใช้สถิติ min/max ของ row group
+    if since is not None:
+        conditions += [ds.field('day') >= day_of(since), ds.field('ts') >= since]
+    if until is not None:
+        conditions += [ds.field('day') <= day_of(until), ds.field('ts') < until]
+    if ssids:
+        conditions.append(ds.field('ssid').isin(list(ssids)))
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+# อ่านจาก archive เฉพาะคอลัมน์ที่ต้องใช้ (columns=None = ทุกคอลัมน์ รวม day และ ssid) คืนค่า pyarrow.Table
+def scan_archive(table, columns=None, since=None, until=None, ssids=None, archive_dir=None):
+    data = dataset(table, archive_dir)
+    if data is None:
+        empty = dataset_schema(table).empty_table()
+        return empty.select(columns) if columns else empty
+    with tracing.span('archive.scan', table=table):
+        return data.to_table(columns=columns, filter=_filter(since, until, ssids))
+
+
+# อ่านข้อมูลช่วง [since, until) จากทั้ง archive และตารางใน SQLite รวมเป็น DataFrame เรียงตาม ts
+def read_history(table, columns=None, since=None, until=None, ssids=None, path=None, archive_dir=None):
+    wanted = columns or ['ssid'] + SCHEMAS[table].names
+    selected = wanted if 'id' in wanted else ['id'] + wanted
+
+    where, params = [], []
+    if since is not None:
+        where.append('ts >= ?')
+        params.append(since)
+    if until is not None:
+        where.append('ts < ?')
+        params.append(until)
+    if ssids:
+        where.append(f"ssid IN ({', '.join('?' * len(ssids))})")
+        params.extend(ssids)
+    hot = storage.read_sql(f"SELECT {', '.join(selected)} FROM {table}" + (f" WHERE {' AND '.join(where)}" if where else ''),
+                           tuple(params), path)
+
+    if dataset(table, archive_dir) is None:
+        df = hot
+    else:
+        cold = scan_archive(table, selected, since, until, ssids, archive_dir).to_pandas()
+        df = pd.concat([cold, hot], ignore_index=True) if not hot.empty else cold
+        df = df.drop_duplicates('id', keep='last')
+    if 'ts' in df.columns:
+        df = df.sort_values('ts', kind='stable')
+    return df[wanted].reset_index(drop=True)
+
+
+# สรุปขนาดของ archive ต่อตาราง
+def archive_stats(archive_dir=None):
+    stats = {}
+    for table in SCHEMAS:
+        data = dataset(table, archive_dir)
+        if data is None:
+            continue
+        files = data.files
+        stats[table] = {
+            'files': len(files),
+            'bytes': sum(os.path.getsize(f) for f in files),
+            'rows': sum(pq.ParquetFile(f).metadata.num_rows for f in files),
+            'days': len({os.path.basename(os.path.dirname(os.path.dirname(f))) for f in files}),
+        }
+    return stats
+
+
+# python archive.py [--db network_metrics.db] [--all] [--stats] [--enable-incremental-vacuum]
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Move aged raw metrics from SQLite into the Parquet archive')
+    parser.add_argument('--db', help='database path (default: WIFI_DB_PATH or network_metrics.db)')
+    parser.add_argument('--archive-dir', help='archive directory (default: WIFI_ARCHIVE_DIR or ./archive)')
+    parser.add_argument('--retention-hours', type=int, default=RETENTION_HOURS)
+    parser.add_argument('--all', action='store_true', help='move every eligible day now (default: one day per table)')
+    parser.add_argument('--stats', action='store_true', help='print archive size and exit')
+    parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                        help='one-time VACUUM so freed pages can be returned incrementally (stop the collector first)')
+    args = parser.parse_args(argv)
+
+    if args.stats:
+        for table, stats in archive_stats(args.archive_dir).items():
+            print(f"{table}: {stats['rows']:,} rows in {stats['files']} files over {stats['days']} days "
+                  f"({stats['bytes'] / 1e6:.1f} MB)")
+        return 0
+
+    storage.ensure_schema(args.db)
+    if args.enable_incremental_vacuum:
+        print('Incremental vacuum enabled' if enable_incremental_vacuum(args.db) else 'Could not enable incremental vacuum')
+
+    started = time.perf_counter()
+    moved = compact(path=args.db, archive_dir=args.archive_dir, retention_hours=args.retention_hours,
+                    max_days=10 ** 6 if args.all else MAX_DAYS_PER_RUN)
+    print(', '.join(f'{table}: {count:,} rows archived' for table, count in moved.items()) +
+          f' in {time.perf_counter() - started:.1f}s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,17 @@
+// รับข้อมูลใหม่จาก /events (server-sent events) แล้วเขียนลง dcc.Store 'live-push'
+// callback ของกราฟถูกเรียกทันทีที่ collector เขียนแถวใหม่ แทนการ poll ทุก 10 วินาที
+// dcc.Store ไม่มี element ใน DOM จึงรอให้กราฟ render ก่อนแทน
+(function () {
+    function connect() {
+        if (!window.dash_clientside || !window.dash_clientside.set_props || !document.getElementById('wifi-graph')) {
+            setTimeout(connect, 500);
+            return;
+        }
+        // EventSource ต่อใหม่เองเมื่อหลุด (ระยะรอกำหนดด้วย retry: จากฝั่ง server)
+        var source = new EventSource('/events');
+        source.addEventListener('metrics', function (e) {
+            window.dash_clientside.set_props('live-push', {data: JSON.parse(e.data)});
+        });
+    }
+    connect();
+})();
@@ -0,0 +1,247 @@
+import argparse
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+import storage
+import archive
+import ddos_detection
+
+# กฎหนึ่งข้อ: kind เป็น 'gt' (ค่า > threshold), 'lt' (ค่า < threshold) หรือ 'change' (|ผลต่างจากแถวก่อนหน้าของ SSID เดียวกัน| > threshold)
+# threshold เป็น None = ปิดกฎนั้น
+Rule = namedtuple('Rule', ['name', 'column', 'kind', 'threshold'])
+
+# กฎเดียวกับ ddos_detection.check_ddos_rules
+DDOS_RULES = [
+    Rule('high_download', 'download_speed', 'gt', ddos_detection.HIGH_SPEED_LIMIT),
+    Rule('high_upload', 'upload_speed', 'gt', ddos_detection.HIGH_SPEED_LIMIT),
+    Rule('high_packet_loss', 'packet_loss', 'gt', ddos_detection.PACKET_LOSS_LIMIT),
+    Rule('high_device_count', 'device_count', 'gt', ddos_detection.DEVICE_COUNT_LIMIT),
+    Rule('high_latency', 'latency', 'gt', ddos_detection.LATENCY_LIMIT),
+    Rule('download_change', 'download_speed', 'change', ddos_detection.SPEED_CHANGE_LIMIT),
+    Rule('upload_change', 'upload_speed', 'change', ddos_detection.SPEED_CHANGE_LIMIT),
+    Rule('device_count_change', 'device_count', 'change', ddos_detection.DEVICE_CHANGE_LIMIT),
+]
+
+# กฎของหน้า dashboard (ค่าที่ผู้ใช้กรอก ไม่มีค่าเริ่มต้น จึงปิดไว้จนกว่าจะตั้งด้วย --set)
+DASHBOARD_RULES = [
+    Rule('dashboard_download_low', 'download_speed', 'lt', None),
+    Rule('dashboard_latency_high', 'latency', 'gt', None),
+    Rule('dashboard_packet_loss_high', 'packet_loss', 'gt', None),
+]
+
+DEFAULT_RULES = DDOS_RULES + DASHBOARD_RULES
+
+COLUMNS = ['id', 'ts', 'ssid', 'download_speed', 'upload_speed', 'latency', 'packet_loss', 'device_count']
+CHUNK_SIZE = 200000
+
+# ผลของ backtest: hits = DataFrame (ts, ssid, rule, value) ของทุกแถวที่เข้าเงื่อนไข
+BacktestResult = namedtuple('BacktestResult', ['rows', 'hits', 'load_seconds', 'eval_seconds'])
+
+
+# แทนค่า threshold ของกฎตามชื่อ เช่น {'high_latency': 0.2}
+def with_thresholds(rules, overrides):
+    unknown = set(overrides) - {rule.name for rule in rules}
+    if unknown:
+        raise ValueError(f"Unknown rule(s): {', '.join(sorted(unknown))}")
+    return [rule._replace(threshold=overrides.get(rule.name, rule.threshold)) for rule in rules]
+
+
+# อ่าน network_metrics ทีละวัน ทั้งส่วนที่ย้ายไป archive แล้วและส่วนที่ยังอยู่ใน SQLite (archive.read_history
+# ตัดแถวซ้ำด้วย id เมื่อวันนั้นย้ายไปยังไม่ครบ) รวมหลายวันจนได้อย่างน้อย chunk_size แถวต่อ chunk เรียงตาม id ในแต่ละวัน
+def load_chunks(chunk_size=CHUNK_SIZE, since=None, path=None, archive_dir=None):
+    first, last = storage.query_one('SELECT MIN(ts), MAX(ts) FROM network_metrics' + (' WHERE ts >= ?' if since is not None else ''),
+                                    (since,) if since is not None else (), path)
+    days = archive.archived_days('network_metrics', archive_dir)
+    starts = days + ([first, last] if first is not None else [])
+    if not starts:
+        return
+    day = max(min(starts), since or 0) // 86400 * 86400
+    end = max(starts) // 86400 * 86400 + 86400
+
+    pending, size = [], 0
+    while day < end:
+        df = archive.read_history('network_metrics', COLUMNS, max(day, since or day), day + 86400, path=path,
+                                  archive_dir=archive_dir)
+        day += 86400
+        if df.empty:
+            continue
+        pending.append(df.sort_values('id', kind='stable'))
+        size += len(df)
+        if size >= chunk_size:
+            yield pd.concat(pending, ignore_index=True)
+            pending, size = [], 0
+    if pending:
+        yield pd.concat(pending, ignore_index=True)
+
+
+# ประเมินกฎทั้งหมดกับหนึ่ง chunk แบบ vectorized
+# carry = แถวสุดท้ายของแต่ละ SSID จาก chunk ก่อน (ใช้คำนวณผลต่างข้ามรอยต่อ chunk) คืนค่า (hits, carry ใหม่)
+def evaluate_chunk(chunk, rules, carry=None):
+    n_carry = 0 if carry is None else len(carry)
+    df = chunk if carry is None else pd.concat([carry, chunk], ignore_index=True)
+
+    ssid = df['ssid'].fillna('unknown').astype(str).to_numpy()
+    row_id = df['id'].to_numpy(dtype=np.int64)
+    order = np.lexsort((row_id, ssid))
+    ssid = ssid[order]
+    ts = df['ts'].to_numpy(dtype=np.int64)[order]
+    fresh = order >= n_carry  # แถวจาก carry ไม่นับ hit ซ้ำ
+    same_ssid = np.zeros(len(df), dtype=bool)
+    same_ssid[1:] = ssid[1:] == ssid[:-1]
+
+    values = {}
+    for column in {rule.column for rule in rules}:
+        values[column] = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)[order]
+
+    hits = []
+    for rule in rules:
+        if rule.threshold is None:
+            continue
+        x = values[rule.column]
+        if rule.kind == 'gt':
+            value = x
+            mask = x > rule.threshold
+        elif rule.kind == 'lt':
+            value = x
+            mask = x < rule.threshold
+        else:
+            # ค่าที่หายไปนับเป็น 0 เหมือน check_ddos_rules และแถวแรกของแต่ละ SSID ไม่มีแถวก่อนหน้า
+            filled = np.nan_to_num(x, nan=0.0)
+            value = np.zeros_like(filled)
+            value[1:] = np.abs(np.diff(filled))
+            mask = same_ssid & (value > rule.threshold)
+        mask &= fresh
+        if mask.any():
+            hits.append(pd.DataFrame({'ts': ts[mask], 'ssid': ssid[mask], 'rule': rule.name, 'value': value[mask]}))
+
+    # แถวสุดท้ายของแต่ละ SSID (ssid ถูกเรียงแล้ว จึงเป็นแถวก่อนเปลี่ยน SSID)
+    last = np.append(ssid[1:] != ssid[:-1], True) if len(ssid) else np.zeros(0, dtype=bool)
+    new_carry = df.iloc[order[last]].reset_index(drop=True)
+    return hits, new_carry
+
+
+# รัน backtest ทั้งประวัติ (archive + ตารางใน SQLite)
+def run_backtest(rules=None, chunk_size=CHUNK_SIZE, since=None, path=None, archive_dir=None):
+    rules = rules or DEFAULT_RULES
+    all_hits = []
+    carry = None
+    rows = 0
+    load_seconds = eval_seconds = 0.0
+
+    chunks = load_chunks(chunk_size, since, path, archive_dir)
+    while True:
+        start = time.perf_counter()
+        chunk = next(chunks, None)
+        load_seconds += time.perf_counter() - start
+        if chunk is None:
+            break
+        start = time.perf_counter()
+        hits, carry = evaluate_chunk(chunk, rules, carry)
+        eval_seconds += time.perf_counter() - start
+        all_hits.extend(hits)
+        rows += len(chunk)
+
+    if all_hits:
+        hits = pd.concat(all_hits, ignore_index=True).sort_values(['ts', 'rule'], kind='stable', ignore_index=True)
+    else:
+        hits = pd.DataFrame({'ts': pd.Series(dtype='int64'), 'ssid': pd.Series(dtype='object'),
+                             'rule': pd.Series(dtype='object'), 'value': pd.Series(dtype='float64')})
+    return BacktestResult(rows, hits, load_seconds, eval_seconds)
+
+
+# จำนวน hit ต่อกฎ (รวมกฎที่ไม่มี hit ด้วย)
+def hit_counts(result, rules=None):
+    names = [rule.name for rule in (rules or DEFAULT_RULES) if rule.threshold is not None]
+    return result.hits['rule'].value_counts().reindex(names, fill_value=0)
+
+
+# timeline ของการแจ้งเตือน: จำนวน hit ต่อกฎในแต่ละช่วงเวลา (freq แบบ pandas เช่น '1h', '1D')
+def alert_timeline(result, freq='1D', tz='Asia/Bangkok'):
+    hits = result.hits
+    if hits.empty:
+        return pd.DataFrame()
+    when = pd.to_datetime(hits['ts'], unit='s', utc=True).dt.tz_convert(tz)
+    return hits.groupby([when.dt.floor(freq).rename('time'), 'rule']).size().unstack(fill_value=0)
+
+
+# รวม hit ที่ติดกันของกฎ/SSID เดียวกันเป็นเหตุการณ์เดียว (ห่างกันไม่เกิน gap วินาที)
+def alert_episodes(result, gap=300):
+    hits = result.hits.sort_values(['rule', 'ssid', 'ts'], kind='stable', ignore_index=True)
+    if hits.empty:
+        return pd.DataFrame(columns=['rule', 'ssid', 'start', 'end', 'hits', 'peak'])
+    key = hits['rule'] + '\0' + hits['ssid']
+    new_episode = (key != key.shift()) | (hits['ts'].diff() > gap)
+    episode = new_episode.cumsum()
+    return hits.groupby(episode).agg(
+        rule=('rule', 'first'), ssid=('ssid', 'first'), start=('ts', 'min'), end=('ts', 'max'),
+        hits=('ts', 'size'), peak=('value', 'max')).reset_index(drop=True)
+
+
+def parse_overrides(items):
+    overrides = {}
+    for item in items or []:
+        name, _, value = item.partition('=')
+        overrides[name] = None if value.lower() in ('', 'off', 'none') else float(value)
+    return overrides
+
+
+# python backtest.py [--set high_latency=0.2] [--freq 1h] [--since-days 90] [--hits-csv hits.csv]
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Backtest detection rules against network_metrics history')
+    parser.add_argument('--db', help='database path (default: WIFI_DB_PATH or network_metrics.db)')
+    parser.add_argument('--archive-dir', help='Parquet archive of aged rows (default: WIFI_ARCHIVE_DIR or ./archive)')
+    parser.add_argument('--set', action='append', metavar='RULE=VALUE',
+                        help='override a rule threshold ("off" disables it)')
+    parser.add_argument('--since-days', type=float, help='only replay the last N days')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--freq', default='1D', help='timeline bucket (pandas offset, e.g. 1h, 1D)')
+    parser.add_argument('--gap', type=int, default=300, help='seconds between hits that start a new episode')
+    parser.add_argument('--hits-csv', help='write every hit to this CSV file')
+    args = parser.parse_args(argv)
+
+    try:
+        rules = with_thresholds(DEFAULT_RULES, parse_overrides(args.set))
+    except ValueError as e:
+        parser.error(str(e))
+    since = int(time.time() - args.since_days * 86400) if args.since_days else None
+
+    storage.setup_database(args.db)
+    result = run_backtest(rules, args.chunk_size, since, args.db, args.archive_dir)
+    total = result.load_seconds + result.eval_seconds
+    print(f"Replayed {result.rows:,} rows in {total:.3f}s "
+          f"(load {result.load_seconds:.3f}s, evaluate {result.eval_seconds:.3f}s, "
+          f"{result.rows / total if total else 0:,.0f} rows/s overall, "
+          f"{result.rows / result.eval_seconds if result.eval_seconds else 0:,.0f} rows/s evaluate)")
+
+    print("\nHits per rule:")
+    counts = hit_counts(result, rules)
+    for rule in rules:
+        if rule.threshold is None:
+            continue
+        count = counts[rule.name]
+        print(f"  {rule.name:<28} threshold {rule.threshold:<12g} {count:>8,} hits "
+              f"({count / result.rows if result.rows else 0:.2%} of rows)")
+
+    episodes = alert_episodes(result, args.gap)
+    print(f"\nEpisodes (hits less than {args.gap}s apart merged): {len(episodes):,}")
+    if not episodes.empty:
+        print(episodes.groupby('rule')['hits'].agg(['count', 'median', 'max']).rename(
+            columns={'count': 'episodes', 'median': 'median_hits', 'max': 'max_hits'}).to_string())
+
+    timeline = alert_timeline(result, args.freq)
+    if not timeline.empty:
+        print(f"\nTimeline ({args.freq}):")
+        print(timeline.to_string())
+
+    if args.hits_csv:
+        result.hits.to_csv(args.hits_csv, index=False)
+        print(f"\nWrote {len(result.hits):,} hits to {args.hits_csv}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
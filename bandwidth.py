@@ -0,0 +1,187 @@
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+
+import psutil
+
+import storage
+
+SAMPLE_INTERVAL = 0.5     # วินาทีระหว่างการอ่าน counter (ต่ำกว่า 1 วินาทีได้)
+SUMMARY_INTERVAL = 10     # วินาทีต่อหนึ่งแถวใน interface_rates
+COUNTER_WIDTHS = (1 << 32, 1 << 64)  # counter ของ NIC เป็น 32 หรือ 64 บิตแล้วแต่ไดรเวอร์
+MAX_RATE = 10e9 / 8       # bytes/s ที่เป็นไปได้สูงสุด (10 Gbps) ใช้แยก wraparound ออกจาก reset
+
+# ความเร็วลิงก์ (Mbps) เมื่อระบบไม่รายงาน (เช่น Wi-Fi บน Linux มักได้ 0) ตั้งด้วย WIFI_LINK_SPEED_MBPS
+DEFAULT_LINK_SPEED = float(os.environ.get('WIFI_LINK_SPEED_MBPS', 0)) or None
+
+COUNTER_FIELDS = ('bytes_sent', 'bytes_recv', 'packets_sent', 'packets_recv')
+
+# อัตราของหนึ่ง NIC (bytes/s, packets/s) utilization เป็น % ของ link speed (None = ไม่ทราบ)
+InterfaceRate = namedtuple('InterfaceRate', [
+    'interface', 'ts', 'interval', 'rx_bytes', 'tx_bytes', 'rx_packets', 'tx_packets',
+    'peak_rx_bytes', 'peak_tx_bytes', 'utilization', 'link_speed'])
+
+
+# ผลต่างของ counter ที่อาจวนรอบ (wraparound) หรือถูก reset (เช่น interface down/up)
+def counter_delta(previous, current, elapsed):
+    if current >= previous:
+        return current - previous
+    limit = MAX_RATE * max(elapsed, 1e-3)
+    for width in COUNTER_WIDTHS:
+        if previous < width:
+            wrapped = width - previous + current
+            if wrapped <= limit:
+                return wrapped
+    # ค่าลดลงมากเกินกว่าจะเป็น wraparound ถือว่า counter เริ่มนับใหม่จาก 0
+    return current
+
+
+def utilization(rx_rate, tx_rate, link_speed):
+    if not link_speed:
+        return None
+    return max(rx_rate, tx_rate) * 8 / (link_speed * 1e6) * 100
+
+
+# หา interface หลัก: WIFI_IFACE, interface ของ default route หรือ interface ที่รับข้อมูลมากที่สุด
+def primary_interface(counters):
+    name = os.environ.get('WIFI_IFACE')
+    if name in counters:
+        return name
+    try:
+        with open('/proc/net/route') as f:
+            for line in f.readlines()[1:]:
+                fields = line.split()
+                if fields[1] == '00000000' and fields[0] in counters:
+                    return fields[0]
+    except (OSError, IndexError):
+        pass
+    candidates = {nic: c for nic, c in counters.items() if not nic.startswith('lo') and nic != 'Loopback Pseudo-Interface 1'}
+    if not candidates:
+        return None
+    return max(candidates, key=lambda nic: candidates[nic].bytes_recv)
+
+
+# ตัวอ่าน counter ของทุก NIC ความถี่สูง: สะสมผลต่างต่อ NIC แล้วสรุปเป็นอัตราเฉลี่ยและ peak ทุก summary_interval
+class RateSampler:
+    def __init__(self, sample_interval=SAMPLE_INTERVAL, summary_interval=SUMMARY_INTERVAL, on_summary=None,
+                 link_speeds=None, read_counters=None, read_stats=None, clock=time.monotonic):
+        self.sample_interval = sample_interval
+        self.summary_interval = summary_interval
+        self.on_summary = on_summary
+        self.link_speeds = link_speeds or {}
+        self._read_counters = read_counters or (lambda: psutil.net_io_counters(pernic=True, nowrap=False))
+        self._read_stats = read_stats or psutil.net_if_stats
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._last = {}        # nic -> (เวลา, tuple ของ counter)
+        self._totals = {}      # nic -> [rx_bytes, tx_bytes, rx_packets, tx_packets, peak_rx, peak_tx]
+        self._window_start = None
+        self.latest = {}       # nic -> InterfaceRate ของช่วงล่าสุดที่ปิดแล้ว
+        self.primary = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='bandwidth-sampler', daemon=True)
+
+    def _link_speed(self, nic, stats):
+        if nic in self.link_speeds:
+            return self.link_speeds[nic]
+        speed = stats[nic].speed if nic in stats else 0
+        return speed or DEFAULT_LINK_SPEED
+
+    # อ่าน counter หนึ่งครั้ง คืนค่ารายการ InterfaceRate ถ้าครบช่วงสรุป
+    def sample(self):
+        now = self._clock()
+        counters = self._read_counters()
+        with self._lock:
+            if self.primary is None or self.primary not in counters:
+                self.primary = primary_interface(counters)
+            if self._window_start is None:
+                self._window_start = now
+            for nic, c in counters.items():
+                values = tuple(getattr(c, field) for field in COUNTER_FIELDS)
+                previous = self._last.get(nic)
+                self._last[nic] = (now, values)
+                if previous is None:
+                    continue
+                elapsed = now - previous[0]
+                if elapsed <= 0:
+                    continue
+                sent, recv, packets_sent, packets_recv = (
+                    counter_delta(old, new, elapsed) for old, new in zip(previous[1], values))
+                totals = self._totals.setdefault(nic, [0, 0, 0, 0, 0.0, 0.0])
+                totals[0] += recv
+                totals[1] += sent
+                totals[2] += packets_recv
+                totals[3] += packets_sent
+                totals[4] = max(totals[4], recv / elapsed)
+                totals[5] = max(totals[5], sent / elapsed)
+
+            if now - self._window_start < self.summary_interval:
+                return []
+            return self._close_window(now)
+
+    def _close_window(self, now):
+        elapsed = now - self._window_start
+        self._window_start = now
+        stats = self._read_stats()
+        ts = int(time.time())
+        rates = []
+        for nic, (rx, tx, rx_packets, tx_packets, peak_rx, peak_tx) in self._totals.items():
+            speed = self._link_speed(nic, stats)
+            rx_rate, tx_rate = rx / elapsed, tx / elapsed
+            rates.append(InterfaceRate(nic, ts, elapsed, rx_rate, tx_rate, rx_packets / elapsed, tx_packets / elapsed,
+                                       peak_rx, peak_tx, utilization(rx_rate, tx_rate, speed), speed))
+        self._totals = {}
+        for rate in rates:
+            self.latest[rate.interface] = rate
+        return rates
+
+    # อัตราล่าสุดของ interface หลัก (หรือที่ระบุ) อ่านได้ทันที
+    def current(self, nic=None):
+        with self._lock:
+            return self.latest.get(nic or self.primary)
+
+    def _run(self):
+        while not self._stop.wait(self.sample_interval):
+            try:
+                rates = self.sample()
+                if rates and self.on_summary is not None:
+                    self.on_summary(rates)
+            except Exception as e:
+                print(f"Bandwidth sampler error: {e}")
+
+    def start(self):
+        self.sample()  # ค่าเริ่มต้นของ counter
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+INSERT_RATE_SQL = '''
+    INSERT INTO interface_rates (ts, interface, interval, rx_bytes, tx_bytes, rx_packets, tx_packets,
+                                 peak_rx_bytes, peak_tx_bytes, utilization, link_speed)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+# บันทึกอัตราของทุก NIC ในช่วงเดียวกันใน transaction เดียว
+def save_rates(rates, path=None):
+    storage.executemany_write(INSERT_RATE_SQL, [
+        (r.ts, r.interface, r.interval, r.rx_bytes, r.tx_bytes, r.rx_packets, r.tx_packets,
+         r.peak_rx_bytes, r.peak_tx_bytes, r.utilization, r.link_speed) for r in rates], path)
+
+
+# แสดงอัตราของทุก NIC: python bandwidth.py [sample_interval] [summary_interval]
+if __name__ == '__main__':
+    sample_interval = float(sys.argv[1]) if len(sys.argv) > 1 else SAMPLE_INTERVAL
+    summary_interval = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+    sampler = RateSampler(sample_interval, summary_interval)
+    sampler.sample()
+    while True:
+        time.sleep(sample_interval)
+        for r in sampler.sample():
+            util = f"{r.utilization:.1f}%" if r.utilization is not None else '-'
+            print(f"{r.interface:<12} rx {r.rx_bytes * 8 / 1e6:8.2f} Mbps ({r.rx_packets:7.0f} pps)  "
+                  f"tx {r.tx_bytes * 8 / 1e6:8.2f} Mbps ({r.tx_packets:7.0f} pps)  util {util}")
@@ -0,0 +1,266 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(BASE_DIR, 'fixtures', 'scans')
+
+REPEAT = 5
+WARMUP = 1
+PARSE_LOOPS = 200          # จำนวนครั้งที่ parse ไฟล์ตัวอย่างต่อหนึ่ง sample (ไฟล์เล็กเกินกว่าจะจับเวลาทีละครั้ง)
+DETECTOR_ROWS = 10000      # แถวที่ป้อนให้ StreamingDetector ต่อหนึ่ง sample
+TOLERANCE = 0.2            # median ช้ากว่า baseline เกินสัดส่วนนี้ถือว่า regression
+
+
+def _dash_request(output, outputs, inputs, state=(), changed=()):
+    outputs = [{'id': i, 'property': p} for i, p in outputs]
+    return {
+        'output': output,
+        'outputs': outputs if len(outputs) > 1 else outputs[0],
+        'inputs': [{'id': i, 'property': p, 'value': v} for i, p, v in inputs],
+        'state': [{'id': i, 'property': p, 'value': v} for i, p, v in state],
+        'changedPropIds': list(changed),
+    }
+
+
+def graph_request(graph_state=None, trigger='interval-update.n_intervals', data_type='latency', time_range=24 * 3600):
+    return _dash_request(
+        '..wifi-graph.figure...alert-message.children...alert-message.is_open...graph-state.data..',
+        [('wifi-graph', 'figure'), ('alert-message', 'children'), ('alert-message', 'is_open'), ('graph-state', 'data')],
+        [('wifi-ssid-dropdown', 'value', 'All'), ('probe-dropdown', 'value', None), ('data-type-radio', 'value', data_type),
+         ('time-range-dropdown', 'value', time_range), ('interval-update', 'n_intervals', 1),
+         ('live-push', 'data', {'id': 0} if trigger.startswith('live-push') else None)],
+        [('threshold-download', 'value', None), ('threshold-latency', 'value', None),
+         ('threshold-packet-loss', 'value', None), ('graph-state', 'data', graph_state), ('graph-width', 'data', 1200)],
+        [trigger])
+
+
+def ssid_options_request():
+    return _dash_request(
+        'wifi-ssid-dropdown.options', [('wifi-ssid-dropdown', 'options')],
+        [('interval-update', 'n_intervals', 1), ('live-push', 'data', None)],
+        [('wifi-ssid-dropdown', 'options', None)], ['interval-update.n_intervals'])
+
+
+# ชุด benchmark: ชื่อ -> ฟังก์ชันที่รับ context แล้วคืนค่า (ฟังก์ชันที่จะจับเวลา, จำนวนรอบ หรือ None = ค่าปกติ)
+# ทุกตัวเรียกโค้ดจริงของ dashboard/collector กับฐานข้อมูลที่ระบุ และล้าง query cache ก่อนทุกครั้ง
+def build_suite(ctx):
+    app, storage = ctx['app'], ctx['storage']
+    now = int(time.time())
+    client = app.app.server.test_client()
+    ssid = ctx['ssid']
+
+    def uncached(fn):
+        def run():
+            app.query_cache.invalidate()
+            return fn()
+        return run
+
+    def post(payload):
+        response = client.post('/_dash-update-component', json=payload)
+        if response.status_code != 200:
+            raise RuntimeError(f'HTTP {response.status_code}: {response.data[:200]!r}')
+        return response
+
+    full = post(graph_request()).get_json()['response']['graph-state']['data']
+    # state ของกราฟที่วาดไปแล้ว 5 นาทีก่อน: รอบ incremental จึงดึงแถวใหม่ของ 5 นาทีล่าสุด
+    incremental_state = dict(full, raw_hwm=full['raw_hwm'] - 300, hwm=full['hwm'] - 300)
+
+    import scanners
+    import ddos_detection
+    import rf_analytics
+    fixtures = {}
+    for name, parser in [('iw_scan.txt', scanners.parse_iw), ('nmcli_wifi.txt', scanners.parse_nmcli),
+                         ('netsh_networks.txt', scanners.parse_netsh_networks)]:
+        with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+            fixtures[name] = (parser, f.read())
+    detector_rows = [dict(zip(['id', 'ts', 'ssid', 'download_speed', 'upload_speed', 'latency', 'packet_loss', 'device_count'], row))
+                     for row in storage.query('''
+                         SELECT id, ts, ssid, download_speed, upload_speed, latency, packet_loss, device_count
+                         FROM network_metrics ORDER BY id DESC LIMIT ?''', (DETECTOR_ROWS,))][::-1]
+
+    def parse(parser, text):
+        def run():
+            for _ in range(PARSE_LOOPS):
+                parser(text)
+        return run
+
+    def streaming_detector():
+        detector = ddos_detection.StreamingDetector()
+        for row in detector_rows:
+            detector.process(row)
+        return detector.processed
+
+    return {
+        'get_data_from_db.all_24h': (uncached(lambda: app.get_data_from_db(None, now - 24 * 3600)), None),
+        'get_data_from_db.ssid_1h': (uncached(lambda: app.get_data_from_db([ssid], now - 3600)), None),
+        'create_graph.raw_24h': (uncached(lambda: app.create_graph('latency', 'Latency', 'Latency', None, 24 * 3600, 1200)), None),
+        'create_graph.rollup_30d': (uncached(lambda: app.create_graph('latency', 'Latency', 'Latency', None, 30 * 24 * 3600, 1200)), None),
+        'update_graph_and_alert.full_24h': (uncached(lambda: post(graph_request())), None),
+        'update_graph_and_alert.full_7d': (uncached(lambda: post(graph_request(time_range=7 * 24 * 3600))), None),
+        'update_graph_and_alert.incremental': (uncached(lambda: post(graph_request(incremental_state, 'live-push.data'))), None),
+        'update_ssid_options': (uncached(lambda: post(ssid_options_request())), None),
+        'rf.channel_heatmap_7d': (lambda: rf_analytics.channel_heatmap(now - 7 * 24 * 3600, '5 GHz'), None),
+        'rf.neighbours_7d': (lambda: rf_analytics.neighbours(now - 7 * 24 * 3600), None),
+        'scan_parse.iw': (parse(*fixtures['iw_scan.txt']), None),
+        'scan_parse.nmcli': (parse(*fixtures['nmcli_wifi.txt']), None),
+        'scan_parse.netsh': (parse(*fixtures['netsh_networks.txt']), None),
+        'detect_ddos.latest_row': (ddos_detection.detect_ddos, None),
+        'detect_ddos.streaming_10k': (streaming_detector, None),
+        'delete_old_data': (None, 1),   # แก้ข้อมูล จึงรันกับสำเนาของฐานข้อมูล (ดู run_delete_old_data)
+    }
+
+
+# delete_old_data แก้ข้อมูลจริง: แต่ละ sample ทำสำเนาฐานข้อมูลและ archive ใหม่ (ไม่นับเวลาทำสำเนา)
+def run_delete_old_data(ctx, repeat):
+    import metrics_collector
+    import archive
+    storage = ctx['storage']
+    samples = []
+    original, original_archive = storage.DB_NAME, archive.ARCHIVE_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(repeat):
+            copy = os.path.join(tmp, f'copy{i}.db')
+            source = sqlite3.connect(ctx['db'])
+            target = sqlite3.connect(copy)
+            source.backup(target)
+            source.close()
+            target.close()
+            storage.DB_NAME = copy
+            archive.ARCHIVE_DIR = os.path.join(tmp, f'archive{i}')
+            try:
+                start = time.perf_counter()
+                metrics_collector.delete_old_data()
+                samples.append(time.perf_counter() - start)
+            finally:
+                storage.close_connection(copy)
+                storage.DB_NAME, archive.ARCHIVE_DIR = original, original_archive
+    return samples
+
+
+def measure(fn, repeat, warmup=WARMUP):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        'median': statistics.median(ordered),
+        'min': ordered[0],
+        'max': ordered[-1],
+        'mean': statistics.fmean(ordered),
+        'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'stdev': statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        'repeat': len(ordered),
+        'unit': 's',
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def describe_db(path, storage):
+    tables = ['network_metrics', 'metrics', 'alerts', 'network_rollups']
+    return {
+        'path': path,
+        'bytes': os.path.getsize(path),
+        'rows': {table: storage.query_one(f'SELECT COUNT(*) FROM {table}')[0] for table in tables},
+    }
+
+
+# เทียบ median กับผลรอบก่อน คืนค่ารายชื่อ benchmark ที่ช้าลงเกิน tolerance
+def compare(results, baseline, tolerance=TOLERANCE):
+    regressions = []
+    print(f"\n{'benchmark':40s} {'baseline':>10s} {'current':>10s} {'change':>8s}")
+    for name, current in results.items():
+        before = baseline.get('results', {}).get(name)
+        if before is None:
+            continue
+        change = current['median'] / before['median'] - 1 if before['median'] else 0.0
+        flag = ''
+        if change > tolerance:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:40s} {before['median'] * 1000:9.2f}ms {current['median'] * 1000:9.2f}ms {change:+7.1%}{flag}")
+    return regressions
+
+
+# python bench.py --db /tmp/load.db [--output results.json] [--compare baseline.json] [--filter create_graph]
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time the dashboard and collector hot paths against a database')
+    parser.add_argument('--db', required=True, help='database to benchmark (e.g. one made by synthetic.py)')
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--filter', action='append', help='only run benchmarks whose name contains this text')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='baseline JSON from an earlier run; exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+
+    # ต้องตั้งก่อน import โมดูลที่อ่าน WIFI_DB_PATH
+    db = os.path.abspath(args.db)
+    os.environ['WIFI_DB_PATH'] = db
+    import storage
+    import app
+    storage.ensure_schema()
+
+    top_ssid = storage.query_one('SELECT ssid FROM network_metrics GROUP BY ssid ORDER BY COUNT(*) DESC LIMIT 1')
+    ctx = {'db': db, 'app': app, 'storage': storage, 'ssid': top_ssid[0] if top_ssid else None}
+    suite = build_suite(ctx)
+    selected = [name for name in suite if not args.filter or any(text in name for text in args.filter)]
+
+    results = {}
+    for name in selected:
+        fn, repeat = suite[name]
+        repeat = repeat or args.repeat
+        samples = run_delete_old_data(ctx, repeat) if name == 'delete_old_data' else measure(fn, repeat)
+        results[name] = summarize(samples)
+        stats = results[name]
+        print(f"{name:40s} median {stats['median'] * 1000:9.2f} ms  min {stats['min'] * 1000:9.2f} ms  "
+              f"p95 {stats['p95'] * 1000:9.2f} ms  (n={stats['repeat']})")
+
+    report = {
+        'suite': 'wifi-analyzer',
+        'format': 1,
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'git': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'db': describe_db(db, storage),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
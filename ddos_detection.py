@@ -1,18 +1,17 @@
-import sqlite3
+import json
+import os
+import queue
+import threading
 import time
+import storage
 
 # ฟังก์ชันในการเชื่อมต่อกับฐานข้อมูลและดึงข้อมูล
 def fetch_network_metrics():
-    conn = sqlite3.connect('network_metrics.db')
-    cursor = conn.cursor()
-
     # ดึงข้อมูลจากตาราง network_metrics
-    cursor.execute('''
-        SELECT * FROM network_metrics ORDER BY timestamp DESC LIMIT 1
+    result = storage.query_one('''
+        SELECT timestamp, download_speed, upload_speed, latency, packet_loss, bytes_sent, bytes_recv, device_count, ssid
+        FROM network_metrics ORDER BY ts DESC LIMIT 1
     ''')
-    result = cursor.fetchone()
-    
-    conn.close()
     
     if result:
         # ถ้ามีข้อมูลจะส่งค่าที่ดึงมาให้
@@ -22,62 +21,333 @@ def fetch_network_metrics():
         # ถ้าไม่พบข้อมูล
         return None
 
-# ฟังก์ชันในการตรวจจับ DDoS โดยใช้ข้อมูลจากฐานข้อมูล
-def detect_ddos():
-    metrics = fetch_network_metrics()
-    
-    if not metrics:
-        return ["No metrics available"]
-    
-    download_speed, upload_speed, latency, packet_loss, bytes_sent, bytes_recv, device_count = metrics
+# ค่า threshold ของกฎ (ใช้ร่วมกับ backtest.py)
+HIGH_SPEED_LIMIT = 1e9      # bps (1 Gbps)
+PACKET_LOSS_LIMIT = 0.5     # สัดส่วน (50%)
+DEVICE_COUNT_LIMIT = 50     # เครื่อง
+LATENCY_LIMIT = 0.2         # วินาที (200 ms) หน่วยเดียวกับคอลัมน์ latency
+SPEED_CHANGE_LIMIT = 1e8    # bps (100 Mbps)
+DEVICE_CHANGE_LIMIT = 10    # เครื่อง
+
+# ตรวจกฎแบบ threshold กับข้อมูลหนึ่งแถว (dict) โดยเทียบกับแถวก่อนหน้า (ถ้ามี)
+def check_ddos_rules(metrics, previous=None):
+    download_speed = metrics.get("download_speed") or 0
+    upload_speed = metrics.get("upload_speed") or 0
+    latency = metrics.get("latency")
+    packet_loss = metrics.get("packet_loss") or 0
+    device_count = metrics.get("device_count") or 0
     alerts = []
 
     # การตรวจจับพฤติกรรมผิดปกติ:
     # 1. ตรวจจับแบนด์วิดธ์สูง (Bandwidth Utilization)
-    if download_speed > 1e9:  # ถ้าแบนด์วิดธ์ดาวน์โหลดเกิน 1 Gbps
+    if download_speed > HIGH_SPEED_LIMIT:  # ถ้าแบนด์วิดธ์ดาวน์โหลดเกิน 1 Gbps
         alerts.append("Detected potential DDoS: High download speed")
-    if upload_speed > 1e9:  # ถ้าแบนด์วิดธ์อัพโหลดเกิน 1 Gbps
+    if upload_speed > HIGH_SPEED_LIMIT:  # ถ้าแบนด์วิดธ์อัพโหลดเกิน 1 Gbps
         alerts.append("Detected potential DDoS: High upload speed")
 
     # 2. ตรวจจับการสูญเสียแพ็กเก็ต (Packet Loss)
-    if packet_loss > 0.5:  # ถ้าการสูญเสียแพ็กเก็ตเกิน 50%
+    if packet_loss > PACKET_LOSS_LIMIT:  # ถ้าการสูญเสียแพ็กเก็ตเกิน 50%
         alerts.append(f"Detected potential DDoS: High packet loss ({packet_loss:.2%})")
     
     # 3. ตรวจจับจำนวนอุปกรณ์ที่เชื่อมต่อ (Device Count)
-    if device_count > 50:  # ถ้าจำนวนอุปกรณ์เชื่อมต่อเกิน 50 เครื่อง
+    if device_count > DEVICE_COUNT_LIMIT:  # ถ้าจำนวนอุปกรณ์เชื่อมต่อเกิน 50 เครื่อง
         alerts.append("Detected potential DDoS: High number of devices on the network")
     
     # 4. ตรวจจับ Latency สูง (Latency)
-    if latency > 200:  # ถ้า Latency เกิน 200 ms
-        alerts.append(f"Detected potential DDoS: High latency ({latency} ms)")
+    if latency is not None and latency > LATENCY_LIMIT:  # ถ้า Latency เกิน 200 ms
+        alerts.append(f"Detected potential DDoS: High latency ({latency * 1000:.0f} ms)")
     
     # 5. การตรวจจับการเปลี่ยนแปลงในเวลาที่รวดเร็ว (Rate of Change Detection)
-    # บันทึกค่าเก่าจากการตรวจจับครั้งก่อนหน้า
-    if hasattr(detect_ddos, "previous_metrics"):
-        prev_metrics = detect_ddos.previous_metrics
-        download_speed_change = abs(download_speed - prev_metrics["download_speed"])
-        upload_speed_change = abs(upload_speed - prev_metrics["upload_speed"])
-        device_count_change = abs(device_count - prev_metrics["device_count"])
-
-        if download_speed_change > 1e8:  # ถ้าแบนด์วิดธ์ดาวน์โหลดเปลี่ยนแปลงเกิน 100 Mbps
+    if previous is not None:
+        download_speed_change = abs(download_speed - (previous.get("download_speed") or 0))
+        upload_speed_change = abs(upload_speed - (previous.get("upload_speed") or 0))
+        device_count_change = abs(device_count - (previous.get("device_count") or 0))
+
+        if download_speed_change > SPEED_CHANGE_LIMIT:  # ถ้าแบนด์วิดธ์ดาวน์โหลดเปลี่ยนแปลงเกิน 100 Mbps
             alerts.append("Detected rapid change in download speed")
         
-        if upload_speed_change > 1e8:  # ถ้าแบนด์วิดธ์อัพโหลดเปลี่ยนแปลงเกิน 100 Mbps
+        if upload_speed_change > SPEED_CHANGE_LIMIT:  # ถ้าแบนด์วิดธ์อัพโหลดเปลี่ยนแปลงเกิน 100 Mbps
             alerts.append("Detected rapid change in upload speed")
         
-        if device_count_change > 10:  # ถ้าจำนวนอุปกรณ์เปลี่ยนแปลงเกิน 10 เครื่องในช่วงเวลาสั้นๆ
+        if device_count_change > DEVICE_CHANGE_LIMIT:  # ถ้าจำนวนอุปกรณ์เปลี่ยนแปลงเกิน 10 เครื่องในช่วงเวลาสั้นๆ
             alerts.append("Detected rapid change in device count")
+
+    return alerts
+
+# ฟังก์ชันในการตรวจจับ DDoS โดยใช้ข้อมูลจากฐานข้อมูล
+def detect_ddos():
+    metrics = fetch_network_metrics()
     
-    # บันทึกข้อมูลการตรวจจับครั้งล่าสุด
-    detect_ddos.previous_metrics = {
+    if not metrics:
+        return ["No metrics available"]
+    
+    download_speed, upload_speed, latency, packet_loss, bytes_sent, bytes_recv, device_count = metrics
+    current = {
         "download_speed": download_speed,
         "upload_speed": upload_speed,
+        "latency": latency,
+        "packet_loss": packet_loss,
         "device_count": device_count
     }
+    alerts = check_ddos_rules(current, getattr(detect_ddos, "previous_metrics", None))
+
+    # บันทึกข้อมูลการตรวจจับครั้งล่าสุด
+    detect_ddos.previous_metrics = current
 
     return alerts
 
-# ทดสอบการตรวจจับ DDoS
-alerts = detect_ddos()
-for alert in alerts:
-    print(alert)
+
+# ---- ตัวตรวจจับแบบ streaming (sliding window ต่อ SSID) ----
+
+# คอลัมน์ที่ใช้ตรวจจับความผิดปกติทางสถิติ
+DETECTOR_METRICS = ['download_speed', 'upload_speed', 'latency', 'packet_loss', 'device_count']
+
+WINDOW_SIZE = 60         # จำนวนตัวอย่างใน ring buffer ต่อ metric (60 นาทีที่รอบ 60 วินาที)
+WARMUP_SAMPLES = 10      # ต้องมีตัวอย่างอย่างน้อยเท่านี้ก่อนเริ่มแจ้งเตือน
+EWMA_ALPHA = 0.1         # น้ำหนักของค่าใหม่ใน EWMA
+EWMA_LIMIT = 4.0         # แจ้งเตือนเมื่อห่างจาก EWMA เกินกี่เท่าของส่วนเบี่ยงเบน
+Z_THRESHOLD = 4.0        # แจ้งเตือนเมื่อ |z-score| ของ window เกินค่านี้
+CUSUM_K = 0.5            # ค่าเผื่อ (หน่วย z) ของ CUSUM
+CUSUM_H = 5.0            # ขีดแจ้งเตือนของ CUSUM (หน่วย z)
+MIN_STD = 1e-9           # กันหารด้วยศูนย์เมื่อค่าคงที่
+MIN_STD_RATIO = 0.05     # ส่วนเบี่ยงเบนขั้นต่ำเทียบกับ |ค่าเฉลี่ย|
+
+# ส่วนเบี่ยงเบนขั้นต่ำของแต่ละ metric (หน่วยเดียวกับคอลัมน์) ใช้แทน std จริงเมื่อ window แทบคงที่
+# เช่น packet_loss เป็น 0 ตลอด แล้วเสีย 1% ครั้งเดียว ไม่ควรได้ z-score เป็นล้าน
+METRIC_MIN_STD = {
+    'download_speed': 1e6,  # bps
+    'upload_speed': 1e6,    # bps
+    'latency': 0.005,       # วินาที
+    'packet_loss': 0.02,    # สัดส่วน
+    'device_count': 1.0,    # เครื่อง
+}
+
+CHECKPOINT_FILE = 'ddos_detector_state.json'
+CHECKPOINT_VERSION = 2     # 2: state แยกตาม (probe_id, ssid)
+CHECKPOINT_INTERVAL = 300  # วินาที
+
+
+# สถิติแบบ rolling ของ metric หนึ่งตัว: ring buffer ขนาดคงที่ + ผลรวม จึงอัปเดต O(1) ต่อตัวอย่าง
+class RollingStats:
+    def __init__(self, size=WINDOW_SIZE):
+        self.size = size
+        self.buffer = [0.0] * size
+        self.index = 0
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.ewma = None
+        self.ewm_var = 0.0
+        self.cusum_high = 0.0
+        self.cusum_low = 0.0
+
+    def mean_std(self):
+        if self.count == 0:
+            return 0.0, 0.0
+        mean = self.total / self.count
+        var = max(0.0, self.total_sq / self.count - mean * mean)
+        return mean, var ** 0.5
+
+    # ใส่ค่าใหม่ คืนค่ารายการวิธีที่พบความผิดปกติ (คำนวณจาก window ก่อนใส่ค่านี้)
+    # min_std = ส่วนเบี่ยงเบนขั้นต่ำของ metric นี้ (ดู METRIC_MIN_STD)
+    def update(self, x, min_std=0.0):
+        anomalies = []
+        mean, std = self.mean_std()
+        if self.count >= WARMUP_SAMPLES:
+            floor = max(MIN_STD, min_std, MIN_STD_RATIO * abs(mean))
+            z = (x - mean) / max(std, floor)
+            if abs(z) > Z_THRESHOLD:
+                anomalies.append(f"z-score {z:+.1f}")
+
+            ewm_std = max(self.ewm_var ** 0.5, floor)
+            if abs(x - self.ewma) > EWMA_LIMIT * ewm_std:
+                anomalies.append(f"EWMA deviation (expected ~{self.ewma:.4g})")
+
+            # CUSUM สองทาง จับการเลื่อนระดับเล็ก ๆ ที่ต่อเนื่อง
+            z = max(-Z_THRESHOLD * 2, min(Z_THRESHOLD * 2, z))
+            self.cusum_high = max(0.0, self.cusum_high + z - CUSUM_K)
+            self.cusum_low = max(0.0, self.cusum_low - z - CUSUM_K)
+            if self.cusum_high > CUSUM_H:
+                anomalies.append("CUSUM upward shift")
+                self.cusum_high = 0.0
+            if self.cusum_low > CUSUM_H:
+                anomalies.append("CUSUM downward shift")
+                self.cusum_low = 0.0
+
+        # EWMA ของค่าเฉลี่ยและความแปรปรวน
+        if self.ewma is None:
+            self.ewma = x
+        else:
+            diff = x - self.ewma
+            self.ewma += EWMA_ALPHA * diff
+            self.ewm_var = (1 - EWMA_ALPHA) * (self.ewm_var + EWMA_ALPHA * diff * diff)
+
+        # ring buffer: ค่าที่ถูกแทนที่ออกจากผลรวม
+        if self.count == self.size:
+            old = self.buffer[self.index]
+            self.total -= old
+            self.total_sq -= old * old
+        else:
+            self.count += 1
+        self.buffer[self.index] = x
+        self.total += x
+        self.total_sq += x * x
+        self.index = (self.index + 1) % self.size
+        return anomalies
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls(data['size'])
+        stats.__dict__.update(data)
+        return stats
+
+
+# ตัวตรวจจับแบบ streaming: รับแถว network_metrics ทีละแถว เก็บสถิติแยกตาม (probe, SSID)
+# ใน fleet แต่ละ probe เห็น SSID เดียวกันจากคนละที่ จึงต้องไม่ปนกัน (เครื่องเดียว probe_id เป็น '')
+class StreamingDetector:
+    def __init__(self, metrics=DETECTOR_METRICS, window=WINDOW_SIZE):
+        self.metrics = metrics
+        self.window = window
+        self.stats = {}     # (probe_id, ssid) -> {metric: RollingStats}
+        self.previous = {}  # (probe_id, ssid) -> แถวก่อนหน้า (ใช้กับกฎ rate of change)
+        self.last_id = 0    # id ของแถวล่าสุดที่ประมวลผลแล้ว
+        self.processed = 0
+
+    # ประมวลผลหนึ่งแถว (dict ที่มี ssid, probe_id และคอลัมน์ metric) คืนค่ารายการข้อความแจ้งเตือน
+    def process(self, row):
+        ssid = row.get('ssid') or 'unknown'
+        probe_id = row.get('probe_id') or ''
+        key = (probe_id, ssid)
+        label = f"{probe_id}/{ssid}" if probe_id else ssid
+        alerts = [f"[{label}] {alert}" for alert in check_ddos_rules(row, self.previous.get(key))]
+        self.previous[key] = {metric: row.get(metric) for metric in self.metrics}
+
+        per_metric = self.stats.setdefault(key, {})
+        for metric in self.metrics:
+            value = row.get(metric)
+            if value is None:
+                continue
+            stats = per_metric.get(metric)
+            if stats is None:
+                stats = per_metric[metric] = RollingStats(self.window)
+            anomalies = stats.update(float(value), METRIC_MIN_STD.get(metric, 0.0))
+            if anomalies:
+                alerts.append(f"[{label}] Anomaly in {metric} ({value:.4g}): {', '.join(anomalies)}")
+
+        self.last_id = max(self.last_id, row.get('id') or 0)
+        self.processed += 1
+        return alerts
+
+    # JSON ใช้ tuple เป็น key ไม่ได้ จึงเก็บเป็น {probe_id: {ssid: ...}}
+    def to_dict(self):
+        previous, stats = {}, {}
+        for (probe_id, ssid), row in self.previous.items():
+            previous.setdefault(probe_id, {})[ssid] = row
+        for (probe_id, ssid), per_metric in self.stats.items():
+            stats.setdefault(probe_id, {})[ssid] = {metric: s.to_dict() for metric, s in per_metric.items()}
+        return {
+            'version': CHECKPOINT_VERSION,
+            'window': self.window,
+            'last_id': self.last_id,
+            'previous': previous,
+            'stats': stats,
+        }
+
+    # บันทึก state ลงไฟล์ (เขียนไฟล์ชั่วคราวแล้ว rename กันไฟล์เสียกลางทาง)
+    def checkpoint(self, path=CHECKPOINT_FILE):
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=CHECKPOINT_FILE):
+        detector = cls()
+        if not os.path.exists(path):
+            return detector
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable detector checkpoint {path}: {e}")
+            return detector
+        detector.window = data.get('window', WINDOW_SIZE)
+        detector.last_id = data.get('last_id', 0)
+        previous, stats = data.get('previous', {}), data.get('stats', {})
+        # checkpoint รุ่นเก่าเก็บแค่ ssid -> ... ถือว่าเป็นของเครื่องนี้ (probe_id '')
+        if data.get('version', 1) < 2:
+            previous, stats = {'': previous}, {'': stats}
+        detector.previous = {(probe_id, ssid): row for probe_id, per_ssid in previous.items()
+                             for ssid, row in per_ssid.items()}
+        detector.stats = {(probe_id, ssid): {metric: RollingStats.from_dict(s) for metric, s in per_metric.items()}
+                          for probe_id, per_ssid in stats.items() for ssid, per_metric in per_ssid.items()}
+        return detector
+
+
+# แหล่งข้อมูลแบบ queue: collector ส่งแถวที่เพิ่งบันทึกเข้ามาโดยตรง ไม่ต้อง query ฐานข้อมูล
+# ส่ง None เข้า queue เพื่อหยุด
+def rows_from_queue(q):
+    while True:
+        row = q.get()
+        if row is None:
+            return
+        yield row
+
+
+# แหล่งข้อมูลจากฐานข้อมูล: อ่านเฉพาะแถวที่ id มากกว่าแถวล่าสุดที่เคยอ่าน (ใช้ตอนรันแยก process)
+def rows_from_db(after_id=0, poll_interval=5.0, stop=None):
+    names = ['id', 'ts', 'ssid', 'probe_id'] + DETECTOR_METRICS
+    while stop is None or not stop.is_set():
+        rows = storage.query(f"SELECT {', '.join(names)} FROM network_metrics WHERE id > ? ORDER BY id LIMIT 1000", (after_id,))
+        for row in rows:
+            after_id = row[0]
+            yield dict(zip(names, row))
+        if not rows:
+            time.sleep(poll_interval)
+
+
+# รันตัวตรวจจับเป็น service ต่อเนื่อง: ประมวลผลทุกแถวจาก source และ checkpoint เป็นระยะ
+def run_detector(source, detector, on_alert=print, checkpoint_path=CHECKPOINT_FILE,
+                 checkpoint_interval=CHECKPOINT_INTERVAL):
+    last_checkpoint = time.monotonic()
+    try:
+        for row in source:
+            for alert in detector.process(row):
+                on_alert(alert)
+            if checkpoint_path and time.monotonic() - last_checkpoint >= checkpoint_interval:
+                detector.checkpoint(checkpoint_path)
+                last_checkpoint = time.monotonic()
+    finally:
+        if checkpoint_path:
+            detector.checkpoint(checkpoint_path)
+
+
+# เริ่มตัวตรวจจับใน thread พื้นหลัง รับแถวจาก queue (ใช้ใน metrics_collector)
+def start_detector_thread(q, checkpoint_path=CHECKPOINT_FILE, on_alert=print):
+    detector = StreamingDetector.load(checkpoint_path) if checkpoint_path else StreamingDetector()
+    thread = threading.Thread(target=run_detector, args=(rows_from_queue(q), detector, on_alert, checkpoint_path),
+                              name='ddos-detector', daemon=True)
+    thread.start()
+    return detector, thread
+
+
+# หยุด thread ของตัวตรวจจับ: ส่ง None ให้ run_detector จบลูปแล้ว checkpoint ใน finally ก่อนออกจากโปรแกรม
+# (thread เป็น daemon ถ้าไม่เรียกฟังก์ชันนี้ state ตั้งแต่ checkpoint ครั้งล่าสุดจะหายไป)
+def stop_detector_thread(q, thread, timeout=10.0):
+    try:
+        q.put(None, timeout=timeout)
+    except queue.Full:
+        print("DDoS detector queue full, state not checkpointed on shutdown")
+        return
+    thread.join(timeout)
+
+
+# รันเป็น service แยก: ติดตามแถวใหม่ใน network_metrics ต่อจากจุดที่ checkpoint ไว้
+if __name__ == '__main__':
+    storage.setup_database()
+    detector = StreamingDetector.load()
+    print(f"DDoS detector starting after row id {detector.last_id}")
+    run_detector(rows_from_db(detector.last_id), detector)
@@ -0,0 +1,200 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import storage
+
+DEVICE_TTL = 600          # วินาทีที่ไม่เห็นอุปกรณ์แล้วถือว่าออกจากเครือข่าย
+FLUSH_INTERVAL = 30       # วินาทีระหว่างการเขียน session ลงฐานข้อมูล
+TRACKER_FILTER = 'arp or (udp and (port 67 or port 68)) or icmp6'
+
+_IGNORED_MACS = {'00:00:00:00:00:00', 'ff:ff:ff:ff:ff:ff'}
+_IGNORED_IPS = {'0.0.0.0', '::', None}
+
+
+# ข้อมูลอุปกรณ์หนึ่งเครื่อง (__slots__ ให้ตารางเล็กแม้มีหลายพันเครื่อง)
+class Device:
+    __slots__ = ('mac', 'ip', 'first_seen', 'last_seen', 'source', 'session_id', 'dirty')
+
+    def __init__(self, mac, ip, when, source):
+        self.mac = mac
+        self.ip = ip
+        self.first_seen = when
+        self.last_seen = when
+        self.source = source
+        self.session_id = None  # id ในตาราง device_sessions (None = ยังไม่ได้เขียน)
+        self.dirty = True
+
+
+# ดึง (MAC, IP, แหล่งที่มา) จากแพ็กเก็ต ARP / DHCP / IPv6 ND คืนค่า None ถ้าไม่เกี่ยวข้อง
+def packet_observation(pkt):
+    from scapy.layers.dhcp import BOOTP, DHCP
+    from scapy.layers.inet6 import IPv6, ICMPv6ND_NS, ICMPv6ND_NA, ICMPv6ND_RS, ICMPv6NDOptSrcLLAddr
+    from scapy.layers.l2 import ARP, Ether
+
+    if ARP in pkt:
+        arp = pkt[ARP]
+        return arp.hwsrc, arp.psrc, 'arp'
+
+    if BOOTP in pkt and DHCP in pkt:
+        bootp = pkt[BOOTP]
+        if bootp.op != 1:
+            return None  # นับเฉพาะฝั่ง client (ฝั่ง server ก็จะเห็นตอน client ขอ)
+        mac = ':'.join(f'{b:02x}' for b in bytes(bootp.chaddr)[:6])
+        ip = bootp.ciaddr
+        for option in pkt[DHCP].options:
+            if isinstance(option, tuple) and option[0] == 'requested_addr':
+                ip = option[1]
+        return mac, ip, 'dhcp'
+
+    if IPv6 in pkt and (ICMPv6ND_NS in pkt or ICMPv6ND_NA in pkt or ICMPv6ND_RS in pkt):
+        if ICMPv6NDOptSrcLLAddr in pkt:
+            mac = pkt[ICMPv6NDOptSrcLLAddr].lladdr
+        elif Ether in pkt:
+            mac = pkt[Ether].src
+        else:
+            return None
+        return mac, pkt[IPv6].src, 'nd'
+
+    return None
+
+
+# ตารางอุปกรณ์ MAC -> Device เรียงตาม last_seen (OrderedDict) จึงหาอุปกรณ์ที่หมดอายุได้จากหัวตาราง
+class DeviceTable:
+    def __init__(self, ttl=DEVICE_TTL):
+        self.ttl = ttl
+        self.devices = OrderedDict()
+
+    # บันทึกว่าเห็น MAC นี้ คืนค่า True ถ้าเป็นอุปกรณ์ใหม่ (หรือกลับมาหลังหมดอายุ)
+    def observe(self, mac, ip, when, source):
+        mac = mac.lower()
+        if mac in _IGNORED_MACS:
+            return False
+        if ip in _IGNORED_IPS:
+            ip = None
+        device = self.devices.get(mac)
+        if device is None:
+            self.devices[mac] = Device(mac, ip, when, source)
+            return True
+        device.last_seen = max(device.last_seen, when)
+        if ip is not None and ip != device.ip:
+            device.ip = ip
+        device.source = source
+        device.dirty = True
+        self.devices.move_to_end(mac)
+        return False
+
+    # นำอุปกรณ์ที่ไม่เห็นเกิน ttl ออก คืนค่ารายการที่หมดอายุ
+    def expire(self, now):
+        expired = []
+        cutoff = now - self.ttl
+        while self.devices:
+            mac, device = next(iter(self.devices.items()))
+            if device.last_seen >= cutoff:
+                break
+            del self.devices[mac]
+            expired.append(device)
+        return expired
+
+    def __len__(self):
+        return len(self.devices)
+
+
+INSERT_SESSION_SQL = 'INSERT INTO device_sessions (mac, ip, source, first_seen, last_seen) VALUES (?, ?, ?, ?, ?)'
+UPDATE_SESSION_SQL = 'UPDATE device_sessions SET ip = ?, source = ?, last_seen = ? WHERE id = ?'
+
+
+# ติดตามอุปกรณ์แบบต่อเนื่องจาก ARP / DHCP / ND ใน thread พื้นหลัง
+# count() อ่านจำนวนอุปกรณ์ปัจจุบันได้ทันที และ session ของแต่ละอุปกรณ์ถูกเขียนลงฐานข้อมูลเป็น batch
+class DeviceTracker:
+    def __init__(self, ttl=DEVICE_TTL, flush_interval=FLUSH_INTERVAL, iface=None, path=None, clock=time.time):
+        self.table = DeviceTable(ttl)
+        self.flush_interval = flush_interval
+        self.iface = iface
+        self.path = path
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._closed = []  # session ที่หมดอายุแล้วแต่ยังไม่ได้เขียนครั้งสุดท้าย
+        self._sniffer = None
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._run, name='device-tracker', daemon=True)
+        self.packets = 0
+
+    def observe(self, mac, ip, when=None, source='manual'):
+        with self._lock:
+            self.table.observe(mac, ip, self._clock() if when is None else when, source)
+
+    def handle_packet(self, pkt):
+        observation = packet_observation(pkt)
+        if observation is None:
+            return
+        mac, ip, source = observation
+        with self._lock:
+            self.packets += 1
+            self.table.observe(mac, ip, float(pkt.time), source)
+
+    # จำนวนอุปกรณ์ที่เห็นภายใน ttl (ไม่ต้องรอ sniff)
+    def count(self):
+        with self._lock:
+            self._closed.extend(self.table.expire(self._clock()))
+            return len(self.table)
+
+    def devices(self):
+        with self._lock:
+            return [(d.mac, d.ip, d.first_seen, d.last_seen, d.source) for d in self.table.devices.values()]
+
+    # เขียน session ใหม่/ที่เปลี่ยนแปลง/ที่หมดอายุลงฐานข้อมูลใน transaction เดียว
+    def flush(self):
+        with self._lock:
+            self._closed.extend(self.table.expire(self._clock()))
+            pending = [d for d in self.table.devices.values() if d.dirty] + self._closed
+            self._closed = []
+            for device in pending:
+                device.dirty = False
+            snapshot = [(d, d.ip, d.source, d.first_seen, d.last_seen, d.session_id) for d in pending]
+        if not snapshot:
+            return 0
+
+        def _write():
+            with storage.transaction(self.path) as conn:
+                for device, ip, source, first_seen, last_seen, session_id in snapshot:
+                    if session_id is None:
+                        device.session_id = conn.execute(
+                            INSERT_SESSION_SQL, (device.mac, ip, source, int(first_seen), int(last_seen))).lastrowid
+                    else:
+                        conn.execute(UPDATE_SESSION_SQL, (ip, source, int(last_seen), session_id))
+        storage.with_retry(_write)
+        return len(snapshot)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Device session flush error: {e}")
+
+    def start(self, sniff=True):
+        if sniff:
+            from scapy.all import AsyncSniffer
+
+            self._sniffer = AsyncSniffer(iface=self.iface, filter=TRACKER_FILTER, prn=self.handle_packet, store=False)
+            self._sniffer.start()
+        self._flusher.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._sniffer is not None and self._sniffer.running:
+            self._sniffer.stop()
+        self.flush()
+
+
+# อ่าน pcap แล้วแสดงตารางอุปกรณ์: python device_tracker.py capture.pcap
+if __name__ == '__main__':
+    from scapy.all import sniff
+
+    tracker = DeviceTracker(clock=lambda: 0)
+    sniff(offline=sys.argv[1], prn=tracker.handle_packet, store=False)
+    for mac, ip, first_seen, last_seen, source in tracker.devices():
+        print(f"{mac}  {ip or '-':<40} {source:<5} {last_seen - first_seen:8.1f}s")
+    print(f"{len(tracker.table)} devices from {tracker.packets} packets")
@@ -0,0 +1,155 @@
+import functools
+import threading
+import time
+
+from prometheus_client import Counter, Histogram, REGISTRY, start_http_server
+from prometheus_client.core import GaugeMetricFamily, InfoMetricFamily
+
+import tracing
+
+EXPORTER_PORT = 8000
+
+# จำกัดจำนวน series: ส่งออกเฉพาะ BSSID ที่สัญญาณแรงสุด N ตัวจากผลสแกนล่าสุด และตัด label ที่ยาวเกิน
+MAX_BSSIDS = 64
+MAX_LABEL_LENGTH = 64
+
+# bucket ของ histogram (วินาที)
+RTT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+PROBE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CYCLE_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DB_WRITE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+
+# ค่าของเครือข่าย (label เป็นชื่อ target ใน pinger.PING_TARGETS จึงมีจำนวนจำกัด)
+PING_RTT = Histogram('wifi_ping_rtt_seconds', 'Round-trip time of each ping probe', ['target'], buckets=RTT_BUCKETS)
+LATENCY = Histogram('wifi_latency_seconds', 'Average latency of the primary ping target per cycle', buckets=RTT_BUCKETS)
+
+# ค่าของตัว collector เอง
+PROBE_DURATION = Histogram('wifi_probe_duration_seconds', 'Duration of each collector probe', ['probe'], buckets=PROBE_BUCKETS)
+PROBE_RESULTS = Counter('wifi_probe_results', 'Collector probe outcomes', ['probe', 'status'])
+CYCLE_DURATION = Histogram('wifi_job_duration_seconds', 'Duration of each scheduled collector job', ['job'], buckets=CYCLE_BUCKETS)
+CYCLE_OVERRUNS = Counter('wifi_job_overruns', 'Scheduled jobs that ran longer than their budget', ['job'])
+DB_WRITE_SECONDS = Histogram('wifi_db_write_seconds', 'Latency of database write transactions', ['table'], buckets=DB_WRITE_BUCKETS)
+
+
+def bounded_label(value):
+    return str(value if value not in (None, '') else 'unknown')[:MAX_LABEL_LENGTH]
+
+
+# บันทึกเวลาและผลของ probe ทุกตัวในรอบ (ผลจาก ProbeEngine.run)
+def observe_probes(results):
+    for result in results.values():
+        PROBE_RESULTS.labels(result.name, result.status).inc()
+        if result.status != 'skipped':
+            PROBE_DURATION.labels(result.name).observe(result.duration)
+
+
+# บันทึก RTT ทุก probe ของทุก target (ผลจาก pinger.probe_targets) และ latency ของ target หลัก
+def observe_ping(ping_stats, primary=None):
+    for stats in ping_stats.values():
+        histogram = PING_RTT.labels(stats.target)
+        for rtt in stats.rtts:
+            if rtt is not None:
+                histogram.observe(rtt)
+    if primary is not None and primary.avg is not None:
+        LATENCY.observe(primary.avg)
+
+
+# ห่อฟังก์ชันของ scheduler ให้วัดเวลาทุกรอบ และนับรอบที่ใช้เวลาเกิน budget (วินาที) พร้อม span ของ tracing
+def timed_job(fn, budget=None, name=None):
+    name = name or fn.__name__
+    duration = CYCLE_DURATION.labels(name)
+    overruns = CYCLE_OVERRUNS.labels(name)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            with tracing.span(f'job.{name}'):
+                return fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            duration.observe(elapsed)
+            if budget is not None and elapsed > budget:
+                overruns.inc()
+    return wrapper
+
+
+# custom collector: เก็บเฉพาะ state ล่าสุด (ผลสแกน ค่าของลิงก์ปัจจุบัน) แล้วแปลงเป็น metric ตอน scrape
+# series ของ SSID/BSSID ที่หายไปจากผลสแกนจึงหายไปเองโดยไม่ต้องลบ label ทิ้ง
+class WifiCollector:
+    def __init__(self, max_bssids=MAX_BSSIDS):
+        self.max_bssids = max_bssids
+        self._lock = threading.Lock()
+        self._scan = {}
+        self._scan_time = None
+        self._link = None
+        self._queues = {}
+
+    # ผลจาก get_wifi_networks_by_channel()
+    def update_scan(self, wifi_by_channel):
+        with self._lock:
+            self._scan = wifi_by_channel
+            self._scan_time = time.time()
+
+    # ค่าของลิงก์ที่เชื่อมต่ออยู่ (wifi_info จาก get_current_wifi_info) และค่าที่วัดได้ในรอบนี้ (None = ไม่ส่งออก)
+    def update_link(self, wifi_info, **values):
+        with self._lock:
+            self._link = (dict(wifi_info), values)
+
+    # ความยาวคิวภายใน อ่านตอน scrape ผ่านฟังก์ชันที่ให้มา
+    def register_queue(self, name, fn):
+        self._queues[name] = fn
+
+    def collect(self):
+        with self._lock:
+            scan, scan_time, link = self._scan, self._scan_time, self._link
+
+        networks = GaugeMetricFamily('wifi_scan_networks', 'Networks seen per channel in the last scan', labels=['channel'])
+        records = []
+        for channel, entries in scan.items():
+            networks.add_metric([bounded_label(channel)], len(entries))
+            records.extend(entries)
+        yield networks
+
+        records.sort(key=lambda network: network.get('Signal') or 0, reverse=True)
+        signal = GaugeMetricFamily('wifi_network_signal_strength', 'Signal strength (%) of networks in the last scan',
+                                   labels=['ssid', 'bssid', 'channel', 'frequency'])
+        info = InfoMetricFamily('wifi_channel', 'WiFi Info by Channel', labels=['channel', 'bssid', 'ssid'])
+        for network in records[:self.max_bssids]:
+            ssid, bssid, channel = (bounded_label(network.get(key)) for key in ('SSID', 'BSSID', 'Channel'))
+            signal.add_metric([ssid, bssid, channel, bounded_label(network.get('Frequency'))], network.get('Signal') or 0)
+            info.add_metric([channel, bssid, ssid], {'frequency': bounded_label(network.get('Frequency'))})
+        yield signal
+        yield info
+        yield GaugeMetricFamily('wifi_scan_networks_dropped', 'Networks left out of per-BSSID series by the cardinality limit',
+                                value=max(0, len(records) - self.max_bssids))
+        if scan_time is not None:
+            yield GaugeMetricFamily('wifi_scan_age_seconds', 'Seconds since the last scan', value=time.time() - scan_time)
+
+        if link is not None:
+            wifi_info, values = link
+            ssid = bounded_label(wifi_info.get('SSID'))
+            if wifi_info.get('Signal') is not None:
+                current = GaugeMetricFamily('wifi_signal_strength', 'WiFi Signal Strength', labels=['ssid', 'bssid', 'channel', 'frequency'])
+                current.add_metric([ssid, bounded_label(wifi_info.get('BSSID')), bounded_label(wifi_info.get('Channel')),
+                                    bounded_label(wifi_info.get('Frequency'))], wifi_info['Signal'])
+                yield current
+            for name, value in values.items():
+                if value is not None:
+                    gauge = GaugeMetricFamily(name, name.replace('_', ' ').capitalize(), labels=['ssid'])
+                    gauge.add_metric([ssid], value)
+                    yield gauge
+
+        depth = GaugeMetricFamily('wifi_queue_depth', 'Items waiting in collector queues', labels=['queue'])
+        for name, fn in self._queues.items():
+            try:
+                depth.add_metric([name], fn())
+            except Exception:
+                continue
+        yield depth
+
+
+# ลงทะเบียน collector แล้วเปิด HTTP endpoint /metrics
+def start(collector, port=EXPORTER_PORT):
+    REGISTRY.register(collector)
+    start_http_server(port)
@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objs as go
+
+# จำนวนจุดทั้งรูปที่เกินแล้วเปลี่ยนไปใช้ WebGL (Scattergl)
+WEBGL_THRESHOLD = 2000
+
+# ความกว้างกราฟเป็น pixel ถ้าเบราว์เซอร์ไม่ได้ส่งมา
+DEFAULT_PIXEL_WIDTH = 1200
+
+
+# แปลง epoch (วินาที) เป็น datetime64[s] ตามเขตเวลาที่แสดง (ครั้งเดียวทั้งคอลัมน์)
+def to_local_datetime(ts, tz):
+    local = pd.to_datetime(ts, unit='s', utc=True).tz_convert(tz).tz_localize(None)
+    return np.asarray(local, dtype='datetime64[s]')
+
+
+# Largest-Triangle-Three-Buckets: เลือกจุดที่รักษารูปร่างเส้นไว้ให้เหลือ n_out จุด
+def lttb(x, y, n_out):
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    xf = x.astype('float64')
+    yf = y.astype('float64')
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # ค่าเฉลี่ยของทุก bucket คำนวณครั้งเดียว (bucket สุดท้ายคือจุดสุดท้าย)
+    counts = np.diff(np.append(edges, n))
+    avg_x = np.add.reduceat(xf, edges) / counts
+    avg_y = np.add.reduceat(yf, edges) / counts
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # ค่าเฉลี่ยของ bucket ถัดไปเป็นจุดที่สามของสามเหลี่ยม
+        ax, ay = xf[a], yf[a]
+        area = np.abs((ax - avg_x[i + 1]) * (yf[start:end] - ay) - (ax - xf[start:end]) * (avg_y[i + 1] - ay))
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+# min-max decimation: เก็บจุดต่ำสุดและสูงสุดของแต่ละช่อง (เหมาะกับ spike)
+def minmax(x, y, n_out):
+    n = len(y)
+    buckets = max(1, n_out // 2)
+    if n <= n_out:
+        return np.arange(n)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    lo = np.minimum.reduceat(y, edges[:-1])
+    hi = np.maximum.reduceat(y, edges[:-1])
+    indices = []
+    for start, end, low, high in zip(edges[:-1], edges[1:], lo, hi):
+        segment = y[start:end]
+        i_lo = start + int(np.argmax(segment == low))
+        i_hi = start + int(np.argmax(segment == high))
+        indices.extend(sorted({i_lo, i_hi}))
+    return np.asarray(indices, dtype=np.int64)
+
+
+DECIMATORS = {'lttb': lttb, 'minmax': minmax}
+
+
+# ชื่อเส้นของแต่ละแถว: 'probe/ssid' สำหรับแถวจาก probe ใน fleet และ 'ssid' สำหรับแถวของเครื่องนี้ (probe_id ว่าง)
+# SSID เดียวกันจากคนละ probe จึงเป็นคนละเส้น (rollup ไม่มี probe_id จึงได้ชื่อ SSID อย่างเดียว)
+def series_keys(df):
+    ssid = df['ssid'].fillna('unknown').astype(str)
+    if 'probe_id' not in df:
+        return ssid.to_numpy()
+    probe = df['probe_id'].fillna('').astype(str)
+    return np.where(probe != '', probe + '/' + ssid, ssid).astype(object)
+
+
+# แยก DataFrame เป็นกลุ่มตาม (probe, SSID) ด้วยการ sort ครั้งเดียว คืนค่า [(key, ts, y)] เรียงตามเวลา
+def split_by_series(df, y_column):
+    if df.empty or y_column not in df:
+        return []
+    key = series_keys(df)
+    ts = df['ts'].to_numpy(dtype=np.int64)
+    y = pd.to_numeric(df[y_column], errors='coerce').to_numpy(dtype=np.float32)
+    order = np.lexsort((ts, key))
+    key, ts, y = key[order], ts[order], y[order]
+    keys, starts = np.unique(key, return_index=True)
+    ends = np.append(starts[1:], len(key))
+    return [(k, ts[start:end], y[start:end]) for k, start, end in zip(keys, starts, ends)]
+
+
+def trace_class(use_webgl):
+    return go.Scattergl if use_webgl else go.Scatter
+
+
+# สร้างรูปจาก DataFrame: groupby ครั้งเดียว, ใช้ array แบบมี type, ลดจุดให้พอดีความกว้างกราฟ
+def build_traces(df, y_column, tz, name_for, mode, pixel_width=None, method='lttb'):
+    groups = split_by_series(df, y_column)
+    pixel_width = pixel_width or DEFAULT_PIXEL_WIDTH
+    decimate = DECIMATORS[method]
+
+    series = []
+    for key, ts, y in groups:
+        valid = np.isfinite(y)
+        ts, y = ts[valid], y[valid]
+        keep = decimate(ts, y, pixel_width)
+        series.append((key, ts[keep], y[keep]))
+
+    total_points = sum(len(y) for _, _, y in series)
+    use_webgl = total_points > WEBGL_THRESHOLD
+    Trace = trace_class(use_webgl)
+    traces = [
+        Trace(x=to_local_datetime(ts, tz), y=y, mode=mode, name=name_for(key))
+        for key, ts, y in series
+    ]
+    return traces, [key for key, _, _ in series], use_webgl
+
+
+# แปลงจุดใหม่สำหรับต่อท้ายเส้นเดิมด้วย Patch คืนค่า [(key, x list, y list)] (key เดียวกับ build_traces)
+def patch_series(df, y_column, tz):
+    updates = []
+    for key, ts, y in split_by_series(df, y_column):
+        valid = np.isfinite(y)
+        x = np.datetime_as_string(to_local_datetime(ts[valid], tz), unit='s')
+        updates.append((key, x.tolist(), y[valid].astype(float).tolist()))
+    return updates
@@ -0,0 +1,183 @@
+import gzip
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+# ตั้ง FLEET_URL (เช่น http://central:8060) เพื่อส่งข้อมูลไปที่ aggregator กลางด้วย
+FLEET_URL = os.environ.get('FLEET_URL')
+PROBE_ID = os.environ.get('PROBE_ID') or socket.gethostname()
+FLEET_TOKEN = os.environ.get('FLEET_TOKEN')
+SPOOL_DIR = os.environ.get('FLEET_SPOOL_DIR', 'fleet_spool')
+
+PUSH_INTERVAL = 15                   # วินาทีระหว่างการส่ง batch
+BATCH_SIZE = 5000                    # จำนวนแถวที่ทำให้ส่งก่อนถึงรอบ
+PUSH_TIMEOUT = 10                    # วินาทีต่อคำขอ
+RETRY_MAX = 300                      # วินาที ระยะรอสูงสุดเมื่อส่งไม่สำเร็จติดกัน
+MAX_SPOOL_BYTES = 200 * 1024 * 1024  # พื้นที่ดิสก์สูงสุดของ batch ที่รอส่ง (เกินแล้วทิ้ง batch เก่าสุด)
+
+# คอลัมน์ที่ส่งได้ของแต่ละตาราง (ลำดับเดียวกับแถวที่ collector เขียน) aggregator ใช้ชุดเดียวกันตรวจข้อมูลขาเข้า
+TABLE_COLUMNS = {
+    'network_metrics': ['timestamp', 'ts', 'download_speed', 'upload_speed', 'latency', 'packet_loss',
+                        'bytes_sent', 'bytes_recv', 'device_count', 'ssid', 'bandwidth', 'rx_rate', 'tx_rate'],
+    'metrics': ['timestamp', 'ts', 'ssid', 'bssid', 'signal_strength', 'frequency', 'channel'],
+}
+
+
+# batch หนึ่งก้อน: JSON แบบ columnar (ชื่อคอลัมน์ครั้งเดียวต่อตาราง) บีบอัดด้วย gzip
+def encode_batch(probe_id, batch_id, tables):
+    payload = {
+        'probe_id': probe_id,
+        'batch_id': batch_id,
+        'hostname': socket.gethostname(),
+        'tables': {table: {'columns': TABLE_COLUMNS[table], 'rows': rows} for table, rows in tables.items() if rows},
+    }
+    return gzip.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'), compresslevel=6)
+
+
+# ส่งแถวของ collector ไปที่ aggregator เป็น batch ที่บีบอัดแล้ว
+# ทุก batch ถูกเขียนลง spool บนดิสก์ก่อนส่ง จึงไม่หายเมื่อออฟไลน์หรือ process ตาย และส่งตามลำดับเมื่อกลับมาออนไลน์
+class FleetPusher:
+    def __init__(self, url=FLEET_URL, probe_id=PROBE_ID, spool_dir=SPOOL_DIR, token=FLEET_TOKEN,
+                 interval=PUSH_INTERVAL, batch_size=BATCH_SIZE, max_spool_bytes=MAX_SPOOL_BYTES):
+        self.url = url.rstrip('/') + '/ingest'
+        self.probe_id = probe_id
+        self.spool_dir = spool_dir
+        self.token = token
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_spool_bytes = max_spool_bytes
+        os.makedirs(spool_dir, exist_ok=True)
+        self._buffer = {table: [] for table in TABLE_COLUMNS}
+        self._buffered = 0
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='fleet-pusher', daemon=True)
+        self._failures = 0
+        self.sent_batches = 0
+        self.sent_rows = 0
+        self.failed_attempts = 0
+        self.dropped_batches = 0
+
+    def push(self, table, row):
+        self.push_many(table, [row])
+
+    def push_many(self, table, rows):
+        with self._lock:
+            self._buffer[table].extend(list(row) for row in rows)
+            self._buffered += len(rows)
+            full = self._buffered >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def _spool_files(self):
+        return sorted(name for name in os.listdir(self.spool_dir) if name.endswith('.json.gz'))
+
+    # ย้ายแถวใน buffer ลงไฟล์ spool หนึ่งไฟล์ (ชื่อไฟล์เรียงตามเวลา)
+    def _spool_buffer(self):
+        with self._lock:
+            if not self._buffered:
+                return None
+            tables, self._buffer = self._buffer, {table: [] for table in TABLE_COLUMNS}
+            self._buffered = 0
+        batch_id = f'{int(time.time() * 1000):013d}-{uuid.uuid4().hex[:8]}'
+        path = os.path.join(self.spool_dir, batch_id + '.json.gz')
+        with open(path + '.tmp', 'wb') as f:
+            f.write(encode_batch(self.probe_id, batch_id, tables))
+        os.replace(path + '.tmp', path)
+        self._trim_spool()
+        return path
+
+    # จำกัดขนาด spool: ทิ้ง batch เก่าสุดก่อน
+    def _trim_spool(self):
+        files = self._spool_files()
+        sizes = {name: os.path.getsize(os.path.join(self.spool_dir, name)) for name in files}
+        total = sum(sizes.values())
+        while files and total > self.max_spool_bytes:
+            name = files.pop(0)
+            os.remove(os.path.join(self.spool_dir, name))
+            total -= sizes[name]
+            self.dropped_batches += 1
+            print(f"Fleet spool full, dropped batch {name}")
+
+    def _post(self, body):
+        headers = {'Content-Type': 'application/json', 'Content-Encoding': 'gzip', 'X-Probe-Id': self.probe_id}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        with urlopen(Request(self.url, data=body, headers=headers, method='POST'), timeout=PUSH_TIMEOUT) as response:
+            return json.loads(response.read() or b'{}')
+
+    # ส่ง batch ที่ค้างใน spool ตามลำดับ หยุดที่ตัวแรกที่ส่งไม่สำเร็จ คืนค่าจำนวนที่ส่งได้
+    def send_spooled(self):
+        sent = 0
+        with self._send_lock:
+            for name in self._spool_files():
+                path = os.path.join(self.spool_dir, name)
+                with open(path, 'rb') as f:
+                    body = f.read()
+                try:
+                    result = self._post(body)
+                except HTTPError as e:
+                    if e.code in (400, 413):
+                        # aggregator ไม่รับ batch นี้ ส่งซ้ำก็ไม่ผ่าน แยกไว้ตรวจสอบแล้วส่งตัวถัดไป
+                        os.replace(path, path + '.rejected')
+                        print(f"Fleet batch {name} rejected: HTTP {e.code}")
+                        continue
+                    self._failures += 1
+                    self.failed_attempts += 1
+                    print(f"Fleet push failed ({self._failures} in a row): HTTP {e.code}")
+                    break
+                except Exception as e:
+                    self._failures += 1
+                    self.failed_attempts += 1
+                    print(f"Fleet push failed ({self._failures} in a row), {len(self._spool_files())} batch(es) spooled: {e}")
+                    break
+                os.remove(path)
+                self._failures = 0
+                self.sent_batches += 1
+                self.sent_rows += result.get('rows', 0)
+                sent += 1
+        return sent
+
+    def flush(self):
+        self._spool_buffer()
+        return self.send_spooled()
+
+    def _run(self):
+        while not self._stop.is_set():
+            # backoff เมื่อส่งไม่สำเร็จติดกัน (เขียนลง spool ตามรอบปกติต่อไป)
+            wait = min(RETRY_MAX, self.interval * 2 ** min(self._failures, 10)) if self._failures else self.interval
+            self._wake.wait(wait)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Fleet push error: {e}")
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+
+    def stats(self):
+        files = self._spool_files()
+        return {
+            'probe_id': self.probe_id,
+            'buffered_rows': self._buffered,
+            'spooled_batches': len(files),
+            'spooled_bytes': sum(os.path.getsize(os.path.join(self.spool_dir, name)) for name in files),
+            'sent_batches': self.sent_batches,
+            'sent_rows': self.sent_rows,
+            'failed_attempts': self.failed_attempts,
+            'dropped_batches': self.dropped_batches,
+        }
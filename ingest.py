@@ -0,0 +1,126 @@
+import queue
+import threading
+import time
+
+import storage
+
+# คำสั่ง INSERT ผลสแกน Wi-Fi (หนึ่งแถวต่อ BSSID)
+INSERT_SCAN_SQL = '''
+    INSERT INTO metrics (timestamp, ts, ssid, bssid, signal_strength, frequency, channel)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+# ค่าเริ่มต้นของ pipeline
+FLUSH_INTERVAL = 5.0  # วินาที
+FLUSH_SIZE = 1000     # จำนวนแถวสูงสุดต่อหนึ่ง transaction
+MAX_QUEUE = 64        # จำนวนรอบสแกนที่รอเขียนได้ในหน่วยความจำ
+
+
+# แปลงผลจาก get_wifi_networks_by_channel() เป็นแถวสำหรับตาราง metrics
+def scan_to_rows(wifi_by_channel, timestamp, ts):
+    rows = []
+    for channel, networks in wifi_by_channel.items():
+        for network in networks:
+            rows.append((
+                timestamp,
+                ts,
+                network.get('SSID', 'unknown'),
+                network.get('BSSID', 'unknown'),
+                network.get('Signal', 0),
+                network.get('Frequency', 'unknown'),
+                channel,
+            ))
+    return rows
+
+
+# Pipeline เขียนผลสแกนแบบ batch: รับผลสแกนเข้าคิว แล้วเขียนด้วย executemany ใน transaction เดียว
+class ScanIngestor:
+    def __init__(self, flush_interval=FLUSH_INTERVAL, flush_size=FLUSH_SIZE, max_queue=MAX_QUEUE,
+                 sql=INSERT_SCAN_SQL, on_write=None):
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.sql = sql
+        self.on_write = on_write  # เรียกด้วย (จำนวนแถว, วินาที) หลังเขียนแต่ละ batch
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = None
+        self.dropped_scans = 0
+        self.written_rows = 0
+        self.flushes = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='scan-ingestor', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        # ปลุก thread ที่รออยู่ใน get() ให้เขียนรอบสุดท้ายทันที ไม่ต้องรอครบ flush_interval (คิวเต็มแปลว่า get() ไม่ได้รออยู่)
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    # ส่งผลสแกนหนึ่งรอบเข้าคิว (ไม่บล็อกรอบการเก็บข้อมูล ถ้าคิวเต็มจะทิ้งรอบนี้)
+    def submit(self, rows):
+        if not rows:
+            return True
+        try:
+            self._queue.put_nowait(list(rows))
+            return True
+        except queue.Full:
+            self.dropped_scans += 1
+            print(f"Ingest queue full, dropped scan of {len(rows)} rows")
+            return False
+
+    # เขียนแถวทั้งหมดใน transaction เดียว (หนึ่ง fsync ต่อ batch แทนหนึ่งต่อแถว)
+    def _write(self, rows):
+        start = time.perf_counter()
+        storage.executemany_write(self.sql, rows)
+        self.written_rows += len(rows)
+        self.flushes += 1
+        if self.on_write is not None:
+            self.on_write(len(rows), time.perf_counter() - start)
+
+    def _run(self):
+        pending = []
+        deadline = time.monotonic() + self.flush_interval
+        while not self._stop.is_set() or not self._queue.empty():
+            try:
+                scan = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                if scan is not None:
+                    pending.extend(scan)
+            except queue.Empty:
+                pass
+
+            if pending and (len(pending) >= self.flush_size or time.monotonic() >= deadline
+                            or self._stop.is_set()):
+                try:
+                    self._write(pending)
+                except Exception as e:
+                    print(f"Error writing scan batch ({len(pending)} rows): {e}")
+                pending = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+
+        if pending:
+            self._write(pending)
+        storage.close_connection()
+
+    # เขียนทุกอย่างที่ค้างอยู่ทันที (ใช้ตอนปิดโปรแกรม หรือในสคริปต์ที่ไม่ได้ start thread)
+    def flush(self):
+        pending = []
+        while True:
+            try:
+                pending.extend(self._queue.get_nowait() or ())
+            except queue.Empty:
+                break
+        if pending:
+            self._write(pending)
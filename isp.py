@@ -0,0 +1,87 @@
+import json
+import os
+import threading
+import time
+from urllib.request import urlopen
+
+ISP_URL = 'https://ipinfo.io/json'
+ISP_TIMEOUT = 3                    # วินาที ต่อคำขอ
+ISP_CACHE_FILE = os.environ.get('WIFI_ISP_CACHE', 'isp_cache.json')
+ISP_TTL = 6 * 3600                 # ข้อมูล ISP เปลี่ยนไม่บ่อย ถามใหม่ทุก 6 ชั่วโมง
+ISP_RETRY = 60                     # วินาที รอก่อนถามใหม่เมื่อออฟไลน์
+
+UNKNOWN = {"ip": "N/A", "isp": "N/A", "city": "N/A", "country": "N/A"}
+
+
+# ฟังก์ชันดึงข้อมูล ISP (บล็อกไม่เกิน timeout วินาที)
+def fetch_isp_info(url=ISP_URL, timeout=ISP_TIMEOUT):
+    with urlopen(url, timeout=timeout) as response:
+        data = json.loads(response.read())
+    return {
+        "ip": data.get("ip", "N/A"),
+        "isp": data.get("org", "N/A"),
+        "city": data.get("city", "N/A"),
+        "country": data.get("country", "N/A")
+    }
+
+
+# ข้อมูล ISP แบบไม่บล็อก: get() คืนค่าที่มีอยู่ทันที (หน่วยความจำ -> ไฟล์ cache -> N/A)
+# และสั่งดึงใหม่ใน background เมื่อค่าเก่ากว่า TTL โดยมีได้ครั้งละหนึ่ง thread
+class IspInfo:
+    def __init__(self, cache_file=ISP_CACHE_FILE, ttl=ISP_TTL, fetch=fetch_isp_info):
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.fetch = fetch
+        self._lock = threading.Lock()
+        self._info = None
+        self._fetched_at = 0.0
+        self._attempted_at = 0.0
+        self._thread = None
+        self._loaded = False
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_file) as f:
+                cached = json.load(f)
+            self._info, self._fetched_at = cached['info'], cached['fetched_at']
+        except (OSError, ValueError, KeyError):
+            pass
+        self._loaded = True
+
+    def _save_cache(self, info, fetched_at):
+        tmp = self.cache_file + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'info': info, 'fetched_at': fetched_at}, f)
+        os.replace(tmp, self.cache_file)
+
+    def _refresh(self):
+        try:
+            info = self.fetch()
+            fetched_at = time.time()
+            with self._lock:
+                self._info, self._fetched_at = info, fetched_at
+            self._save_cache(info, fetched_at)
+        except Exception as e:
+            print(f"ISP lookup failed: {e}")
+        finally:
+            with self._lock:
+                self._thread = None
+
+    def get(self):
+        with self._lock:
+            if not self._loaded:
+                self._load_cache()
+            now = time.time()
+            stale = now - self._fetched_at > self.ttl
+            if stale and self._thread is None and now - self._attempted_at > ISP_RETRY:
+                self._attempted_at = now
+                self._thread = threading.Thread(target=self._refresh, name='isp-lookup', daemon=True)
+                self._thread.start()
+            return dict(self._info) if self._info else dict(UNKNOWN)
+
+    # รอผลของการดึงที่กำลังทำอยู่ (ใช้ในสคริปต์/ทดสอบ)
+    def wait(self, timeout=None):
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return self.get()
@@ -1,152 +1,147 @@
-import sqlite3
 import datetime
 import pytz
-import subprocess
 import psutil
-import ping3
-import speedtest
-from scapy.all import sniff, ARP
-import schedule
 import time
-from prometheus_client import start_http_server, Gauge, Info
+import storage
+from storage import setup_database
+from ingest import ScanIngestor, scan_to_rows
+import rollup
+import archive
+import rf_analytics
+from probes import Probe, ProbeEngine, format_durations
+import pinger
+import scanners
+import queue
+import ddos_detection
+import traffic_capture
+from device_tracker import DeviceTracker
+import bandwidth
+import throughput
+from scheduler import LaneScheduler
+import fleet
+import exporter
+import tracing
+from alert_engine import AlertEngine
+
+# Prometheus metrics: ผลสแกนและค่าของลิงก์ล่าสุดถูกแปลงเป็น metric ตอน scrape (ดู exporter.WifiCollector)
+# ชื่อ metric เดิม (download_speed, latency, ...) ยังอยู่ เพิ่ม label ssid
+wifi_exporter = exporter.WifiCollector()
 
-# ชื่อไฟล์ฐานข้อมูล
-DB_NAME = 'network_metrics.db'
+# ระบุหน่วงเวลาในวินาที (เช่น 60 วินาที)
+DELAY = 60
 
-# Prometheus metrics    
-signal_strength_gauge = Gauge('wifi_signal_strength', 'WiFi Signal Strength', ['frequency'])
-download_speed_gauge = Gauge('download_speed', 'Download Speed')
-upload_speed_gauge = Gauge('upload_speed', 'Upload Speed')
-latency_gauge = Gauge('latency', 'Latency')
-packet_loss_gauge = Gauge('packet_loss', 'Packet Loss')
-bytes_sent_gauge = Gauge('bytes_sent', 'Bytes Sent')
-bytes_recv_gauge = Gauge('bytes_recv', 'Bytes Received')
-device_count_gauge = Gauge('device_count', 'Device Count')
+# backend สำหรับสแกน Wi-Fi (netsh / iw / nmcli / replay) เลือกด้วยตัวแปร WIFI_SCANNER หรือตามระบบปฏิบัติการ
+wifi_scanner = scanners.get_scanner()
 
-# Info metrics for Wi-Fi channels
-channel_info_metric = Info('wifi_channel_info', 'WiFi Info by Channel', ['channel', 'bssid', 'ssid'])
+# ค่าปรับแต่ง pipeline การเขียนผลสแกน
+INGEST_FLUSH_INTERVAL = 5    # วินาที
+INGEST_FLUSH_SIZE = 1000     # แถวต่อ transaction
+INGEST_MAX_QUEUE = 64        # จำนวนรอบสแกนที่รอเขียนได้
 
-# ระบุหน่วงเวลาในวินาที (เช่น 60 วินาที)
-DELAY = 60
+scan_ingestor = ScanIngestor(flush_interval=INGEST_FLUSH_INTERVAL, flush_size=INGEST_FLUSH_SIZE, max_queue=INGEST_MAX_QUEUE,
+                             on_write=lambda rows, seconds: exporter.DB_WRITE_SECONDS.labels('metrics').observe(seconds))
+
+# ความยาวช่วงสรุปทราฟฟิกระดับแพ็กเก็ต (วินาที)
+TRAFFIC_INTERVAL = 10
+
+# ส่งข้อมูลไปที่ aggregator กลางด้วยเมื่อตั้ง FLEET_URL (ยังเขียนลงฐานข้อมูลในเครื่องตามเดิม)
+fleet_pusher = fleet.FleetPusher() if fleet.FLEET_URL else None
+
+# แถว network_metrics ที่บันทึกแล้วส่งต่อให้ตัวตรวจจับ DDoS แบบ streaming (ไม่ต้อง query ซ้ำ)
+detector_queue = queue.Queue(maxsize=1000)
+
+# ประเมินกฎแจ้งเตือนกับแต่ละแถวครั้งเดียว แล้วเขียน incident ที่เปลี่ยนเป็น batch (เริ่มใน main)
+alert_engine = AlertEngine()
 
 # ฟังก์ชันที่จะให้เวลาตามท้องถิ่น (เช่น เวลาในประเทศไทย)
 def get_local_time():
     local_timezone = pytz.timezone("Asia/Bangkok")  # หรือเขียนตามเวลาในภูมิภาคที่คุณต้องการ
     return datetime.datetime.now(local_timezone).strftime('%Y-%m-%d %H:%M:%S')
 
-# ฟังก์ชันสร้างฐานข้อมูล
-def setup_database():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    # สร้างตารางในฐานข้อมูลหากยังไม่มี
-    cursor.execute(''' 
-        CREATE TABLE IF NOT EXISTS metrics (
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            ssid TEXT,
-            bssid TEXT,
-            signal_strength INTEGER,
-            frequency TEXT,
-            channel TEXT
-        )
-    ''')
-
-    cursor.execute(''' 
-        CREATE TABLE IF NOT EXISTS network_metrics (
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            download_speed REAL,
-            upload_speed REAL,
-            latency REAL,
-            packet_loss REAL,
-            bytes_sent INTEGER,
-            bytes_recv INTEGER,
-            device_count INTEGER,
-            ssid TEXT
-        )
-    ''')
-
-    conn.commit()
-    conn.close()
+# คำสั่ง INSERT แบบคงที่ เพื่อให้ sqlite3 ใช้ prepared statement ที่ cache ไว้ซ้ำได้
+INSERT_METRICS_SQL = '''
+    INSERT INTO metrics (timestamp, ts, ssid, bssid, signal_strength, frequency, channel)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+INSERT_NETWORK_METRICS_SQL = '''
+    INSERT INTO network_metrics (timestamp, ts, download_speed, upload_speed, latency, packet_loss, bytes_sent, bytes_recv, device_count, ssid, bandwidth, rx_rate, tx_rate)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
 
 # ฟังก์ชันบันทึกข้อมูลลงฐานข้อมูล
 def save_metrics_to_db(ssid, bssid, signal_strength, frequency, channel):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
     timestamp = get_local_time()  # ใช้เวลาท้องถิ่น
 
     # แทรกข้อมูลลงในตาราง
-    cursor.execute(''' 
-        INSERT INTO metrics (timestamp, ssid, bssid, signal_strength, frequency, channel) 
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (timestamp, ssid, bssid, signal_strength, frequency, channel))
-
-    conn.commit()
-    conn.close()
+    storage.execute_write(INSERT_METRICS_SQL, (timestamp, int(time.time()), ssid, bssid, signal_strength, frequency, channel))
 
 # ฟังก์ชันบันทึกข้อมูล network metrics
-def save_network_metrics_to_db(download_speed, upload_speed, latency, packet_loss, bytes_sent, bytes_recv, device_count, ssid):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
+def save_network_metrics_to_db(download_speed, upload_speed, latency, packet_loss, bytes_sent, bytes_recv, device_count, ssid, bandwidth=None, rx_rate=None, tx_rate=None):
     timestamp = get_local_time()  # ใช้เวลาท้องถิ่น
 
-    cursor.execute(''' 
-        INSERT INTO network_metrics (timestamp, download_speed, upload_speed, latency, packet_loss, bytes_sent, bytes_recv, device_count, ssid) 
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (timestamp, download_speed, upload_speed, latency, packet_loss, bytes_sent, bytes_recv, device_count, ssid))
+    ts = int(time.time())
 
-    conn.commit()
-    conn.close()
+    def _write():
+        with storage.transaction() as conn:
+            return conn.execute(INSERT_NETWORK_METRICS_SQL, (timestamp, ts, download_speed, upload_speed, latency, packet_loss, bytes_sent, bytes_recv, device_count, ssid, bandwidth, rx_rate, tx_rate)).lastrowid
+    with exporter.DB_WRITE_SECONDS.labels('network_metrics').time():
+        row_id = storage.with_retry(_write)
 
-# ฟังก์ชันลบข้อมูลที่เก่ากว่า 50 ชั่วโมง
-def delete_old_data():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
+    if fleet_pusher is not None:
+        fleet_pusher.push('network_metrics', (timestamp, ts, download_speed, upload_speed, latency, packet_loss, bytes_sent, bytes_recv, device_count, ssid, bandwidth, rx_rate, tx_rate))
 
-    # ลบข้อมูลที่มี timestamp เก่ากว่า 50 ชั่วโมง
-    cursor.execute(''' 
-        DELETE FROM metrics WHERE timestamp < datetime('now', '-50 hour')  
-    ''')
+    row = {
+        'id': row_id, 'ts': ts, 'ssid': ssid,
+        'download_speed': download_speed, 'upload_speed': upload_speed, 'latency': latency,
+        'packet_loss': packet_loss, 'device_count': device_count, 'bandwidth': bandwidth,
+    }
+    alert_engine.submit(row)
+    try:
+        detector_queue.put_nowait(row)
+    except queue.Full:
+        print("DDoS detector queue full, dropping row")
 
-    cursor.execute(''' 
-        DELETE FROM network_metrics WHERE timestamp < datetime('now', '-50 hour')  
-    ''')
+# ระยะเวลาเก็บข้อมูลดิบ (ชั่วโมง) ส่วน rollup แต่ละ tier ตั้งไว้ที่ rollup.TIERS
+RETENTION_HOURS = 50
 
-    conn.commit()
-    conn.close()
+# ฟังก์ชันย้าย/ลบข้อมูลที่เก่ากว่า 50 ชั่วโมง
+def delete_old_data():
+    # metrics และ network_metrics ย้ายไปเก็บใน archive (Parquet) ทีละวัน แทนการลบทิ้ง
+    archive.compact(retention_hours=RETENTION_HOURS)
+
+    # ตารางอื่นลบข้อมูลที่มี ts เก่ากว่า 50 ชั่วโมง (ใช้ index บน ts, ใน transaction เดียว)
+    cutoff = int(time.time()) - RETENTION_HOURS * 3600
+
+    def _delete():
+        with storage.transaction() as conn:
+            conn.execute("DELETE FROM ssids WHERE last_seen < ?", (cutoff,))
+            conn.execute("DELETE FROM traffic_summaries WHERE ts < ?", (cutoff,))
+            conn.execute("DELETE FROM device_sessions WHERE last_seen < ?", (cutoff,))
+            conn.execute("DELETE FROM interface_rates WHERE ts < ?", (cutoff,))
+    storage.with_retry(_delete)
+    rollup.delete_old_rollups()
+    rf_analytics.delete_old()
+
+# ฟังก์ชันสรุปข้อมูลเป็น rollup 1m/5m/1h (ทำเฉพาะ bucket ใหม่)
+def update_rollups():
+    try:
+        written = rollup.run_rollups()
+        if written:
+            print(f"Rollups updated: {written}")
+    except Exception as e:
+        print(f"Error updating rollups: {e}")
+
+# ฟังก์ชันสรุปผลสแกนใหม่เป็นสถิติของช่องสัญญาณและ BSSID (ต้องทำก่อนผลสแกนถูกย้ายไป archive)
+def update_rf_analytics():
+    try:
+        rf_analytics.update()
+    except Exception as e:
+        print(f"Error updating RF analytics: {e}")
 
-# ฟังก์ชันดึงข้อมูล Wi-Fi ทุกเครือข่าย
+# ฟังก์ชันดึงข้อมูล Wi-Fi ทุกเครือข่าย (แยกตามช่องสัญญาณ)
 def get_wifi_networks_by_channel():
-    result = subprocess.run(['netsh', 'wlan', 'show', 'networks', 'mode=bssid'], capture_output=True, text=True)
-    networks = {}
-    current_network = {}
-
-    for line in result.stdout.split('\n'):
-        if 'SSID' in line and 'BSSID' not in line:
-            if current_network:  # Save the previous network
-                channel = current_network.get('Channel', 'unknown')
-                if channel not in networks:
-                    networks[channel] = []
-                networks[channel].append(current_network)
-                current_network = {}
-            current_network['SSID'] = line.split(':')[1].strip()
-        elif 'BSSID' in line:
-            current_network['BSSID'] = line.split(':')[1].strip()
-        elif 'Signal' in line:
-            current_network['Signal'] = int(line.split(':')[1].strip().replace('%', ''))
-        elif 'Radio type' in line:
-            current_network['Frequency'] = line.split(':')[1].strip()
-        elif 'Channel' in line:
-            current_network['Channel'] = line.split(':')[1].strip()
-
-    if current_network:  # Add the last network  
-        channel = current_network.get('Channel', 'unknown')
-        if channel not in networks:
-            networks[channel] = []
-        networks[channel].append(current_network)
-
-    return networks
+    return scanners.group_by_channel(wifi_scanner.scan())
 
 # ฟังก์ชันเก็บข้อมูลจาก Wi-Fi เครือข่ายลงในฐานข้อมูล
 def collect_and_save_wifi_networks():
@@ -154,133 +149,238 @@ def collect_and_save_wifi_networks():
     delete_old_data()
 
     wifi_by_channel = get_wifi_networks_by_channel()
+    wifi_exporter.update_scan(wifi_by_channel)
 
-    # บันทึกข้อมูลทุกช่องสัญญาณ
-    for channel, networks in wifi_by_channel.items():
-        for network in networks:
-            ssid = network.get('SSID', 'unknown')
-            bssid = network.get('BSSID', 'unknown')
-            signal_strength = network.get('Signal', 0)
-            frequency = network.get('Frequency', 'unknown')
-
-            # บันทึกข้อมูลลงในฐานข้อมูล
-            save_metrics_to_db(ssid, bssid, signal_strength, frequency, channel)
-            print(f"SSID: {ssid} | BSSID: {bssid} | Signal: {signal_strength}% | Frequency: {frequency} | Channel: {channel}")
+    # ส่งผลสแกนทั้งรอบเข้า pipeline ครั้งเดียว (เขียนเป็น transaction เดียว)
+    rows = scan_to_rows(wifi_by_channel, get_local_time(), int(time.time()))
+    scan_ingestor.submit(rows)
+    if fleet_pusher is not None:
+        fleet_pusher.push_many('metrics', rows)
+    for _, _, ssid, bssid, signal_strength, frequency, channel in rows:
+        print(f"SSID: {ssid} | BSSID: {bssid} | Signal: {signal_strength}% | Frequency: {frequency} | Channel: {channel}")
 
 # Function to get current Wi-Fi information
 def get_current_wifi_info():
-    result = subprocess.run(['netsh', 'wlan', 'show', 'interfaces'], capture_output=True, text=True)
-    wifi_info = {}
-    for line in result.stdout.split('\n'):
-        if 'SSID' in line and 'BSSID' not in line:
-            wifi_info['SSID'] = line.split(':')[1].strip()
-        elif 'BSSID' in line:
-            wifi_info['BSSID'] = line.split(':')[1].strip()
-        elif 'Signal' in line:
-            wifi_info['Signal'] = int(line.split(':')[1].strip().replace('%', ''))
-        elif 'Radio type' in line:
-            wifi_info['Frequency'] = line.split(':')[1].strip()
-        elif 'Channel' in line:
-            wifi_info['Channel'] = line.split(':')[1].strip()
-    return wifi_info
+    record = wifi_scanner.current()
+    if record is None:
+        return {}
+    return {
+        'SSID': record.ssid,
+        'BSSID': record.bssid,
+        'Signal': record.signal,
+        'Frequency': record.frequency,
+        'Channel': record.channel,
+    }
 
 # Function to measure throughput
-def get_throughput():
-    try:
-        st = speedtest.Speedtest(secure=True)
-        download_speed = st.download()
-        upload_speed = st.upload()
-        return download_speed, upload_speed
-    except Exception as e:
-        print(f"Error in throughput measurement: {e}")
-        return 0, 0
+# speedtest ใช้แบนด์วิดธ์ของลิงก์ที่กำลังวัดมาก จึงรันใน lane งานหนักห่าง ๆ และรันเพิ่มเมื่อ latency/loss ผิดปกติ
+THROUGHPUT_INTERVAL = 30 * 60    # วินาทีระหว่างการวัดตามปกติ
+THROUGHPUT_MIN_GAP = 5 * 60      # ระยะห่างขั้นต่ำเมื่อถูก trigger
+THROUGHPUT_MAX_AGE = 2 * THROUGHPUT_INTERVAL  # ค่าที่เก่ากว่านี้ไม่บันทึก
 
-# Function to measure latency
-def get_latency(host='8.8.8.8'):
-    try:
-        return ping3.ping(host)
-    except Exception as e:
-        print(f"Error in latency measurement: {e}")
-        return None
+# เงื่อนไข trigger: loss เกินค่านี้ หรือ latency เกิน TRIGGER_LATENCY_FACTOR เท่าของค่าเฉลี่ย (EWMA)
+TRIGGER_LOSS = 0.2
+TRIGGER_LATENCY_FACTOR = 3.0
+LATENCY_BASELINE_ALPHA = 0.1
 
-# Function to measure packet loss
-def get_packet_loss(host='8.8.8.8', count=10):
-    try:
-        lost = 0
-        for _ in range(count):
-            if ping3.ping(host) is None:
-                lost += 1
-        return lost / count
-    except Exception as e:
-        print(f"Error in packet loss measurement: {e}")
-        return 1
+latest_throughput = {'value': None, 'measured_at': None}
+latency_baseline = {'value': None}
+
+# งานในตาราง: probe ราคาถูกใน lane 'cheap', speedtest ใน lane 'expensive' (worker เดียว ไม่รันซ้อนกัน)
+job_scheduler = LaneScheduler({'cheap': 2, 'expensive': 1})
+
+def run_throughput_test():
+    download_speed, upload_speed = throughput.measure_throughput()
+    latest_throughput['value'] = (download_speed, upload_speed)
+    latest_throughput['measured_at'] = time.monotonic()
+
+# ค่า throughput ล่าสุดที่ยังไม่เก่าเกินไป (ไม่ต้องรอ speedtest ในรอบนี้)
+def get_throughput():
+    measured_at = latest_throughput['measured_at']
+    if measured_at is None or time.monotonic() - measured_at > THROUGHPUT_MAX_AGE:
+        return None, None
+    return latest_throughput['value']
+
+# สั่งวัด throughput เพิ่มเมื่อ latency หรือ loss ผิดปกติเทียบกับค่าปกติ
+def check_throughput_trigger(latency, packet_loss):
+    baseline = latency_baseline['value']
+    reason = None
+    if packet_loss is not None and packet_loss >= TRIGGER_LOSS:
+        reason = f"packet loss {packet_loss:.0%}"
+    elif latency is not None and baseline is not None and latency > baseline * TRIGGER_LATENCY_FACTOR:
+        reason = f"latency {latency * 1000:.1f} ms vs baseline {baseline * 1000:.1f} ms"
+    if latency is not None:
+        latency_baseline['value'] = latency if baseline is None else baseline + LATENCY_BASELINE_ALPHA * (latency - baseline)
+    if reason and 'run_throughput_test' in job_scheduler.jobs:
+        job_scheduler.trigger('run_throughput_test', reason)
+
+# Function to measure latency and packet loss
+# ยิง burst ไปทุก target ใน pinger.PING_TARGETS พร้อมกัน ได้ทั้ง latency และ loss จากรอบเดียว
+def get_ping_stats():
+    return pinger.probe_targets()
 
 # Function to measure bandwidth utilization
 def get_bandwidth_utilization():
     net_io = psutil.net_io_counters()
     return net_io.bytes_sent, net_io.bytes_recv
 
+# ติดตามอุปกรณ์ในเครือข่ายต่อเนื่องจาก ARP / DHCP / ND (เริ่มใน main)
+device_tracker = DeviceTracker()
+
+# อ่าน counter ของทุก NIC ทุก 0.5 วินาที แล้วบันทึกอัตราเฉลี่ย/peak ทุก 10 วินาที (เริ่มใน main)
+rate_sampler = bandwidth.RateSampler(on_summary=bandwidth.save_rates)
+
 # Function to count devices on the network
 def get_device_count():
-    devices = set()
+    return device_tracker.count()
 
-    def arp_display(pkt):
-        if pkt[ARP].op == 1:  # who-has (request)
-            devices.add(pkt[ARP].psrc)
+# probe ที่รันพร้อมกันในแต่ละรอบ และ timeout ของแต่ละตัว (วินาที)
+PROBE_TIMEOUTS = {
+    'wifi_info': 5,
+    'ping': 5,
+    'bandwidth': 2,
+}
 
-    sniff(prn=arp_display, filter="arp", store=0, count=10, timeout=10)
-    return len(devices)
+# ทั้งรอบต้องจบภายในสัดส่วนนี้ของ DELAY เพื่อไม่ให้ schedule เลื่อน
+CYCLE_BUDGET = 0.9
+
+probe_engine = ProbeEngine(max_workers=len(PROBE_TIMEOUTS))
 
 # Collect metrics and print information
 def collect_metrics():
-    wifi_info = get_current_wifi_info()
+    results = probe_engine.run([
+        Probe('wifi_info', get_current_wifi_info, PROBE_TIMEOUTS['wifi_info'], {}),
+        Probe('ping', get_ping_stats, PROBE_TIMEOUTS['ping'], {}),
+        Probe('bandwidth', get_bandwidth_utilization, PROBE_TIMEOUTS['bandwidth'], (0, 0)),
+    ], deadline=time.monotonic() + DELAY * CYCLE_BUDGET)
+    print(f"Probe durations: {format_durations(results)}")
+    exporter.observe_probes(results)
+
+    wifi_info = results['wifi_info'].value
     ssid = wifi_info.get('SSID', 'unknown')  # ดึง SSID
 
     # Update current Wi-Fi signal strength
     if 'Signal' in wifi_info and 'Frequency' in wifi_info:
-        signal_strength_gauge.labels(frequency=wifi_info['Frequency']).set(wifi_info['Signal'])
         print(f"SSID: {wifi_info.get('SSID', 'unknown')} | BSSID: {wifi_info.get('BSSID', 'unknown')} | Signal: {wifi_info.get('Signal')}% | Frequency: {wifi_info.get('Frequency')} | Channel: {wifi_info.get('Channel', 'unknown')}")
 
-    # Update throughput
+    # Update throughput (ค่าล่าสุดจาก lane งานหนัก)
     download_speed, upload_speed = get_throughput()
-    download_speed_gauge.set(download_speed)
-    upload_speed_gauge.set(upload_speed)
-    print(f"Download Speed: {download_speed / 1e6:.2f} Mbps")
-    print(f"Upload Speed: {upload_speed / 1e6:.2f} Mbps")
-
-    # Update latency
-    latency = get_latency()
+    if download_speed is not None:
+        print(f"Download Speed: {download_speed / 1e6:.2f} Mbps")
+        print(f"Upload Speed: {upload_speed / 1e6:.2f} Mbps")
+
+    # Update latency (ค่าหลักมาจาก pinger.PRIMARY_TARGET)
+    ping_stats = results['ping'].value
+    for stats in ping_stats.values():
+        if stats.avg is not None:
+            print(f"Ping {stats.target} ({stats.host}): min/avg/max/jitter = {stats.min * 1000:.1f}/{stats.avg * 1000:.1f}/{stats.max * 1000:.1f}/{stats.jitter * 1000:.1f} ms | loss {stats.loss:.0%}")
+    primary = ping_stats.get(pinger.PRIMARY_TARGET)
+    latency = primary.avg if primary else None
+    exporter.observe_ping(ping_stats, primary)
     if latency is not None:
-        latency_gauge.set(latency)
-        print(f"Latency: {latency:.2f} ms")
+        print(f"Latency: {latency * 1000:.2f} ms")
 
     # Update packet loss
-    packet_loss = get_packet_loss()
-    packet_loss_gauge.set(packet_loss)
+    packet_loss = primary.loss if primary else 1
     print(f"Packet Loss: {packet_loss:.2%}")
 
-    # Update bandwidth utilization
-    bytes_sent, bytes_recv = get_bandwidth_utilization()
-    bytes_sent_gauge.set(bytes_sent)
-    bytes_recv_gauge.set(bytes_recv)
+    # วัด throughput เพิ่มถ้า latency/loss ผิดปกติ
+    check_throughput_trigger(latency, packet_loss)
 
-    # Update device count
+    # Update bandwidth utilization
+    bytes_sent, bytes_recv = results['bandwidth'].value
+    rate = rate_sampler.current()
+    utilization, rx_rate, tx_rate = (rate.utilization, rate.rx_bytes, rate.tx_bytes) if rate else (None, None, None)
+    if rate:
+        util = f"{utilization:.1f}%" if utilization is not None else 'unknown link speed'
+        print(f"Bandwidth ({rate.interface}): rx {rx_rate * 8 / 1e6:.2f} Mbps | tx {tx_rate * 8 / 1e6:.2f} Mbps | utilization {util}")
+
+    # Update device count (อ่านจาก device_tracker ทันที ไม่ต้อง sniff ในรอบนี้)
     device_count = get_device_count()
-    device_count_gauge.set(device_count)
+
+    wifi_exporter.update_link(wifi_info, download_speed=download_speed, upload_speed=upload_speed, latency=latency,
+                              packet_loss=packet_loss, bytes_sent=bytes_sent, bytes_recv=bytes_recv,
+                              device_count=device_count, bandwidth_utilization=utilization)
 
     # Save network metrics to database
-    save_network_metrics_to_db(download_speed, upload_speed, latency, packet_loss, bytes_sent, bytes_recv, device_count, ssid)
+    save_network_metrics_to_db(download_speed, upload_speed, latency, packet_loss, bytes_sent, bytes_recv, device_count, ssid, utilization, rx_rate, tx_rate)
+
+def main():
+    # Start Prometheus server (ความยาวคิวภายในอ่านตอน scrape)
+    wifi_exporter.register_queue('scan_ingest', scan_ingestor.queue_depth)
+    wifi_exporter.register_queue('ddos_detector', detector_queue.qsize)
+    wifi_exporter.register_queue('alert_engine', alert_engine.queue_depth)
+    if fleet_pusher is not None:
+        wifi_exporter.register_queue('fleet_buffer', lambda: fleet_pusher.stats()['buffered_rows'])
+    exporter.start(wifi_exporter)
+
+    # หน้า /debug/timings, /debug/trace.json, /debug/profile (localhost เท่านั้น tracing เปิดด้วย WIFI_TRACE=1 หรือ ?on=1)
+    try:
+        tracing.serve_debug()
+    except OSError as e:
+        print(f"Debug timings page disabled: {e}")
+
+    # Setup database
+    setup_database()
 
-# Start Prometheus server
-start_http_server(8000)
+    # เริ่ม thread เขียนผลสแกนแบบ batch
+    scan_ingestor.start()
 
-# Setup database
-setup_database()
+    # เริ่มประเมินกฎแจ้งเตือน (โหลด incident ที่ยังเปิดอยู่จากฐานข้อมูลก่อน)
+    alert_engine.start()
 
-# Collect Wi-Fi networks every 60 seconds
-schedule.every(DELAY).seconds.do(collect_and_save_wifi_networks)
-schedule.every(DELAY).seconds.do(collect_metrics)
+    # เริ่ม thread ส่งข้อมูลไปที่ aggregator (ถ้าตั้ง FLEET_URL)
+    if fleet_pusher is not None:
+        fleet_pusher.start()
 
-while True:
-    schedule.run_pending()
-    time.sleep(1) 
+    # เริ่มตัวตรวจจับ DDoS แบบ streaming (โหลด state จาก checkpoint ถ้ามี)
+    _, detector_thread = ddos_detection.start_detector_thread(detector_queue)
+
+    # เริ่มอ่านอัตรารับ-ส่งของแต่ละ NIC
+    rate_sampler.start()
+
+    # เริ่มติดตามอุปกรณ์แบบ passive
+    try:
+        device_tracker.start()
+    except Exception as e:
+        print(f"Device tracker disabled: {e}")
+
+    # เริ่ม capture แพ็กเก็ตแบบสรุปต่อช่วงเวลา (ต้องมีสิทธิ์ capture ถ้าไม่มีก็ทำงานต่อโดยไม่มีข้อมูลส่วนนี้)
+    capture = None
+    try:
+        capture = traffic_capture.TrafficCapture(TRAFFIC_INTERVAL)
+        capture.start()
+    except Exception as e:
+        print(f"Traffic capture disabled: {e}")
+        capture = None
+
+    # Collect Wi-Fi networks every 60 seconds
+    # ทุกงานถูกวัดเวลา และนับรอบที่เกิน budget เป็น overrun
+    job_scheduler.every(DELAY, exporter.timed_job(collect_and_save_wifi_networks, DELAY * CYCLE_BUDGET))
+    job_scheduler.every(DELAY, exporter.timed_job(collect_metrics, DELAY * CYCLE_BUDGET))
+    job_scheduler.every(DELAY, exporter.timed_job(update_rollups, DELAY * CYCLE_BUDGET), run_at_start=False)
+    job_scheduler.every(DELAY, exporter.timed_job(update_rf_analytics, DELAY * CYCLE_BUDGET), run_at_start=False)
+    job_scheduler.every(THROUGHPUT_INTERVAL, exporter.timed_job(run_throughput_test), lane='expensive', jitter=0.2,
+                        min_gap=THROUGHPUT_MIN_GAP)
+    job_scheduler.start()
+
+    try:
+        while True:
+            time.sleep(3600)
+    finally:
+        # thread พื้นหลังเป็น daemon: ปิดช่วงเวลาที่ค้างของ traffic capture และ checkpoint state ของตัวตรวจจับก่อนออก (Ctrl+C / SystemExit)
+        if capture is not None:
+            capture.stop()
+        # ปิด session อุปกรณ์ที่ค้างอยู่ลงฐานข้อมูล
+        device_tracker.stop()
+        ddos_detection.stop_detector_thread(detector_queue, detector_thread)
+        # เขียน incident ที่เปลี่ยนแต่ยังไม่ได้บันทึก
+        alert_engine.stop()
+        # เขียนผลสแกนที่ค้างในคิวลงฐานข้อมูล
+        scan_ingestor.stop()
+        # เขียนแถวที่ค้างใน buffer ลง spool แล้วลองส่งรอบสุดท้าย (ส่งไม่ได้ก็ค้างใน spool ไว้ส่งตอนเริ่มใหม่)
+        if fleet_pusher is not None:
+            fleet_pusher.stop()
+
+if __name__ == '__main__':
+    main()
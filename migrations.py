@@ -0,0 +1,384 @@
+import storage
+
+# timestamp แบบ TEXT ในฐานข้อมูลเดิมถูกบันทึกเป็นเวลาท้องถิ่น (Asia/Bangkok, UTC+7 ไม่มี DST)
+# ใช้ค่านี้แปลงเป็น epoch (UTC) ตอน migrate ข้อมูลเดิม
+LEGACY_LOCAL_OFFSET = '-7 hours'
+
+
+# ---- migration 1: epoch timestamp, primary key, index และตาราง SSID ----
+def _migration_1_time_index(conn):
+    # สร้างตาราง network_metrics ใหม่ให้มี primary key และคอลัมน์ ts (epoch วินาที)
+    conn.execute('''
+        CREATE TABLE network_metrics_new (
+            id INTEGER PRIMARY KEY,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            download_speed REAL,
+            upload_speed REAL,
+            latency REAL,
+            packet_loss REAL,
+            bytes_sent INTEGER,
+            bytes_recv INTEGER,
+            device_count INTEGER,
+            ssid TEXT,
+            ts INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+        )
+    ''')
+    conn.execute(f'''
+        INSERT INTO network_metrics_new (timestamp, download_speed, upload_speed, latency, packet_loss,
+                                         bytes_sent, bytes_recv, device_count, ssid, ts)
+        SELECT timestamp, download_speed, upload_speed, latency, packet_loss,
+               bytes_sent, bytes_recv, device_count, ssid,
+               COALESCE(CAST(strftime('%s', timestamp, '{LEGACY_LOCAL_OFFSET}') AS INTEGER), 0)
+        FROM network_metrics
+        ORDER BY timestamp
+    ''')
+    conn.execute('DROP TABLE network_metrics')
+    conn.execute('ALTER TABLE network_metrics_new RENAME TO network_metrics')
+
+    # ตาราง metrics (ผลสแกนราย BSSID)
+    conn.execute('''
+        CREATE TABLE metrics_new (
+            id INTEGER PRIMARY KEY,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            ssid TEXT,
+            bssid TEXT,
+            signal_strength INTEGER,
+            frequency TEXT,
+            channel TEXT,
+            ts INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+        )
+    ''')
+    conn.execute(f'''
+        INSERT INTO metrics_new (timestamp, ssid, bssid, signal_strength, frequency, channel, ts)
+        SELECT timestamp, ssid, bssid, signal_strength, frequency, channel,
+               COALESCE(CAST(strftime('%s', timestamp, '{LEGACY_LOCAL_OFFSET}') AS INTEGER), 0)
+        FROM metrics
+        ORDER BY timestamp
+    ''')
+    conn.execute('DROP TABLE metrics')
+    conn.execute('ALTER TABLE metrics_new RENAME TO metrics')
+
+    # alerts มี primary key อยู่แล้ว เพิ่มแค่ ts (เวลาเดิมมาจาก pd.to_datetime('now') ซึ่งเป็น UTC)
+    conn.execute('ALTER TABLE alerts ADD COLUMN ts INTEGER')
+    conn.execute("UPDATE alerts SET ts = COALESCE(CAST(strftime('%s', timestamp) AS INTEGER), 0)")
+
+    conn.execute('CREATE INDEX idx_network_metrics_ts ON network_metrics (ts)')
+    conn.execute('CREATE INDEX idx_network_metrics_ssid_ts ON network_metrics (ssid, ts)')
+    conn.execute('CREATE INDEX idx_metrics_ts ON metrics (ts)')
+    conn.execute('CREATE INDEX idx_metrics_ssid_ts ON metrics (ssid, ts)')
+    conn.execute('CREATE INDEX idx_metrics_bssid_ts ON metrics (bssid, ts)')
+    conn.execute('CREATE INDEX idx_alerts_ts ON alerts (ts)')
+
+    # ตาราง dimension ของ SSID ที่ collector เชื่อมต่อ (แทน SELECT DISTINCT บนตารางใหญ่)
+    conn.execute('''
+        CREATE TABLE ssids (
+            id INTEGER PRIMARY KEY,
+            ssid TEXT NOT NULL UNIQUE,
+            first_seen INTEGER NOT NULL,
+            last_seen INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO ssids (ssid, first_seen, last_seen)
+        SELECT ssid, MIN(ts), MAX(ts) FROM network_metrics
+        WHERE ssid IS NOT NULL
+        GROUP BY ssid
+    ''')
+    # อัปเดตตาราง ssids อัตโนมัติทุกครั้งที่มีแถวใหม่ ไม่ว่าจะเขียนจากที่ไหน
+    conn.execute('''
+        CREATE TRIGGER trg_network_metrics_ssid AFTER INSERT ON network_metrics
+        WHEN NEW.ssid IS NOT NULL
+        BEGIN
+            INSERT INTO ssids (ssid, first_seen, last_seen) VALUES (NEW.ssid, NEW.ts, NEW.ts)
+            ON CONFLICT (ssid) DO UPDATE SET last_seen = MAX(last_seen, excluded.last_seen);
+        END
+    ''')
+
+
+# ---- migration 2: ตาราง rollup (1m/5m/1h) สำหรับกราฟช่วงเวลายาว ----
+def _migration_2_rollups(conn):
+    conn.execute('''
+        CREATE TABLE network_rollups (
+            tier TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            ssid TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            n INTEGER NOT NULL,
+            min REAL,
+            max REAL,
+            avg REAL,
+            p95 REAL,
+            PRIMARY KEY (tier, metric, ssid, bucket)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX idx_network_rollups_bucket ON network_rollups (tier, metric, bucket)')
+    # bucket สุดท้าย (ไม่รวม) ที่ทำ rollup ไปแล้วของแต่ละ tier
+    conn.execute('''
+        CREATE TABLE rollup_state (
+            tier TEXT PRIMARY KEY,
+            last_bucket INTEGER NOT NULL
+        )
+    ''')
+
+
+# ---- migration 3: สรุปทราฟฟิกระดับแพ็กเก็ตจาก traffic_capture ----
+def _migration_3_traffic_summaries(conn):
+    conn.execute('''
+        CREATE TABLE traffic_summaries (
+            id INTEGER PRIMARY KEY,
+            ts INTEGER NOT NULL,
+            interval INTEGER NOT NULL,
+            packets INTEGER NOT NULL,
+            bytes INTEGER NOT NULL,
+            syn INTEGER NOT NULL,
+            peak_pps INTEGER NOT NULL,
+            peak_bps INTEGER NOT NULL,
+            distinct_sources INTEGER NOT NULL,
+            top_sources TEXT
+        )
+    ''')
+    conn.execute('CREATE INDEX idx_traffic_summaries_ts ON traffic_summaries (ts)')
+
+
+# ---- migration 4: session ของอุปกรณ์จาก device_tracker ----
+def _migration_4_device_sessions(conn):
+    conn.execute('''
+        CREATE TABLE device_sessions (
+            id INTEGER PRIMARY KEY,
+            mac TEXT NOT NULL,
+            ip TEXT,
+            source TEXT,
+            first_seen INTEGER NOT NULL,
+            last_seen INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX idx_device_sessions_last_seen ON device_sessions (last_seen)')
+    conn.execute('CREATE INDEX idx_device_sessions_mac ON device_sessions (mac, first_seen)')
+
+
+# ---- migration 5: อัตรารับ-ส่งต่อ NIC และคอลัมน์ bandwidth ใน network_metrics ----
+def _migration_5_interface_rates(conn):
+    conn.execute('''
+        CREATE TABLE interface_rates (
+            id INTEGER PRIMARY KEY,
+            ts INTEGER NOT NULL,
+            interface TEXT NOT NULL,
+            interval REAL NOT NULL,
+            rx_bytes REAL NOT NULL,
+            tx_bytes REAL NOT NULL,
+            rx_packets REAL NOT NULL,
+            tx_packets REAL NOT NULL,
+            peak_rx_bytes REAL,
+            peak_tx_bytes REAL,
+            utilization REAL,
+            link_speed REAL
+        )
+    ''')
+    conn.execute('CREATE INDEX idx_interface_rates_ts ON interface_rates (ts)')
+    conn.execute('CREATE INDEX idx_interface_rates_interface_ts ON interface_rates (interface, ts)')
+    # ค่าของ interface หลักในแต่ละรอบ: bandwidth = utilization (%), rx_rate / tx_rate = bytes/s
+    conn.execute('ALTER TABLE network_metrics ADD COLUMN bandwidth REAL')
+    conn.execute('ALTER TABLE network_metrics ADD COLUMN rx_rate REAL')
+    conn.execute('ALTER TABLE network_metrics ADD COLUMN tx_rate REAL')
+
+
+# ---- migration 6: ข้อมูลจากหลาย probe (fleet) ----
+def _migration_6_fleet(conn):
+    # NULL = ข้อมูลจาก collector ในเครื่องนี้เอง
+    conn.execute('ALTER TABLE network_metrics ADD COLUMN probe_id TEXT')
+    conn.execute('ALTER TABLE metrics ADD COLUMN probe_id TEXT')
+    conn.execute('CREATE INDEX idx_network_metrics_probe_ts ON network_metrics (probe_id, ts)')
+    conn.execute('''
+        CREATE TABLE probes (
+            probe_id TEXT PRIMARY KEY,
+            hostname TEXT,
+            first_seen INTEGER NOT NULL,
+            last_seen INTEGER NOT NULL,
+            batches INTEGER NOT NULL DEFAULT 0,
+            rows INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    # batch ที่รับแล้ว ใช้ตัด batch ที่ probe ส่งซ้ำ
+    conn.execute('''
+        CREATE TABLE ingest_batches (
+            probe_id TEXT NOT NULL,
+            batch_id TEXT NOT NULL,
+            received_at INTEGER NOT NULL,
+            rows INTEGER NOT NULL,
+            PRIMARY KEY (probe_id, batch_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX idx_ingest_batches_received_at ON ingest_batches (received_at)')
+
+
+# ---- migration 7: alert แบบ incident (หนึ่งแถวต่อเหตุการณ์ เปิด/ปิดตาม alert_engine) ----
+def _migration_7_alert_incidents(conn):
+    conn.execute('ALTER TABLE alerts ADD COLUMN rule TEXT')
+    conn.execute('ALTER TABLE alerts ADD COLUMN ssid TEXT')
+    conn.execute("ALTER TABLE alerts ADD COLUMN state TEXT NOT NULL DEFAULT 'resolved'")
+    conn.execute('ALTER TABLE alerts ADD COLUMN value REAL')        # ค่าที่แย่ที่สุดระหว่างเหตุการณ์
+    conn.execute('ALTER TABLE alerts ADD COLUMN samples INTEGER')   # จำนวน sample ที่เกิน threshold
+    conn.execute('ALTER TABLE alerts ADD COLUMN last_ts INTEGER')   # sample ล่าสุดที่เกิน threshold
+    conn.execute('ALTER TABLE alerts ADD COLUMN resolved_ts INTEGER')
+    # แถวเดิมมาจากการตรวจ threshold ของหน้าเว็บ (ซ้ำกันตามจำนวนครั้งที่เปิดหน้า)
+    conn.execute("UPDATE alerts SET rule = 'dashboard', last_ts = ts, resolved_ts = ts")
+    conn.execute('CREATE INDEX idx_alerts_rule_ts ON alerts (rule, ts)')
+    conn.execute('CREATE INDEX idx_alerts_ssid_ts ON alerts (ssid, ts)')
+    conn.execute("CREATE INDEX idx_alerts_open ON alerts (rule, ssid) WHERE state = 'open'")
+
+
+# ---- migration 8: สรุปผลสแกน RF (rf_analytics) สำหรับ heatmap ช่องสัญญาณและรายการ AP ข้างเคียง ----
+def _migration_8_rf_analytics(conn):
+    # probe = '' คือ collector ในเครื่องนี้ (metrics.probe_id เป็น NULL)
+    # จำนวนรอบสแกนต่อชั่วโมง (ตัวหารของค่าเฉลี่ยต่อรอบ)
+    conn.execute('''
+        CREATE TABLE rf_scans (
+            probe TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            scans INTEGER NOT NULL,
+            PRIMARY KEY (probe, bucket)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX idx_rf_scans_bucket ON rf_scans (bucket)')
+    # ผลรวมต่อชั่วโมงต่อช่อง: จำนวน BSSID, สัญญาณ และคะแนน interference ที่ถ่วงด้วยการซ้อนทับของช่อง
+    conn.execute('''
+        CREATE TABLE rf_channels (
+            probe TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            band TEXT NOT NULL,
+            channel INTEGER NOT NULL,
+            bssids INTEGER NOT NULL,
+            signal_sum REAL NOT NULL,
+            max_signal INTEGER,
+            interference REAL NOT NULL,
+            PRIMARY KEY (probe, bucket, band, channel)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX idx_rf_channels_bucket ON rf_channels (band, bucket)')
+    # ต่อวันต่อ BSSID และ histogram ของสัญญาณ (ใช้หา percentile ได้ทุกช่วงเวลาโดยไม่อ่านผลสแกนดิบ)
+    conn.execute('''
+        CREATE TABLE rf_bssids (
+            probe TEXT NOT NULL,
+            day INTEGER NOT NULL,
+            bssid TEXT NOT NULL,
+            ssid TEXT,
+            band TEXT,
+            channel INTEGER,
+            samples INTEGER NOT NULL,
+            signal_sum REAL NOT NULL,
+            max_signal INTEGER,
+            first_seen INTEGER NOT NULL,
+            last_seen INTEGER NOT NULL,
+            PRIMARY KEY (probe, day, bssid)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX idx_rf_bssids_day ON rf_bssids (day)')
+    conn.execute('''
+        CREATE TABLE rf_bssid_signal (
+            probe TEXT NOT NULL,
+            day INTEGER NOT NULL,
+            bssid TEXT NOT NULL,
+            signal INTEGER NOT NULL,
+            samples INTEGER NOT NULL,
+            PRIMARY KEY (probe, day, bssid, signal)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX idx_rf_bssid_signal_day ON rf_bssid_signal (day)')
+    # id สุดท้ายของตาราง metrics ที่สรุปแล้ว
+    conn.execute('''
+        CREATE TABLE rf_state (
+            name TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL
+        )
+    ''')
+
+
+# ---- migration 9: bucket ของ rollup ที่ต้องคำนวณใหม่เพราะมีข้อมูลมาช้า (batch ที่ค้างใน spool ของ probe) ----
+def _migration_9_rollup_dirty(conn):
+    # marks เพิ่มทุกครั้งที่ถูก mark ซ้ำ ใช้ลบเฉพาะ entry ที่ไม่ถูก mark ใหม่ระหว่างคำนวณ
+    conn.execute('''
+        CREATE TABLE rollup_dirty (
+            tier TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            marks INTEGER NOT NULL,
+            PRIMARY KEY (tier, bucket)
+        ) WITHOUT ROWID
+    ''')
+
+
+# ---- migration 10: alert ของ fleet (aggregator ประเมินกฎกับแถวที่ probe ส่งมา) ----
+def _migration_10_fleet_alerts(conn):
+    # NULL = incident ของ collector ในเครื่องนี้เอง
+    conn.execute('ALTER TABLE alerts ADD COLUMN probe_id TEXT')
+    # id สุดท้ายของ network_metrics ที่ aggregator ประเมินกฎแล้ว
+    conn.execute('''
+        CREATE TABLE alert_state (
+            name TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL
+        )
+    ''')
+
+
+# ---- migration 11: rollup แยกตาม probe (กราฟช่วงยาวกรองเฉพาะบาง probe ได้) ----
+def _migration_11_rollup_probe(conn):
+    # '' = แถวของเครื่องนี้เอง (probe_id เป็น NULL ใน network_metrics)
+    conn.execute('''
+        CREATE TABLE network_rollups_new (
+            tier TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            probe_id TEXT NOT NULL DEFAULT '',
+            ssid TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            n INTEGER NOT NULL,
+            min REAL,
+            max REAL,
+            avg REAL,
+            p95 REAL,
+            PRIMARY KEY (tier, metric, probe_id, ssid, bucket)
+        ) WITHOUT ROWID
+    ''')
+    # rollup เดิมรวมทุก probe ไว้ด้วยกัน เก็บไว้เป็น probe_id '' (ข้อมูลดิบของช่วงนั้นอาจไม่อยู่ให้คำนวณใหม่แล้ว)
+    conn.execute('''
+        INSERT INTO network_rollups_new (tier, metric, ssid, bucket, n, min, max, avg, p95)
+        SELECT tier, metric, ssid, bucket, n, min, max, avg, p95 FROM network_rollups
+    ''')
+    conn.execute('DROP TABLE network_rollups')
+    conn.execute('ALTER TABLE network_rollups_new RENAME TO network_rollups')
+    conn.execute('CREATE INDEX idx_network_rollups_bucket ON network_rollups (tier, metric, bucket)')
+
+
+# รายการ migration เรียงตามเวอร์ชัน (เพิ่มต่อท้ายเท่านั้น ห้ามแก้ของเดิม)
+MIGRATIONS = [
+    (1, 'epoch timestamps, primary keys, time indexes, ssids table', _migration_1_time_index),
+    (2, 'rollup tables', _migration_2_rollups),
+    (3, 'traffic summaries', _migration_3_traffic_summaries),
+    (4, 'device sessions', _migration_4_device_sessions),
+    (5, 'interface rates', _migration_5_interface_rates),
+    (6, 'fleet probes', _migration_6_fleet),
+    (7, 'alert incidents', _migration_7_alert_incidents),
+    (8, 'rf analytics', _migration_8_rf_analytics),
+    (9, 'rollup dirty buckets', _migration_9_rollup_dirty),
+    (10, 'fleet alerts', _migration_10_fleet_alerts),
+    (11, 'rollups per probe', _migration_11_rollup_probe),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+# รัน migration ที่ยังไม่ได้รันทีละเวอร์ชัน แต่ละเวอร์ชันอยู่ใน transaction ของตัวเอง
+def migrate(path=None):
+    applied = []
+    for version, name, fn in MIGRATIONS:
+        with storage.transaction(path) as conn:
+            # อ่านเวอร์ชันหลังได้ write lock แล้ว กันสอง process migrate ซ้อนกัน
+            if get_schema_version(conn) >= version:
+                continue
+            fn(conn)
+            conn.execute(f'PRAGMA user_version = {version}')
+        print(f"Applied schema migration {version}: {name}")
+        applied.append(version)
+    return applied
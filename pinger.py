@@ -0,0 +1,186 @@
+import select
+import socket
+import struct
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# เป้าหมายที่ ping ทุกรอบ: (ชื่อ, host) โดย host 'gateway' จะถูกแทนด้วย default gateway ของเครื่อง
+PING_TARGETS = [
+    ('gateway', 'gateway'),
+    ('dns', '8.8.8.8'),
+    ('upstream', '1.1.1.1'),
+]
+
+# target ที่ใช้เป็นค่า latency / packet loss หลักของรอบ (ตรงกับค่าเดิม 8.8.8.8)
+PRIMARY_TARGET = 'dns'
+
+BURST_COUNT = 10       # จำนวน probe ต่อ target ต่อรอบ
+BURST_INTERVAL = 0.05  # เว้นระหว่าง probe (วินาที)
+PROBE_TIMEOUT = 1.0    # รอคำตอบของแต่ละ probe (วินาที)
+
+# สถิติของหนึ่ง target ในหนึ่งรอบ (หน่วยวินาที เหมือน ping3 และคอลัมน์ latency ในฐานข้อมูล)
+PingStats = namedtuple('PingStats', ['target', 'host', 'sent', 'received', 'loss', 'min', 'avg', 'max', 'jitter', 'rtts'])
+
+
+# สรุป RTT ของหนึ่ง burst (None = ไม่ได้คำตอบ)
+def summarize(target, host, rtts):
+    sent = len(rtts)
+    replies = [rtt for rtt in rtts if rtt is not None]
+    received = len(replies)
+    loss = (sent - received) / sent if sent else 1.0
+    if not replies:
+        return PingStats(target, host, sent, 0, loss, None, None, None, None, rtts)
+    # jitter: ค่าเฉลี่ยของผลต่าง RTT ที่ติดกัน
+    diffs = [abs(b - a) for a, b in zip(replies, replies[1:])]
+    jitter = sum(diffs) / len(diffs) if diffs else 0.0
+    return PingStats(target, host, sent, received, loss, min(replies), sum(replies) / received,
+                     max(replies), jitter, rtts)
+
+
+# หา default gateway จากตาราง route ของ Linux (ระบบอื่นคืนค่า None)
+def default_gateway():
+    try:
+        with open('/proc/net/route') as f:
+            for line in f.readlines()[1:]:
+                fields = line.split()
+                if fields[1] == '00000000' and int(fields[3], 16) & 2:
+                    return socket.inet_ntoa(struct.pack('<L', int(fields[2], 16)))
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
+
+
+def resolve_host(host):
+    return default_gateway() if host == 'gateway' else host
+
+
+# ICMP burst: ยิง probe ทีละตัวห่างกัน BURST_INTERVAL โดยไม่รอคำตอบตัวก่อน (แต่ละตัวอยู่ใน thread ของตัวเอง)
+def icmp_burst(host, count=BURST_COUNT, interval=BURST_INTERVAL, timeout=PROBE_TIMEOUT):
+    import ping3
+
+    rtts = [None] * count
+
+    def _probe(seq):
+        try:
+            rtt = ping3.ping(host, timeout=timeout, seq=seq)
+            rtts[seq] = rtt if rtt else None  # ping3 คืน False/None เมื่อไม่ได้คำตอบ
+        except Exception:
+            rtts[seq] = None
+
+    threads = []
+    for seq in range(count):
+        thread = threading.Thread(target=_probe, args=(seq,), daemon=True)
+        thread.start()
+        threads.append(thread)
+        time.sleep(interval)
+    for thread in threads:
+        thread.join(timeout + interval)
+    return rtts
+
+
+# UDP burst: ส่ง datagram ที่มีเลข sequence ไปยัง echo server แล้วรอคำตอบทั้งหมดพร้อมกันด้วย select
+def udp_burst(host, port, count=BURST_COUNT, interval=BURST_INTERVAL, timeout=PROBE_TIMEOUT):
+    rtts = [None] * count
+    sent_at = [0.0] * count
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.setblocking(False)
+        sock.connect((host, port))
+        pending = count
+        next_send = 0
+        deadline = None
+        while pending:
+            now = time.perf_counter()
+            if next_send < count and now >= (sent_at[next_send - 1] + interval if next_send else 0):
+                sent_at[next_send] = now
+                try:
+                    sock.send(struct.pack('!I', next_send))
+                except OSError:
+                    pass
+                next_send += 1
+                if next_send == count:
+                    deadline = now + timeout
+                continue
+
+            wake = sent_at[next_send - 1] + interval if next_send < count else deadline
+            ready, _, _ = select.select([sock], [], [], max(0.0, wake - time.perf_counter()))
+            if ready:
+                try:
+                    data = sock.recv(64)
+                except OSError:
+                    continue  # เช่น ICMP port unreachable
+                if len(data) >= 4:
+                    seq = struct.unpack('!I', data[:4])[0]
+                    if seq < next_send and rtts[seq] is None:
+                        rtt = time.perf_counter() - sent_at[seq]
+                        if rtt <= timeout:
+                            rtts[seq] = rtt
+                            pending -= 1
+            elif deadline is not None and time.perf_counter() >= deadline:
+                break
+    finally:
+        sock.close()
+    return rtts
+
+
+# ยิง burst ไปทุก target พร้อมกัน คืนค่า dict ชื่อ target -> PingStats
+# mode: 'icmp' หรือ 'udp' (udp ต้องระบุ udp_port ของ echo server)
+def probe_targets(targets=None, count=BURST_COUNT, interval=BURST_INTERVAL, timeout=PROBE_TIMEOUT,
+                  mode='icmp', udp_port=7):
+    targets = targets or PING_TARGETS
+    resolved = [(name, resolve_host(host)) for name, host in targets]
+    resolved = [(name, host) for name, host in resolved if host]
+
+    def _run(name, host):
+        if mode == 'udp':
+            rtts = udp_burst(host, udp_port, count, interval, timeout)
+        else:
+            rtts = icmp_burst(host, count, interval, timeout)
+        return summarize(name, host, rtts)
+
+    if not resolved:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(resolved), thread_name_prefix='ping') as executor:
+        futures = {name: executor.submit(_run, name, host) for name, host in resolved}
+        return {name: future.result() for name, future in futures.items()}
+
+
+# UDP echo server บน loopback สำหรับทดสอบ prober โดยไม่ต้องออกเน็ต
+# drop_every: ทิ้งทุก ๆ n แพ็กเก็ต (0 = ไม่ทิ้ง), delay: หน่วงก่อนตอบ (วินาที)
+class LoopbackEchoServer:
+    def __init__(self, host='127.0.0.1', port=0, drop_every=0, delay=0.0):
+        self.drop_every = drop_every
+        self.delay = delay
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind((host, port))
+        self._sock.settimeout(0.2)
+        self.address = self._sock.getsockname()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._serve, name='udp-echo', daemon=True)
+        self.received = 0
+
+    def _serve(self):
+        while not self._stop.is_set():
+            try:
+                data, addr = self._sock.recvfrom(64)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self.received += 1
+            if self.drop_every and self.received % self.drop_every == 0:
+                continue
+            if self.delay:
+                time.sleep(self.delay)
+            self._sock.sendto(data, addr)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sock.close()
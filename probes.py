@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import tracing
+
+# probe หนึ่งตัว: ชื่อ, ฟังก์ชันที่เรียก, timeout (วินาที), ค่าที่ใช้แทนเมื่อ timeout/error
+Probe = namedtuple('Probe', ['name', 'fn', 'timeout', 'default'])
+
+# ผลของ probe: status เป็น 'ok', 'timeout', 'error' หรือ 'skipped' (รอบก่อนยังไม่จบ)
+ProbeResult = namedtuple('ProbeResult', ['name', 'value', 'status', 'duration', 'error'])
+
+
+# รัน probe ที่ไม่ขึ้นต่อกันพร้อมกันใน thread pool โดยแต่ละตัวมี timeout ของตัวเอง
+# และทั้งรอบมี deadline ร่วมกัน probe ที่เกินเวลาจะได้ค่า default ทันที ไม่ดึงรอบให้ช้าลง
+class ProbeEngine:
+    def __init__(self, max_workers=8):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='probe')
+        self._running = {}  # name -> future ของ probe ที่ยังไม่จบ (รวมที่ timeout ไปแล้ว)
+        self._lock = threading.Lock()
+        self.last_results = {}
+
+    def _call(self, probe):
+        start = time.perf_counter()
+        try:
+            with tracing.span(f'probe.{probe.name}'):
+                return probe.fn(), None, time.perf_counter() - start
+        except Exception as e:
+            return probe.default, e, time.perf_counter() - start
+
+    # รัน probe ทั้งหมด คืนค่า dict ชื่อ -> ProbeResult
+    def run(self, probes, deadline=None):
+        started = time.monotonic()
+        futures = {}
+        results = {}
+        with self._lock:
+            for probe in probes:
+                previous = self._running.get(probe.name)
+                if previous is not None and not previous.done():
+                    # thread ของรอบก่อนยังค้างอยู่ ไม่ส่งงานซ้อนเพิ่ม
+                    results[probe.name] = ProbeResult(probe.name, probe.default, 'skipped', 0.0, None)
+                    continue
+                future = self._executor.submit(self._call, probe)
+                self._running[probe.name] = future
+                futures[probe.name] = (probe, future)
+
+        for name, (probe, future) in futures.items():
+            limit = started + probe.timeout
+            if deadline is not None:
+                limit = min(limit, deadline)
+            wait([future], timeout=max(0.0, limit - time.monotonic()))
+            if not future.done():
+                results[name] = ProbeResult(name, probe.default, 'timeout', time.monotonic() - started, None)
+                continue
+            value, error, duration = future.result()
+            if error is not None:
+                results[name] = ProbeResult(name, value, 'error', duration, error)
+            else:
+                results[name] = ProbeResult(name, value, 'ok', duration, None)
+
+        self.last_results = results
+        return results
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# แสดงเวลาที่แต่ละ probe ใช้ในรอบนี้
+def format_durations(results):
+    return ' | '.join(f"{r.name}: {r.duration:.2f}s ({r.status})" for r in results.values())
@@ -0,0 +1,137 @@
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+import storage
+
+WATCH_INTERVAL = 0.25     # วินาทีระหว่างการเช็ก PRAGMA data_version (ราคาถูก ไม่อ่านตาราง)
+HEARTBEAT_INTERVAL = 15   # วินาที ส่ง comment กัน proxy ตัดการเชื่อมต่อ
+CLIENT_QUEUE_SIZE = 64    # event ที่ค้างต่อ client ได้ เกินนี้ถือว่า client ช้าเกินและตัดทิ้ง
+BUFFER_ROWS = 5000        # แถวล่าสุดที่เก็บไว้ในหน่วยความจำให้ callback ของทุก tab ใช้ร่วมกัน
+
+# คอลัมน์เดียวกับที่ app.get_data_from_db อ่าน (เพิ่ม id และ probe_id)
+LIVE_COLUMNS = ['id', 'ts', 'timestamp', 'ssid', 'download_speed', 'upload_speed', 'latency', 'packet_loss',
+                'bytes_sent', 'bytes_recv', 'device_count', 'bandwidth', 'rx_rate', 'tx_rate', 'probe_id']
+
+
+# กระจาย event ไปยังทุก client ที่เชื่อมต่อ (SSE) โดยอ่านฐานข้อมูลครั้งเดียวต่อการเขียนหนึ่งครั้ง
+# ไม่ว่าจะเปิดกี่ tab: thread เดียวเฝ้า PRAGMA data_version แล้วอ่านเฉพาะแถวใหม่ตาม id
+class PushBroker:
+    def __init__(self, path=None, watch_interval=WATCH_INTERVAL, buffer_rows=BUFFER_ROWS):
+        self.path = path
+        self.watch_interval = watch_interval
+        self._clients = set()
+        self._lock = threading.Lock()
+        self._rows = deque(maxlen=buffer_rows)  # แถวใหม่ล่าสุด (tuple ตาม LIVE_COLUMNS)
+        self._thread = None
+        self._stop = threading.Event()
+        self.last_id = None
+        self.events = 0
+        self.dropped_clients = 0
+
+    # เริ่ม thread เฝ้าฐานข้อมูลตอนมี client แรก (ไม่ทำงานตอน import)
+    def ensure_started(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._watch, name='push-watcher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        with self._lock:
+            self._clients.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._clients.discard(q)
+
+    def client_count(self):
+        with self._lock:
+            return len(self._clients)
+
+    # ส่ง event เดียวกันให้ทุก client (encode ครั้งเดียว) client ที่คิวเต็มถูกตัดออก
+    def publish(self, event, data, event_id=None):
+        message = format_event(event, data, event_id)
+        with self._lock:
+            clients = list(self._clients)
+        for q in clients:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                self.unsubscribe(q)
+                self.dropped_clients += 1
+        self.events += 1
+
+    # แถวใหม่กว่า ts จาก buffer ในหน่วยความจำ คืนค่า None ถ้า buffer ไม่ครอบคลุมช่วงนั้น (ให้ไปอ่านฐานข้อมูลแทน)
+    def rows_since(self, ts):
+        with self._lock:
+            if not self._rows or self._rows[0][1] >= ts:
+                return None
+            return [row for row in self._rows if row[1] >= ts]
+
+    def _read_new_rows(self):
+        columns = ', '.join(LIVE_COLUMNS)
+        return storage.query(f'SELECT {columns} FROM network_metrics WHERE id > ? ORDER BY id', (self.last_id,), self.path)
+
+    def _watch(self):
+        conn = storage.get_connection(self.path)
+        version = conn.execute('PRAGMA data_version').fetchone()[0]
+        self.last_id = storage.query_one('SELECT COALESCE(MAX(id), 0) FROM network_metrics', (), self.path)[0]
+        # เติม buffer ด้วยแถวล่าสุดก่อน tab แรกจะขอ
+        recent = storage.query(f"SELECT {', '.join(LIVE_COLUMNS)} FROM network_metrics ORDER BY id DESC LIMIT ?",
+                               (self._rows.maxlen,), self.path)
+        with self._lock:
+            self._rows.extend(reversed(recent))
+
+        while not self._stop.wait(self.watch_interval):
+            try:
+                current = conn.execute('PRAGMA data_version').fetchone()[0]
+                if current == version:
+                    continue
+                version = current
+                rows = self._read_new_rows()
+                if not rows:
+                    continue
+                self.last_id = rows[-1][0]
+                with self._lock:
+                    self._rows.extend(rows)
+                self.publish('metrics', {
+                    'id': self.last_id,
+                    'ts': max(row[1] for row in rows),
+                    'rows': len(rows),
+                    'ssids': sorted({row[3] for row in rows if row[3] is not None}),
+                    'sent_at': time.time(),
+                }, self.last_id)
+            except Exception as e:
+                print(f"Push watcher error: {e}")
+
+
+def format_event(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, separators=(",", ":"))}')
+    return '\n'.join(lines) + '\n\n'
+
+
+# generator สำหรับ response แบบ text/event-stream ของ client หนึ่งราย
+def event_stream(broker, heartbeat=HEARTBEAT_INTERVAL):
+    broker.ensure_started()
+    q = broker.subscribe()
+    try:
+        yield 'retry: 2000\n\n'
+        while True:
+            try:
+                yield q.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ': keep-alive\n\n'
+    finally:
+        broker.unsubscribe(q)
@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+# cache ผลลัพธ์ query แบบ TTL + LRU ใช้ร่วมกันทุก tab/callback ใน process เดียว
+# ถ้าหลาย callback ขอ key เดียวกันพร้อมกัน จะมีแค่ตัวแรกที่ query จริง ที่เหลือรอผลเดียวกัน
+class QueryCache:
+    def __init__(self, ttl=10.0, maxsize=256, clock=time.monotonic):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}            # key -> threading.Event
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    # คืนค่าจาก cache หรือเรียก loader() ถ้ายังไม่มี/หมดอายุ
+    def get_or_load(self, key, loader):
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                event = self._inflight.get(key)
+                if event is None:
+                    # เราเป็นคนโหลดเอง
+                    self.misses += 1
+                    event = self._inflight[key] = threading.Event()
+                    break
+                self.coalesced += 1
+            # มีคนกำลังโหลด key นี้อยู่ รอแล้ววนกลับไปอ่านจาก cache
+            event.wait()
+
+        try:
+            value = loader()
+            with self._lock:
+                self._entries[key] = (self._clock() + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            # คนที่รอผลจาก loader ตัวอื่น (coalesced) จะถูกนับเป็น hit หลังรอเสร็จด้วย
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,330 @@
+import math
+import re
+import time
+
+import pandas as pd
+
+import storage
+
+# สรุปผลสแกนในตาราง metrics (หนึ่งแถวต่อ BSSID ต่อรอบสแกน) แบบ incremental ตาม id
+# dashboard อ่านเฉพาะตารางสรุป rf_* (ขนาดตามจำนวนช่อง/BSSID ไม่ใช่จำนวนผลสแกน)
+HOUR = 3600
+DAY = 86400
+CHUNK_ROWS = 50000            # แถวของ metrics ต่อหนึ่ง transaction
+MAX_ROWS_PER_RUN = 500000     # ไม่ให้รอบของ collector ยาวเกินไปตอนตามข้อมูลเก่า
+RF_RETENTION_DAYS = 180
+STATE_NAME = 'metrics'
+
+BANDS = ['2.4 GHz', '5 GHz', '6 GHz']
+
+# ช่องที่แนะนำให้เลือกใช้ (ช่องที่ไม่ซ้อนกันของ 2.4 GHz, ช่องที่ไม่ใช่ DFS ของ 5 GHz, PSC ของ 6 GHz)
+# คำนวณคะแนนให้ทุกช่องในรายการนี้เสมอ แม้ไม่มี AP อยู่ จึงเทียบช่องว่างกับช่องที่ใช้อยู่ได้
+CANDIDATE_CHANNELS = {
+    '2.4 GHz': [1, 6, 11],
+    '5 GHz': [36, 40, 44, 48, 149, 153, 157, 161, 165],
+    '6 GHz': [5, 21, 37, 53, 69, 85, 101, 117],
+}
+
+# ช่อง 2.4 GHz ห่างกัน 5 MHz แต่กว้าง 22 MHz: ช่องที่ห่างกันน้อยกว่า 5 ช่องรบกวนกันตามสัดส่วนที่ซ้อนทับ
+CHANNEL_SPACING_MHZ = 5
+CHANNEL_WIDTH_24_MHZ = 22
+
+_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+
+# ย่านความถี่จากข้อความ frequency ('2412 MHz', '5 GHz', '2.4 GHz' ...) หรือจากหมายเลขช่องถ้าอ่านไม่ได้
+def band_of(channel, frequency):
+    match = _NUMBER.search(frequency or '')
+    if match:
+        value = float(match.group())
+        mhz = value if value > 100 else value * 1000
+        if mhz >= 5925:
+            return '6 GHz'
+        if mhz >= 4900:
+            return '5 GHz'
+        if mhz >= 2400:
+            return '2.4 GHz'
+    return '2.4 GHz' if channel <= 14 else '5 GHz'
+
+
+def parse_channel(channel):
+    try:
+        return int(channel)
+    except (TypeError, ValueError):
+        return None
+
+
+# สัดส่วนที่ช่อง a ถูกรบกวนจาก AP บนช่อง b (1 = ช่องเดียวกัน, 0 = ไม่ซ้อนทับ)
+# 5/6 GHz ถือว่ากว้าง 20 MHz (ความกว้างจริงไม่มีในผลสแกน)
+def overlap(band, a, b):
+    if band != '2.4 GHz':
+        return 1.0 if a == b else 0.0
+    return max(0.0, 1.0 - abs(a - b) * CHANNEL_SPACING_MHZ / CHANNEL_WIDTH_24_MHZ)
+
+
+# สรุปหนึ่งรอบสแกน: entries = [(band, channel, signal)] คืนค่า {(band, channel): [bssids, signal_sum, max_signal, interference]}
+# interference ของช่อง c = ผลรวมของ overlap(c, ช่องของ AP) x สัญญาณ (0..1) ของทุก AP ในย่านเดียวกัน
+def scan_channels(entries):
+    weights = {}
+    result = {}
+    for band, channel, signal in entries:
+        key = (band, channel)
+        weights[key] = weights.get(key, 0.0) + signal / 100
+        stats = result.get(key)
+        if stats is None:
+            result[key] = [1, signal, signal, 0.0]
+        else:
+            stats[0] += 1
+            stats[1] += signal
+            stats[2] = max(stats[2], signal)
+    for band in {band for band, _ in weights}:
+        for channel in CANDIDATE_CHANNELS.get(band, ()):
+            result.setdefault((band, channel), [0, 0, None, 0.0])
+    for (band, channel), stats in result.items():
+        stats[3] = sum(weight * overlap(band, channel, other)
+                       for (other_band, other), weight in weights.items() if other_band == band)
+    return result
+
+
+UPSERT_SCANS_SQL = '''
+    INSERT INTO rf_scans (probe, bucket, scans) VALUES (?, ?, ?)
+    ON CONFLICT (probe, bucket) DO UPDATE SET scans = scans + excluded.scans
+'''
+
+UPSERT_CHANNELS_SQL = '''
+    INSERT INTO rf_channels (probe, bucket, band, channel, bssids, signal_sum, max_signal, interference)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (probe, bucket, band, channel) DO UPDATE SET
+        bssids = bssids + excluded.bssids,
+        signal_sum = signal_sum + excluded.signal_sum,
+        max_signal = MAX(COALESCE(max_signal, excluded.max_signal), COALESCE(excluded.max_signal, max_signal)),
+        interference = interference + excluded.interference
+'''
+
+# แถวใหม่มาทีหลังเสมอ (อ่านตาม id) ssid/band/channel จึงเป็นค่าล่าสุดของ BSSID นั้น
+UPSERT_BSSIDS_SQL = '''
+    INSERT INTO rf_bssids (probe, day, bssid, ssid, band, channel, samples, signal_sum, max_signal, first_seen, last_seen)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (probe, day, bssid) DO UPDATE SET
+        ssid = excluded.ssid, band = excluded.band, channel = excluded.channel,
+        samples = samples + excluded.samples,
+        signal_sum = signal_sum + excluded.signal_sum,
+        max_signal = MAX(max_signal, excluded.max_signal),
+        first_seen = MIN(first_seen, excluded.first_seen),
+        last_seen = MAX(last_seen, excluded.last_seen)
+'''
+
+UPSERT_SIGNAL_SQL = '''
+    INSERT INTO rf_bssid_signal (probe, day, bssid, signal, samples) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (probe, day, bssid, signal) DO UPDATE SET samples = samples + excluded.samples
+'''
+
+
+# รวมแถวของ metrics (id, ts, probe, ssid, bssid, signal, frequency, channel) เป็นค่าที่จะ upsert
+def aggregate(rows):
+    scans = {}       # (probe, ts) -> [(band, channel, signal)]
+    bssids = {}      # (probe, day, bssid) -> [ssid, band, channel, samples, signal_sum, max_signal, first_seen, last_seen]
+    signals = {}     # (probe, day, bssid, signal) -> samples
+    for _, ts, probe, ssid, bssid, signal, frequency, channel in rows:
+        channel = parse_channel(channel)
+        if channel is None or not bssid:
+            continue
+        signal = int(signal or 0)
+        band = band_of(channel, frequency)
+        scans.setdefault((probe, ts), []).append((band, channel, signal))
+
+        key = (probe, ts - ts % DAY, bssid)
+        stats = bssids.get(key)
+        if stats is None:
+            bssids[key] = [ssid, band, channel, 1, signal, signal, ts, ts]
+        else:
+            stats[0:3] = ssid, band, channel
+            stats[3] += 1
+            stats[4] += signal
+            stats[5] = max(stats[5], signal)
+            stats[6] = min(stats[6], ts)
+            stats[7] = max(stats[7], ts)
+        signals[key + (signal,)] = signals.get(key + (signal,), 0) + 1
+
+    scan_counts = {}
+    channels = {}
+    for (probe, ts), entries in scans.items():
+        bucket = ts - ts % HOUR
+        scan_counts[(probe, bucket)] = scan_counts.get((probe, bucket), 0) + 1
+        for (band, channel), (count, signal_sum, max_signal, interference) in scan_channels(entries).items():
+            key = (probe, bucket, band, channel)
+            stats = channels.get(key)
+            if stats is None:
+                channels[key] = [count, signal_sum, max_signal, interference]
+            else:
+                stats[0] += count
+                stats[1] += signal_sum
+                stats[2] = max_signal if stats[2] is None else max(stats[2], max_signal or 0)
+                stats[3] += interference
+
+    return (
+        [key + (count,) for key, count in scan_counts.items()],
+        [key + tuple(stats) for key, stats in channels.items()],
+        [key[:3] + tuple(stats) for key, stats in bssids.items()],
+        [key + (count,) for key, count in signals.items()],
+    )
+
+
+# ตัดรอบสแกนสุดท้ายที่อาจถูก LIMIT ตัดครึ่ง (ไว้อ่านใหม่ใน chunk ถัดไป) ไม่งั้นรอบนั้นจะถูกนับเป็นสองรอบ
+def _complete_scans(rows):
+    last = (rows[-1][2], rows[-1][1])
+    for i in range(len(rows) - 1, -1, -1):
+        if (rows[i][2], rows[i][1]) != last:
+            return rows[:i + 1]
+    return rows
+
+
+# สรุปแถวใหม่ของ metrics ตั้งแต่ครั้งก่อน ทีละ chunk (หนึ่ง transaction ต่อ chunk รวมตำแหน่งล่าสุด)
+# คืนค่าจำนวนแถวที่สรุป / max_rows=None = ทำจนหมด
+def update(path=None, chunk_rows=CHUNK_ROWS, max_rows=MAX_ROWS_PER_RUN):
+    processed = 0
+    while max_rows is None or processed < max_rows:
+        state = storage.query_one('SELECT last_id FROM rf_state WHERE name = ?', (STATE_NAME,), path)
+        last_id = state[0] if state else 0
+        rows = storage.query('''
+            SELECT id, ts, COALESCE(probe_id, ''), ssid, bssid, signal_strength, frequency, channel
+            FROM metrics WHERE id > ? ORDER BY id LIMIT ?
+        ''', (last_id, chunk_rows), path)
+        if not rows:
+            break
+        full = len(rows) == chunk_rows
+        if full:
+            rows = _complete_scans(rows)
+        scans, channels, bssids, signals = aggregate(rows)
+        new_last_id = rows[-1][0]
+
+        def _write():
+            with storage.transaction(path) as conn:
+                conn.executemany(UPSERT_SCANS_SQL, scans)
+                conn.executemany(UPSERT_CHANNELS_SQL, channels)
+                conn.executemany(UPSERT_BSSIDS_SQL, bssids)
+                conn.executemany(UPSERT_SIGNAL_SQL, signals)
+                conn.execute('INSERT OR REPLACE INTO rf_state (name, last_id) VALUES (?, ?)', (STATE_NAME, new_last_id))
+        storage.with_retry(_write)
+        processed += len(rows)
+        if not full:
+            break
+    return processed
+
+
+def delete_old(now=None, path=None, retention_days=RF_RETENTION_DAYS):
+    cutoff = int(now if now is not None else time.time()) - retention_days * DAY
+
+    def _delete():
+        with storage.transaction(path) as conn:
+            conn.execute('DELETE FROM rf_scans WHERE bucket < ?', (cutoff,))
+            conn.execute('DELETE FROM rf_channels WHERE bucket < ?', (cutoff,))
+            conn.execute('DELETE FROM rf_bssids WHERE day < ?', (cutoff,))
+            conn.execute('DELETE FROM rf_bssid_signal WHERE day < ?', (cutoff,))
+    storage.with_retry(_delete)
+
+
+def _probe_filter(probes, params, column='probe'):
+    if not probes:
+        return ''
+    params.extend('' if probe in (None, 'local') else probe for probe in probes)
+    return f" AND {column} IN ({', '.join('?' * len(probes))})"
+
+
+# ค่าเฉลี่ยต่อรอบสแกนของแต่ละช่องในแต่ละช่วง width วินาที (ชั่วโมงหรือวัน)
+# คืนค่า DataFrame: bucket, channel, bssids (AP ต่อรอบ), interference (คะแนนต่อรอบ), signal (สัญญาณเฉลี่ยของ AP บนช่อง)
+def channel_heatmap(since, band='2.4 GHz', probes=None, width=HOUR, path=None):
+    params = [band, since]
+    channels = storage.read_sql(f'''
+        SELECT bucket, channel, SUM(bssids) AS bssids, SUM(signal_sum) AS signal_sum, SUM(interference) AS interference
+        FROM rf_channels WHERE band = ? AND bucket >= ?{_probe_filter(probes, params)}
+        GROUP BY bucket, channel
+    ''', tuple(params), path)
+    params = [since]
+    scans = storage.read_sql(f'''
+        SELECT bucket, SUM(scans) AS scans FROM rf_scans WHERE bucket >= ?{_probe_filter(probes, params)}
+        GROUP BY bucket
+    ''', tuple(params), path)
+    if channels.empty:
+        return pd.DataFrame(columns=['bucket', 'channel', 'bssids', 'interference', 'signal'])
+
+    channels['bucket'] -= channels['bucket'] % width
+    scans['bucket'] -= scans['bucket'] % width
+    channels = channels.groupby(['bucket', 'channel'], as_index=False).sum()
+    scans = scans.groupby('bucket', as_index=False).sum()
+    df = channels.merge(scans, on='bucket')
+    df['signal'] = (df['signal_sum'] / df['bssids']).where(df['bssids'] > 0)
+    df['bssids'] = df['bssids'] / df['scans']
+    df['interference'] = df['interference'] / df['scans']
+    return df[['bucket', 'channel', 'bssids', 'interference', 'signal']].sort_values(['bucket', 'channel'])
+
+
+# คะแนนเฉลี่ยของแต่ละช่องตลอดช่วงเวลา เรียงจากรบกวนน้อยไปมาก (candidate = ช่องที่แนะนำให้เลือก)
+def channel_scores(since, band='2.4 GHz', probes=None, path=None):
+    df = channel_heatmap(since, band, probes, width=10 ** 12, path=path)
+    if df.empty:
+        return pd.DataFrame(columns=['channel', 'bssids', 'interference', 'candidate'])
+    df = df[['channel', 'bssids', 'interference']].copy()
+    df['candidate'] = df['channel'].isin(CANDIDATE_CHANNELS.get(band, ()))
+    return df.sort_values(['interference', 'channel']).reset_index(drop=True)
+
+
+def recommend_channel(scores):
+    candidates = scores[scores['candidate']]
+    return int(candidates.iloc[0]['channel']) if not candidates.empty else None
+
+
+# percentile แบบ nearest-rank จาก histogram (bssid, signal, samples) คืนค่า Series ตาม bssid
+def histogram_percentile(hist, q):
+    n = hist.groupby('bssid')['samples'].transform('sum')
+    rank = (q / 100 * n).apply(math.ceil).clip(lower=1)
+    return hist[hist['cumulative'] >= rank].groupby('bssid')['signal'].first()
+
+
+# AP ที่ได้ยินตั้งแต่ since (ความละเอียดเป็นวัน) พร้อม percentile ของสัญญาณ จำนวน AP อื่นบนช่องเดียวกัน
+# และคะแนน interference ของช่องนั้น เรียงจากสัญญาณแรงไปอ่อน
+def neighbours(since, band=None, probes=None, path=None):
+    day = since - since % DAY
+    params = [day]
+    where = _probe_filter(probes, params)
+    if band:
+        where += ' AND band = ?'
+        params.append(band)
+    aps = storage.read_sql(f'''
+        SELECT bssid, ssid, band, channel, samples, signal_sum, max_signal, first_seen, last_seen, probe
+        FROM rf_bssids WHERE day >= ?{where}
+    ''', tuple(params), path)
+    if aps.empty:
+        return pd.DataFrame(columns=['bssid', 'ssid', 'band', 'channel', 'samples', 'p10', 'p50', 'p90', 'max_signal',
+                                     'co_channel', 'interference', 'last_seen', 'probes'])
+
+    # แถวล่าสุดของแต่ละ BSSID ให้ ssid/ช่องปัจจุบัน
+    aps = aps.sort_values('last_seen')
+    summary = aps.groupby('bssid').agg(
+        ssid=('ssid', 'last'), band=('band', 'last'), channel=('channel', 'last'), samples=('samples', 'sum'),
+        max_signal=('max_signal', 'max'), first_seen=('first_seen', 'min'), last_seen=('last_seen', 'max'),
+        probes=('probe', 'nunique'))
+
+    params = [day]
+    hist = storage.read_sql(f'''
+        SELECT bssid, signal, SUM(samples) AS samples FROM rf_bssid_signal
+        WHERE day >= ?{_probe_filter(probes, params)} GROUP BY bssid, signal ORDER BY bssid, signal
+    ''', tuple(params), path)
+    hist = hist[hist['bssid'].isin(summary.index)].copy()
+    hist['cumulative'] = hist.groupby('bssid')['samples'].cumsum()
+    for q in (10, 50, 90):
+        summary[f'p{q}'] = histogram_percentile(hist, q)
+
+    summary = summary.reset_index()
+    summary['co_channel'] = summary.groupby(['band', 'channel'])['bssid'].transform('count') - 1
+    # คะแนนของช่องที่ AP นั้นใช้ จาก AP อื่นทั้งหมด (ไม่นับตัวเอง) ถ่วงด้วยสัญญาณ p50
+    own = summary['p50'].fillna(0) / 100
+    summary['interference'] = 0.0
+    for band_name, group in summary.groupby('band'):
+        weights = own[group.index].groupby(group['channel']).sum()
+        summary.loc[group.index, 'interference'] = [
+            sum(weight * overlap(band_name, channel, other) for other, weight in weights.items())
+            for channel in group['channel']] - own[group.index]
+    return summary.sort_values(['p50', 'max_signal'], ascending=False)[
+        ['bssid', 'ssid', 'band', 'channel', 'samples', 'p10', 'p50', 'p90', 'max_signal',
+         'co_channel', 'interference', 'last_seen', 'probes']].reset_index(drop=True)
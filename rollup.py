@@ -0,0 +1,184 @@
+import time
+
+import storage
+
+# ระดับการ downsample: ชื่อ tier -> (ความกว้าง bucket เป็นวินาที, ระยะเวลาเก็บเป็นวินาที)
+TIERS = {
+    '1m': (60, 7 * 24 * 3600),
+    '5m': (300, 30 * 24 * 3600),
+    '1h': (3600, 365 * 24 * 3600),
+}
+
+# คอลัมน์ใน network_metrics ที่ทำ rollup
+ROLLUP_METRICS = ['download_speed', 'upload_speed', 'latency', 'packet_loss', 'device_count',
+                  'bandwidth', 'rx_rate', 'tx_rate']
+
+# รอให้ข้อมูลที่มาช้าเข้ามาก่อนปิด bucket (วินาที)
+LATE_ARRIVAL = 90
+
+# คำนวณทีละช่วงไม่เกินเท่านี้ (วินาที, ต้องหารด้วยความกว้างของทุก tier ลงตัว)
+# รันครั้งแรกหรือหลังหยุดไปนานจะไม่โหลดประวัติทั้งหมดเข้าหน่วยความจำในครั้งเดียว
+ROLLUP_WINDOW = 24 * 3600
+
+MARK_DIRTY_SQL = '''
+    INSERT INTO rollup_dirty (tier, bucket, marks) VALUES (?, ?, 1)
+    ON CONFLICT (tier, bucket) DO UPDATE SET marks = marks + 1
+'''
+
+UPSERT_ROLLUP_SQL = '''
+    INSERT OR REPLACE INTO network_rollups (tier, metric, probe_id, ssid, bucket, n, min, max, avg, p95)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+# percentile แบบ nearest-rank จากค่าที่เรียงแล้ว
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    rank = max(1, int(-(-q * len(sorted_values) // 100)))  # ceil(q/100 * n)
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+# สรุปค่าของหนึ่ง bucket เป็น (n, min, max, avg, p95)
+def summarize(values):
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    return (len(values), values[0], values[-1], sum(values) / len(values), percentile(values, 95))
+
+
+# คำนวณ rollup ของ bucket ที่ปิดแล้วในช่วง [start, end) แยกตาม (probe, SSID)
+# probe_id '' = แถวของเครื่องนี้เอง กราฟช่วงยาวจึงกรองเฉพาะบาง probe ได้เหมือนข้อมูลดิบ
+def compute_rollups(tier, width, start, end, path=None):
+    columns = ', '.join(ROLLUP_METRICS)
+    rows = storage.query(f'''
+        SELECT COALESCE(probe_id, ''), ssid, ts, {columns} FROM network_metrics
+        WHERE ts >= ? AND ts < ? AND ssid IS NOT NULL
+    ''', (start, end), path)
+
+    groups = {}
+    for row in rows:
+        key = (row[0], row[1], row[2] - row[2] % width)
+        groups.setdefault(key, []).append(row[3:])
+
+    results = []
+    for (probe_id, ssid, bucket), samples in groups.items():
+        for i, metric in enumerate(ROLLUP_METRICS):
+            summary = summarize(sample[i] for sample in samples)
+            if summary is not None:
+                results.append((tier, metric, probe_id, ssid, bucket) + summary)
+    return results
+
+
+# อัปเดต rollup ทุก tier แบบ incremental (เฉพาะ bucket ที่ปิดแล้วตั้งแต่ครั้งก่อน)
+# ทำทีละ ROLLUP_WINDOW และบันทึก last_bucket หลังแต่ละช่วง ถ้าหยุดกลางทางครั้งต่อไปทำต่อจากเดิม
+# จากนั้นคำนวณใหม่เฉพาะ bucket ที่ปิดไปแล้วแต่มีข้อมูลมาช้า (mark_dirty)
+def run_rollups(now=None, path=None):
+    now = int(now if now is not None else time.time())
+    written = {}
+    for tier, (width, retention) in TIERS.items():
+        end = (now - LATE_ARRIVAL) // width * width
+        state = storage.query_one('SELECT last_bucket FROM rollup_state WHERE tier = ?', (tier,), path)
+        if state is not None:
+            start = state[0]
+        else:
+            first = storage.query_one('SELECT MIN(ts) FROM network_metrics', (), path)[0]
+            if first is None:
+                continue
+            start = first // width * width
+        # bucket ที่เก่ากว่าระยะเวลาเก็บจะถูกลบทิ้งอยู่แล้ว ไม่ต้องคำนวณ
+        start = max(start, (now - retention) // width * width)
+
+        while start < end:
+            window_end = min(start + ROLLUP_WINDOW, end)
+            written[tier] = written.get(tier, 0) + _rollup_range(tier, width, start, window_end, path, True)
+            start = window_end
+
+        dirty = recompute_dirty(tier, width, path)
+        if dirty:
+            written[tier] = written.get(tier, 0) + dirty
+    return written
+
+
+# คำนวณและเขียน rollup ของช่วง [start, end) แล้วล้าง mark ของ bucket ในช่วงนั้น
+# อ่าน mark ก่อนคำนวณ และลบเฉพาะ mark ที่ marks ไม่เปลี่ยน: แถวที่เข้ามาระหว่างคำนวณจึงถูกคำนวณอีกครั้งในรอบหน้า
+def _rollup_range(tier, width, start, end, path=None, advance=False):
+    marks = storage.query('SELECT tier, bucket, marks FROM rollup_dirty WHERE tier = ? AND bucket >= ? AND bucket < ?',
+                          (tier, start, end), path)
+    results = compute_rollups(tier, width, start, end, path)
+
+    def _write():
+        with storage.transaction(path) as conn:
+            conn.executemany(UPSERT_ROLLUP_SQL, results)
+            conn.executemany('DELETE FROM rollup_dirty WHERE tier = ? AND bucket = ? AND marks = ?', marks)
+            if advance:
+                conn.execute('INSERT OR REPLACE INTO rollup_state (tier, last_bucket) VALUES (?, ?)', (tier, end))
+    storage.with_retry(_write)
+    return len(results)
+
+
+# บันทึก bucket ที่มีแถวใหม่ที่มาช้า (เรียกใน transaction เดียวกับที่ insert แถว)
+# oldest: แถวที่เก่ากว่านี้ไม่ mark เพราะข้อมูลดิบส่วนอื่นของ bucket อาจถูกย้ายไป archive แล้ว
+def mark_dirty(conn, timestamps, oldest):
+    timestamps = [ts for ts in timestamps if isinstance(ts, (int, float)) and ts >= oldest]
+    rows = [(tier, bucket) for tier, (width, retention) in TIERS.items()
+            for bucket in {int(ts) // width * width for ts in timestamps}]
+    conn.executemany(MARK_DIRTY_SQL, rows)
+    return len(rows)
+
+
+# คำนวณ bucket ที่ปิดแล้วและถูก mark ไว้ใหม่ทั้ง bucket (bucket ที่ติดกันรวมเป็นช่วงเดียว ไม่เกิน ROLLUP_WINDOW)
+# mark ของ bucket ที่ยังไม่ปิดรอให้ run_rollups คำนวณตามรอบปกติ
+def recompute_dirty(tier, width, path=None):
+    state = storage.query_one('SELECT last_bucket FROM rollup_state WHERE tier = ?', (tier,), path)
+    if state is None:
+        return 0
+    buckets = [row[0] for row in storage.query('SELECT bucket FROM rollup_dirty WHERE tier = ? AND bucket < ? ORDER BY bucket',
+                                               (tier, state[0]), path)]
+    ranges = []
+    for bucket in buckets:
+        if ranges and ranges[-1][1] == bucket and bucket + width - ranges[-1][0] <= ROLLUP_WINDOW:
+            ranges[-1][1] = bucket + width
+        else:
+            ranges.append([bucket, bucket + width])
+    return sum(_rollup_range(tier, width, start, end, path) for start, end in ranges)
+
+
+# ลบ rollup ที่เก่ากว่าระยะเวลาเก็บของแต่ละ tier
+def delete_old_rollups(now=None, path=None):
+    now = int(now if now is not None else time.time())
+
+    def _delete():
+        with storage.transaction(path) as conn:
+            for tier, (width, retention) in TIERS.items():
+                conn.execute('DELETE FROM network_rollups WHERE tier = ? AND bucket < ?', (tier, now - retention))
+                conn.execute('DELETE FROM rollup_dirty WHERE tier = ? AND bucket < ?', (tier, now - retention))
+    storage.with_retry(_delete)
+
+
+# เลือก tier ที่ละเอียดที่สุดซึ่งยังมีข้อมูลครอบคลุมช่วงเวลาและจำนวนจุดไม่เกิน max_points
+# คืนค่า None ถ้าควรใช้ข้อมูลดิบ
+def pick_tier(range_seconds, raw_retention, raw_interval, max_points):
+    if range_seconds <= raw_retention and range_seconds / raw_interval <= max_points:
+        return None
+    for tier, (width, retention) in TIERS.items():
+        if range_seconds <= retention and range_seconds / width <= max_points:
+            return tier
+    return list(TIERS)[-1]
+
+
+# อ่าน rollup ของ metric หนึ่งตัวสำหรับกราฟ (probes = กรองเฉพาะ probe เหล่านี้ ค่าว่าง = ทุก probe)
+def read_rollups(tier, metric, since, ssids=None, path=None, probes=None):
+    query = '''
+        SELECT bucket AS ts, probe_id, ssid, n, min, max, avg, p95 FROM network_rollups
+        WHERE tier = ? AND metric = ? AND bucket >= ?
+    '''
+    params = [tier, metric, since]
+    if ssids:
+        query += f" AND ssid IN ({', '.join('?' * len(ssids))})"
+        params.extend(ssids)
+    if probes:
+        query += f" AND probe_id IN ({', '.join('?' * len(probes))})"
+        params.extend(probes)
+    query += ' ORDER BY bucket'
+    return storage.read_sql(query, tuple(params), path)
@@ -1,20 +1,34 @@
+import os
+import sys
 import threading
 import subprocess
 
+# โฟลเดอร์ของโปรเจกต์ (ไม่ผูกกับ path ของเครื่องใดเครื่องหนึ่ง)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# รันสคริปต์ในโปรเจกต์ด้วย python ตัวเดียวกับที่รันไฟล์นี้
+def run_script(name):
+    subprocess.run([sys.executable, os.path.join(BASE_DIR, name)], cwd=BASE_DIR)
+
 # ฟังก์ชันเพื่อรัน metrics_collector.py
 def run_metrics_collector():
-    subprocess.run(["python", "d:/Project192/wifi-analyzer/metrics_collector.py"])
+    run_script("metrics_collector.py")
 
 # ฟังก์ชันเพื่อรัน app.py
 def run_dash_app():
-    subprocess.run(["python", "d:/Project192/wifi-analyzer/app.py"])
+    run_script("app.py")
 
+# ฟังก์ชันเพื่อรัน aggregator.py (เครื่องกลางที่รับข้อมูลจากหลาย probe)
+def run_aggregator():
+    run_script("aggregator.py")
 
- 
 
 # เริ่มทั้งสองฟังก์ชันใน thread แยก
+# python run_app.py            -> collector + dashboard ในเครื่องเดียว
+# python run_app.py central    -> aggregator + dashboard ของทั้ง fleet
 if __name__ == "__main__":
-    collector_thread = threading.Thread(target=run_metrics_collector)
+    first = run_aggregator if len(sys.argv) > 1 and sys.argv[1] == "central" else run_metrics_collector
+    collector_thread = threading.Thread(target=first)
     dash_thread = threading.Thread(target=run_dash_app)
 
     collector_thread.start()
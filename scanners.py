@@ -0,0 +1,300 @@
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+from collections import namedtuple
+
+# ผลสแกนหนึ่ง BSSID (signal เป็น % เหมือน netsh, frequency เป็นข้อความตามที่ backend รายงาน)
+ScanRecord = namedtuple('ScanRecord', ['ssid', 'bssid', 'signal', 'frequency', 'channel'])
+
+SCAN_TIMEOUT = 15  # วินาที
+
+
+# แปลง dBm เป็น % แบบเดียวกับที่ Windows ใช้ (-100 dBm = 0%, -50 dBm = 100%)
+def dbm_to_percent(dbm):
+    return max(0, min(100, int(round(2 * (dbm + 100)))))
+
+
+# แปลงความถี่ (MHz) เป็นหมายเลขช่องสัญญาณ
+def freq_to_channel(freq):
+    if freq == 2484:
+        return 14
+    if 2412 <= freq <= 2472:
+        return (freq - 2407) // 5
+    if 5000 <= freq <= 5900:
+        return (freq - 5000) // 5
+    if 5955 <= freq <= 7115:
+        return (freq - 5950) // 5
+    return None
+
+
+def _run(args):
+    return subprocess.run(args, capture_output=True, text=True, timeout=SCAN_TIMEOUT).stdout
+
+
+# ---- netsh (Windows) ----
+
+_NETSH_LINE = re.compile(
+    r'^[ \t]*(?P<key>SSID|BSSID|AP BSSID|Signal|Radio type|Channel)(?: \d+)?[ \t]*:[ \t]?(?P<value>.*?)[ \t\r]*$',
+    re.M)
+
+
+# parse ผลจาก `netsh wlan show networks mode=bssid` รอบเดียว ได้หนึ่ง record ต่อ BSSID
+def parse_netsh_networks(text):
+    records = []
+    ssid = None
+    current = None
+    for match in _NETSH_LINE.finditer(text):
+        key, value = match.group('key', 'value')
+        if key == 'SSID':
+            ssid = value
+        elif key == 'BSSID':
+            if current is not None:
+                records.append(ScanRecord(**current))
+            current = {'ssid': ssid, 'bssid': value, 'signal': 0, 'frequency': 'unknown', 'channel': 'unknown'}
+        elif current is not None:
+            if key == 'Signal':
+                current['signal'] = int(value.rstrip('%') or 0)
+            elif key == 'Radio type':
+                current['frequency'] = value
+            elif key == 'Channel':
+                current['channel'] = value
+    if current is not None:
+        records.append(ScanRecord(**current))
+    return records
+
+
+# parse ผลจาก `netsh wlan show interfaces` (เครือข่ายที่เชื่อมต่ออยู่)
+def parse_netsh_interfaces(text):
+    info = {}
+    for match in _NETSH_LINE.finditer(text):
+        key, value = match.group('key', 'value')
+        if key in info:
+            continue  # ใช้เฉพาะ interface แรก
+        info[key] = value
+    if 'SSID' not in info:
+        return None
+    return ScanRecord(
+        info['SSID'],
+        info.get('BSSID') or info.get('AP BSSID', 'unknown'),
+        int(info.get('Signal', '0').rstrip('%') or 0),
+        info.get('Radio type', 'unknown'),
+        info.get('Channel', 'unknown'),
+    )
+
+
+# ---- iw / nl80211 (Linux) ----
+
+_IW_LINE = re.compile(
+    r'^(?:BSS (?P<bss>[0-9a-fA-F:]{17})\(.*'
+    r'|Connected to (?P<link>[0-9a-fA-F:]{17}) .*'
+    r'|[ \t]+freq: (?P<freq>[\d.]+)'
+    r'|[ \t]+signal: (?P<signal>-?[\d.]+) dBm'
+    r'|[ \t]+SSID: ?(?P<ssid>.*?)'
+    r'|[ \t]+DS Parameter set: channel (?P<ds>\d+)'
+    r'|[ \t]+\* primary channel: (?P<primary>\d+)'
+    r')[ \t\r]*$',
+    re.M)
+
+
+def _iw_record(current):
+    freq = current.get('freq')
+    channel = current.get('channel') or (freq_to_channel(freq) if freq else None)
+    return ScanRecord(
+        current.get('ssid', ''),
+        current['bssid'],
+        dbm_to_percent(current['signal']) if 'signal' in current else 0,
+        f"{freq} MHz" if freq else 'unknown',
+        str(channel) if channel else 'unknown',
+    )
+
+
+# parse ผลจาก `iw dev <iface> scan` หรือ `iw dev <iface> link` รอบเดียว
+def parse_iw(text):
+    records = []
+    current = None
+    for match in _IW_LINE.finditer(text):
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind in ('bss', 'link'):
+            if current is not None:
+                records.append(_iw_record(current))
+            current = {'bssid': value.lower()}
+        elif current is None:
+            continue
+        elif kind == 'freq':
+            current['freq'] = int(float(value))
+        elif kind == 'signal':
+            current['signal'] = float(value)
+        elif kind == 'ssid':
+            current['ssid'] = value
+        else:
+            current.setdefault('channel', int(value))
+    if current is not None:
+        records.append(_iw_record(current))
+    return records
+
+
+def parse_iw_link(text):
+    records = parse_iw(text)
+    return records[0] if records else None
+
+
+# ---- nmcli (NetworkManager) ----
+
+# ฟิลด์คั่นด้วย ':' ที่ไม่ได้ escape (BSSID ใน nmcli -t จะเป็น A4\:2B\:...)
+_NMCLI_FIELD = re.compile(r'(?<!\\):')
+NMCLI_FIELDS = 'IN-USE,SSID,BSSID,SIGNAL,FREQ,CHAN'
+
+
+# parse ผลจาก `nmcli -t -f IN-USE,SSID,BSSID,SIGNAL,FREQ,CHAN dev wifi list`
+# คืนค่า (records ทั้งหมด, record ที่เชื่อมต่ออยู่)
+def parse_nmcli(text):
+    records = []
+    connected = None
+    for line in text.splitlines():
+        fields = _NMCLI_FIELD.split(line)
+        if len(fields) != 6:
+            continue
+        in_use, ssid, bssid, signal, freq, channel = (field.replace('\\:', ':') for field in fields)
+        record = ScanRecord(ssid, bssid.lower(), int(signal or 0), freq or 'unknown', channel or 'unknown')
+        records.append(record)
+        if in_use.strip() == '*':
+            connected = record
+    return records, connected
+
+
+# ---- backends ----
+
+class NetshScanner:
+    name = 'netsh'
+
+    def scan(self):
+        return parse_netsh_networks(_run(['netsh', 'wlan', 'show', 'networks', 'mode=bssid']))
+
+    def current(self):
+        return parse_netsh_interfaces(_run(['netsh', 'wlan', 'show', 'interfaces']))
+
+
+class IwScanner:
+    name = 'iw'
+
+    def __init__(self, interface=None):
+        self._interface = interface or os.environ.get('WIFI_IFACE')
+
+    # หา wireless interface ตอนใช้งานครั้งแรก (ไม่ต้องเรียก iw ตอน import)
+    @property
+    def interface(self):
+        if self._interface is None:
+            match = re.search(r'^\s*Interface (\S+)', _run(['iw', 'dev']), re.M)
+            self._interface = match.group(1) if match else 'wlan0'
+        return self._interface
+
+    def scan(self):
+        return parse_iw(_run(['iw', 'dev', self.interface, 'scan']))
+
+    def current(self):
+        return parse_iw_link(_run(['iw', 'dev', self.interface, 'link']))
+
+
+class NmcliScanner:
+    name = 'nmcli'
+
+    # คำสั่งเดียวได้ทั้งผลสแกนและเครือข่ายที่เชื่อมต่ออยู่ เก็บผลไว้ใช้กับ current() ในรอบเดียวกัน
+    def __init__(self, max_age=5.0):
+        self.max_age = max_age
+        self._last = None
+        self._last_at = 0.0
+
+    def _list(self, rescan='auto'):
+        if self._last is None or time.monotonic() - self._last_at > self.max_age:
+            text = _run(['nmcli', '-t', '-f', NMCLI_FIELDS, 'dev', 'wifi', 'list', '--rescan', rescan])
+            self._last = parse_nmcli(text)
+            self._last_at = time.monotonic()
+        return self._last
+
+    def scan(self):
+        return self._list()[0]
+
+    def current(self):
+        return self._list()[1]
+
+
+# เล่นผลสแกนที่บันทึกไว้ซ้ำ (ใช้ทดสอบ/benchmark แบบ offline) วนไฟล์ scan_files ทีละรอบ
+class ReplayScanner:
+    name = 'replay'
+
+    PARSERS = {
+        'netsh': (parse_netsh_networks, parse_netsh_interfaces),
+        'iw': (parse_iw, parse_iw_link),
+        'nmcli': (lambda text: parse_nmcli(text)[0], lambda text: parse_nmcli(text)[1]),
+    }
+
+    def __init__(self, fmt, scan_files, current_file=None):
+        self.parse_scan, self.parse_current = self.PARSERS[fmt]
+        self.scan_texts = [self._read(path) for path in scan_files]
+        self.current_text = self._read(current_file) if current_file else None
+        self._index = 0
+
+    @staticmethod
+    def _read(path):
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+
+    def scan(self):
+        text = self.scan_texts[self._index % len(self.scan_texts)]
+        self._index += 1
+        return self.parse_scan(text)
+
+    def current(self):
+        if self.current_text is None:
+            return None
+        return self.parse_current(self.current_text)
+
+
+BACKENDS = {'netsh': NetshScanner, 'iw': IwScanner, 'nmcli': NmcliScanner}
+
+
+# เลือก backend: ตามชื่อ/ตัวแปร WIFI_SCANNER หรือเดาจากระบบปฏิบัติการ
+# WIFI_SCANNER=replay ใช้ไฟล์จาก WIFI_REPLAY_FORMAT และ WIFI_REPLAY_FILES (คั่นด้วย os.pathsep)
+def get_scanner(name=None):
+    name = name or os.environ.get('WIFI_SCANNER')
+    if name == 'replay':
+        files = os.environ['WIFI_REPLAY_FILES'].split(os.pathsep)
+        fmt = os.environ.get('WIFI_REPLAY_FORMAT', 'netsh')
+        return ReplayScanner(fmt, files, os.environ.get('WIFI_REPLAY_CURRENT'))
+    if name:
+        return BACKENDS[name]()
+    if sys.platform.startswith('win'):
+        return NetshScanner()
+    if shutil.which('nmcli'):
+        return NmcliScanner()
+    return IwScanner()
+
+
+# จัดกลุ่ม record ตามช่องสัญญาณ (รูปแบบเดียวกับ get_wifi_networks_by_channel เดิม)
+def group_by_channel(records):
+    networks = {}
+    for record in records:
+        networks.setdefault(record.channel, []).append({
+            'SSID': record.ssid,
+            'BSSID': record.bssid,
+            'Signal': record.signal,
+            'Frequency': record.frequency,
+            'Channel': record.channel,
+        })
+    return networks
+
+
+# วัดความเร็ว parser กับไฟล์ที่บันทึกไว้: python scanners.py <netsh|iw|nmcli> <file> [repeat]
+if __name__ == '__main__':
+    fmt, path = sys.argv[1], sys.argv[2]
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+    scanner = ReplayScanner(fmt, [path])
+    start = time.perf_counter()
+    count = sum(len(scanner.scan()) for _ in range(repeat))
+    elapsed = time.perf_counter() - start
+    print(f"{fmt}: {repeat} scans, {count} records in {elapsed:.3f}s "
+          f"({count / elapsed:,.0f} records/s, {elapsed / repeat * 1e6:.1f} us/scan)")
@@ -0,0 +1,179 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+
+JITTER = 0.1            # สัดส่วนการสุ่มเลื่อนเวลา (+-10% ของ interval) กันงานหลายตัวชนกัน
+BACKOFF_MAX = 3600      # วินาที ระยะรอสูงสุดหลังล้มเหลวติดกัน
+
+
+# งานหนึ่งตัวในตาราง: รันทุก interval วินาทีใน lane ที่กำหนด
+# min_gap = ระยะห่างขั้นต่ำระหว่างรอบ (ใช้กับ trigger กันยิงงานหนักถี่เกินไป)
+class Job:
+    def __init__(self, name, fn, interval, lane='cheap', jitter=JITTER, min_gap=0, backoff_max=BACKOFF_MAX,
+                 run_at_start=True):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.lane = lane
+        self.jitter = jitter
+        self.min_gap = min_gap
+        self.backoff_max = backoff_max
+        self.run_at_start = run_at_start
+        self.next_run = None
+        self.last_run = None       # เวลาเริ่มรอบล่าสุด (monotonic)
+        self.last_duration = None
+        self.last_error = None
+        self.failures = 0          # จำนวนครั้งที่ล้มเหลวติดกัน
+        self.runs = 0
+        self.triggered_runs = 0
+        self.pending_trigger = None
+
+    def delay_after(self, ok, rng):
+        if not ok:
+            # exponential backoff: interval * 2^(n-1) ไม่เกิน backoff_max (อย่างน้อย interval)
+            return min(max(self.backoff_max, self.interval), self.interval * 2 ** (self.failures - 1))
+        return self.interval * (1 + rng.uniform(-self.jitter, self.jitter))
+
+
+# lane หนึ่งมี worker ของตัวเอง งานหนักใน lane 'expensive' จึงไม่บล็อก probe ราคาถูกใน lane 'cheap'
+class Lane:
+    def __init__(self, name, workers=1):
+        self.name = name
+        self.workers = workers
+        self.heap = []             # (next_run, ลำดับ, job)
+        self.running = set()
+
+
+# ตัวจัดตารางหลาย lane: แต่ละ lane มี thread ของตัวเอง, งานมี jitter, backoff เมื่อ error และสั่งรันทันทีได้ด้วย trigger()
+class LaneScheduler:
+    def __init__(self, lanes=None, clock=time.monotonic, seed=None):
+        self.lanes = {name: Lane(name, workers) for name, workers in (lanes or {'cheap': 2, 'expensive': 1}).items()}
+        self.jobs = {}
+        self._clock = clock
+        self._rng = random.Random(seed)
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._stop = False
+        self._threads = []
+
+    def add(self, job):
+        with self._cond:
+            lane = self.lanes[job.lane]
+            self.jobs[job.name] = job
+            now = self._clock()
+            job.next_run = now if job.run_at_start else now + job.delay_after(True, self._rng)
+            heapq.heappush(lane.heap, (job.next_run, next(self._counter), job))
+            self._cond.notify_all()
+        return job
+
+    def every(self, interval, fn, name=None, **kwargs):
+        return self.add(Job(name or fn.__name__, fn, interval, **kwargs))
+
+    # ขอให้รันงานโดยเร็ว (เช่นเมื่อ latency/loss ผิดปกติ) แต่ไม่เร็วกว่า min_gap จากรอบก่อน
+    # คืนค่า True ถ้าเลื่อนรอบถัดไปให้เร็วขึ้น
+    def trigger(self, name, reason=None):
+        with self._cond:
+            job = self.jobs[name]
+            lane = self.lanes[job.lane]
+            if job.name in lane.running:
+                # กำลังรันอยู่ ให้รันซ้ำหลังจบรอบนี้ (ตาม min_gap)
+                job.pending_trigger = reason or 'trigger'
+                return True
+            earliest = self._clock()
+            if job.last_run is not None:
+                earliest = max(earliest, job.last_run + job.min_gap)
+            if job.next_run is not None and job.next_run <= earliest:
+                return False
+            job.next_run = earliest
+            job.pending_trigger = reason or 'trigger'
+            heapq.heappush(lane.heap, (earliest, next(self._counter), job))
+            self._cond.notify_all()
+            return True
+
+    # หยิบงานที่ถึงเวลาจาก lane (ข้าม entry เก่าใน heap ที่ถูกเลื่อนไปแล้ว)
+    def _next_due(self, lane):
+        while lane.heap:
+            when, _, job = lane.heap[0]
+            if when != job.next_run:
+                heapq.heappop(lane.heap)
+                continue
+            if when > self._clock():
+                return None, when - self._clock()
+            heapq.heappop(lane.heap)
+            return job, 0
+        return None, None
+
+    def _worker(self, lane):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stop:
+                        return
+                    job, wait = self._next_due(lane)
+                    if job is not None:
+                        break
+                    self._cond.wait(wait)
+                lane.running.add(job.name)
+                job.next_run = None
+                job.last_run = self._clock()
+                reason, job.pending_trigger = job.pending_trigger, None
+
+            ok = self._run_job(job, reason)
+
+            with self._cond:
+                lane.running.discard(job.name)
+                if job.pending_trigger is not None:
+                    job.next_run = max(self._clock(), job.last_run + job.min_gap)
+                else:
+                    job.next_run = self._clock() + job.delay_after(ok, self._rng)
+                heapq.heappush(lane.heap, (job.next_run, next(self._counter), job))
+                self._cond.notify_all()
+
+    def _run_job(self, job, reason):
+        start = self._clock()
+        try:
+            job.fn()
+            ok = True
+            job.failures = 0
+            job.last_error = None
+        except Exception as e:
+            ok = False
+            job.failures += 1
+            job.last_error = e
+            print(f"Job {job.name} failed ({job.failures} in a row): {e}")
+        job.last_duration = self._clock() - start
+        job.runs += 1
+        if reason is not None:
+            job.triggered_runs += 1
+            print(f"Job {job.name} ran on trigger: {reason}")
+        return ok
+
+    def start(self):
+        for lane in self.lanes.values():
+            for i in range(lane.workers):
+                thread = threading.Thread(target=self._worker, args=(lane,), name=f'lane-{lane.name}-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    # สถานะของทุกงาน (ใช้ debug / แสดงผล)
+    def status(self):
+        now = self._clock()
+        with self._cond:
+            return {name: {
+                'lane': job.lane,
+                'runs': job.runs,
+                'triggered_runs': job.triggered_runs,
+                'failures': job.failures,
+                'last_duration': job.last_duration,
+                'next_in': None if job.next_run is None else max(0.0, job.next_run - now),
+                'last_error': None if job.last_error is None else str(job.last_error),
+            } for name, job in self.jobs.items()}
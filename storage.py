@@ -0,0 +1,199 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import tracing
+
+# ชื่อไฟล์ฐานข้อมูล (ใช้ร่วมกันระหว่าง collector และ dashboard)
+DB_NAME = os.environ.get('WIFI_DB_PATH', 'network_metrics.db')
+
+# ค่าปรับแต่ง SQLite
+BUSY_TIMEOUT_MS = 5000        # รอ lock สูงสุดกี่มิลลิวินาที ก่อนโยน "database is locked"
+CACHE_SIZE_KB = 16000         # page cache ต่อ connection (ประมาณ 16 MB)
+MMAP_SIZE = 64 * 1024 * 1024  # อ่านไฟล์ผ่าน memory map
+STATEMENT_CACHE_SIZE = 128    # จำนวน prepared statement ที่ cache ไว้ต่อ connection
+
+# นโยบาย retry เมื่อเจอ lock/busy
+MAX_RETRIES = 5
+RETRY_BACKOFF = 0.05  # วินาที (เพิ่มเป็นสองเท่าทุกครั้ง)
+
+# connection แบบ long-lived แยกตาม thread
+_local = threading.local()
+
+
+# ฟังก์ชันเปิด connection ใหม่พร้อมตั้งค่า PRAGMA
+def _open_connection(path):
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,  # autocommit, เปิด transaction เองผ่าน transaction()
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    # ไฟล์ใหม่คืนพื้นที่ที่ลบไปทีละส่วนได้ (archive.incremental_vacuum) ต้องตั้งก่อนเปลี่ยนเป็น WAL
+    # ไฟล์เดิมไม่มีผลจนกว่าจะ VACUUM หนึ่งครั้ง (python archive.py --enable-incremental-vacuum)
+    conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+    # WAL: ผู้อ่าน (dashboard) ไม่ถูกบล็อกโดยผู้เขียน (collector) และกลับกัน
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA cache_size=-{CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+    return conn
+
+
+# ดึง connection ของ thread ปัจจุบัน (เปิดครั้งแรกแล้วใช้ซ้ำ)
+def get_connection(path=None):
+    path = path or DB_NAME
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(path)
+    if conn is None:
+        conn = connections[path] = _open_connection(path)
+    return conn
+
+
+# ปิด connection ของ thread ปัจจุบัน (ไม่ระบุ path = ปิดทั้งหมด)
+def close_connection(path=None):
+    connections = getattr(_local, 'connections', {})
+    paths = [path] if path else list(connections)
+    for p in paths:
+        conn = connections.pop(p, None)
+        if conn is not None:
+            conn.close()
+
+
+def _is_busy_error(e):
+    message = str(e).lower()
+    return 'locked' in message or 'busy' in message
+
+
+# เรียกฟังก์ชันซ้ำเมื่อฐานข้อมูลถูก lock (exponential backoff)
+def with_retry(fn, *args, **kwargs):
+    delay = RETRY_BACKOFF
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return fn(*args, **kwargs)
+        except sqlite3.OperationalError as e:
+            if not _is_busy_error(e) or attempt == MAX_RETRIES:
+                raise
+            time.sleep(delay)
+            delay *= 2
+
+
+# เปิด write transaction (BEGIN IMMEDIATE จอง write lock ตั้งแต่ต้น ไม่ต้อง upgrade lock กลางทาง)
+@contextmanager
+def transaction(path=None):
+    conn = get_connection(path)
+    with tracing.span('db.transaction'):
+        with_retry(conn.execute, 'BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            # commit ล้มเหลว (เช่น deferred foreign key) transaction ยังค้างอยู่ ต้อง rollback ก่อนคืน connection
+            try:
+                with_retry(conn.commit)
+            except BaseException:
+                conn.rollback()
+                raise
+
+
+# เขียนข้อมูลหนึ่งคำสั่งใน transaction ของตัวเอง
+def execute_write(sql, params=(), path=None):
+    def _write():
+        with transaction(path) as conn:
+            return conn.execute(sql, params).rowcount
+    return with_retry(_write)
+
+
+# เขียนหลายแถวใน transaction เดียว
+def executemany_write(sql, rows, path=None):
+    def _write():
+        with transaction(path) as conn:
+            return conn.executemany(sql, rows).rowcount
+    return with_retry(_write)
+
+
+# อ่านข้อมูล (ไม่ต้องเปิด transaction เพราะ WAL ให้ snapshot อยู่แล้ว)
+def query(sql, params=(), path=None):
+    conn = get_connection(path)
+    with tracing.span('db.query', sql=sql):
+        return with_retry(lambda: conn.execute(sql, params).fetchall())
+
+
+def query_one(sql, params=(), path=None):
+    conn = get_connection(path)
+    with tracing.span('db.query', sql=sql):
+        return with_retry(lambda: conn.execute(sql, params).fetchone())
+
+
+# อ่านข้อมูลเป็น DataFrame สำหรับ dashboard
+def read_sql(sql, params=(), path=None):
+    import pandas as pd
+
+    conn = get_connection(path)
+    with tracing.span('db.read_sql', sql=sql):
+        return with_retry(pd.read_sql, sql, conn, params=params)
+
+
+# path ที่ตรวจ schema แล้วใน process นี้
+_schema_ready = set()
+
+
+# ฟังก์ชันสร้างฐานข้อมูล
+def setup_database(path=None):
+    with transaction(path) as conn:
+        # สร้างตารางในฐานข้อมูลหากยังไม่มี
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS metrics (
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                ssid TEXT,
+                bssid TEXT,
+                signal_strength INTEGER,
+                frequency TEXT,
+                channel TEXT
+            )
+        ''')
+
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS network_metrics (
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                download_speed REAL,
+                upload_speed REAL,
+                latency REAL,
+                packet_loss REAL,
+                bytes_sent INTEGER,
+                bytes_recv INTEGER,
+                device_count INTEGER,
+                ssid TEXT
+            )
+        ''')
+
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS alerts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT,
+                alert_message TEXT
+            )
+        ''')
+
+    # ปรับ schema เดิมให้เป็นเวอร์ชันล่าสุด (index, epoch timestamp ฯลฯ)
+    import migrations
+    migrations.migrate(path)
+
+
+# ตรวจ schema ครั้งเดียวต่อ process: ถ้าเป็นเวอร์ชันล่าสุดแล้วอ่านแค่ PRAGMA user_version (ไม่เปิด write transaction)
+def ensure_schema(path=None):
+    path = path or DB_NAME
+    if path in _schema_ready:
+        return
+    import migrations
+    if get_connection(path).execute('PRAGMA user_version').fetchone()[0] < migrations.SCHEMA_VERSION:
+        setup_database(path)
+    _schema_ready.add(path)
@@ -0,0 +1,193 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import storage
+import rollup
+import rf_analytics
+from alert_engine import AlertEngine
+
+DISPLAY_TZ = 'Asia/Bangkok'     # collector บันทึก timestamp (TEXT) เป็นเวลาท้องถิ่น
+THROUGHPUT_EVERY = 30           # network_metrics หนึ่งแถวทุกกี่แถวมีค่า download/upload (lane งานหนักวัดทุก 30 นาที)
+INCIDENTS_PER_DAY = 1.5         # ช่วงที่เครือข่ายแย่ (latency/loss สูง) ต่อ site ต่อวัน
+WRITE_CHUNK = 100_000           # แถวต่อ transaction
+
+SSID_NAMES = ['HomeNet', 'Office-5G', 'Office-2G', 'Guest', 'IoT', 'Lab', 'Warehouse', 'Cafe-Free', 'Mesh', 'Backhaul']
+CHANNELS = [(1, '2.4 GHz'), (6, '2.4 GHz'), (11, '2.4 GHz'), (36, '5 GHz'), (40, '5 GHz'), (44, '5 GHz'),
+            (48, '5 GHz'), (149, '5 GHz'), (153, '5 GHz'), (157, '5 GHz')]
+
+INSERT_NETWORK_SQL = '''
+    INSERT INTO network_metrics (timestamp, ts, download_speed, upload_speed, latency, packet_loss, bytes_sent,
+                                 bytes_recv, device_count, ssid, bandwidth, rx_rate, tx_rate, probe_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+INSERT_SCAN_SQL = '''
+    INSERT INTO metrics (timestamp, ts, ssid, bssid, signal_strength, frequency, channel, probe_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def local_timestamps(ts):
+    return pd.to_datetime(ts, unit='s', utc=True).tz_convert(DISPLAY_TZ).strftime('%Y-%m-%d %H:%M:%S').tolist()
+
+
+# โหลดรายวัน 0..1 (ต่ำสุดตีห้า สูงสุดห้าโมงเย็น) ตามเวลาท้องถิ่น
+def daily_load(ts):
+    hours = ((ts + 7 * 3600) % 86400) / 3600
+    return 0.5 - 0.5 * np.cos((hours - 5) / 24 * 2 * np.pi)
+
+
+# ช่วงเวลาที่เครือข่ายมีปัญหา: mask ของแถวที่อยู่ใน incident และความรุนแรง (1 = ปกติ)
+def incident_severity(rng, n, interval):
+    severity = np.ones(n)
+    count = rng.poisson(INCIDENTS_PER_DAY * n * interval / 86400)
+    for start in rng.integers(0, n, count):
+        length = max(1, int(rng.uniform(5, 60) * 60 / interval))
+        severity[start:start + length] = np.maximum(severity[start:start + length], rng.uniform(3, 15))
+    return severity
+
+
+# แถว network_metrics ของ site หนึ่ง (หนึ่งแถวต่อรอบ ต่อ SSID ที่เชื่อมต่ออยู่ขณะนั้น)
+def site_network_rows(rng, site_index, probe_id, ssids, start, end, interval):
+    ts = np.arange(start, end, interval, dtype=np.int64)
+    n = len(ts)
+    load = daily_load(ts)
+    severity = incident_severity(rng, n, interval)
+
+    # เชื่อมต่อกับ SSID หลักเป็นส่วนใหญ่ ย้ายไป SSID อื่นเป็นช่วง ๆ
+    current = np.zeros(n, dtype=np.int64)
+    for switch in rng.integers(0, n, max(1, n // 2000)):
+        current[switch:switch + int(rng.integers(30, 600))] = rng.integers(0, len(ssids))
+    ssid_values = np.array(ssids, dtype=object)[current]
+
+    base_latency = rng.uniform(0.012, 0.04)
+    latency = base_latency * (1 + 0.8 * load) * rng.lognormal(0, 0.25, n) * severity
+    lost = rng.random(n) < 0.02  # ไม่ได้คำตอบทั้ง burst
+    packet_loss = np.clip(rng.beta(1, 400, n) * severity ** 1.5, 0, 1)
+    packet_loss[lost] = 1.0
+
+    link_capacity = rng.choice([100e6, 300e6, 1e9])
+    download = link_capacity * rng.uniform(0.4, 0.9) * (1 - 0.5 * load) / severity * rng.lognormal(0, 0.1, n)
+    upload = download * rng.uniform(0.2, 0.5)
+    measured = (np.arange(n) + site_index) % THROUGHPUT_EVERY == 0
+
+    rx_rate = link_capacity / 8 * np.clip(0.05 + 0.5 * load * rng.lognormal(0, 0.5, n), 0, 1)
+    tx_rate = rx_rate * rng.uniform(0.1, 0.3, n)
+    bandwidth = np.clip(rx_rate * 8 / link_capacity * 100, 0, 100)
+    bytes_recv = np.cumsum(rx_rate * interval).astype(np.int64)
+    bytes_sent = np.cumsum(tx_rate * interval).astype(np.int64)
+    devices = rng.poisson(rng.uniform(5, 30) * (0.5 + load))
+
+    latency_values = np.where(lost, np.nan, latency)
+    rows = zip(
+        local_timestamps(ts), ts.tolist(),
+        np.where(measured, download, np.nan).tolist(), np.where(measured, upload, np.nan).tolist(),
+        latency_values.tolist(), packet_loss.tolist(), bytes_sent.tolist(), bytes_recv.tolist(),
+        devices.tolist(), ssid_values.tolist(), bandwidth.tolist(), rx_rate.tolist(), tx_rate.tolist(),
+        [probe_id] * n,
+    )
+    # NaN -> NULL (เหมือนรอบที่วัดไม่ได้จริง)
+    return [tuple(None if isinstance(v, float) and v != v else v for v in row) for row in rows]
+
+
+# ผลสแกนของ site หนึ่ง: BSSID ชุดเดิมทุกรอบ สัญญาณเปลี่ยนแบบ random walk บาง BSSID หายไปบางรอบ
+def site_scan_rows(rng, probe_id, ssids, bssids, start, end, interval):
+    ts = np.arange(start, end, interval, dtype=np.int64)
+    n = len(ts)
+    timestamps = local_timestamps(ts)
+    rows = []
+    for b in range(bssids):
+        ssid = ssids[b % len(ssids)] if b < 2 * len(ssids) else f'Neighbour-{b}'
+        bssid = ':'.join(f'{x:02x}' for x in rng.integers(0, 256, 6))
+        channel, frequency = CHANNELS[int(rng.integers(0, len(CHANNELS)))]
+        walk = np.cumsum(rng.normal(0, 1.5, n))
+        signal = np.clip(rng.uniform(20, 95) + walk - np.linspace(0, walk[-1], n), 1, 100).round().astype(np.int64)
+        seen = rng.random(n) > 0.05
+        rows.extend((timestamps[i], int(ts[i]), ssid, bssid, int(signal[i]), frequency, channel, probe_id)
+                    for i in np.flatnonzero(seen))
+    rows.sort(key=lambda row: row[1])
+    return rows
+
+
+def write_rows(sql, rows, path):
+    for i in range(0, len(rows), WRITE_CHUNK):
+        chunk = rows[i:i + WRITE_CHUNK]
+        with storage.transaction(path) as conn:
+            conn.executemany(sql, chunk)
+
+
+# สร้างข้อมูลย้อนหลัง days วัน จนถึงตอนนี้ คืนค่าจำนวนแถวของแต่ละตาราง
+def generate(path, days=14, sites=3, ssids=3, bssids=12, interval=60, scan_interval=60, seed=1, rollups=True):
+    rng = np.random.default_rng(seed)
+    end = int(time.time()) // interval * interval
+    start = end - int(days * 86400)
+    storage.setup_database(path)
+    engine = AlertEngine(path=path, on_event=lambda event, incident: None)
+    counts = {'network_metrics': 0, 'metrics': 0}
+
+    network = []
+    for site in range(sites):
+        # site เดียว = collector ในเครื่อง (probe_id เป็น NULL) หลาย site = fleet
+        probe_id = f'site-{site + 1:02d}' if sites > 1 else None
+        names = [f'{name}-{site + 1}' if sites > 1 else name
+                 for name in (SSID_NAMES[(site + k) % len(SSID_NAMES)] for k in range(ssids))]
+        rows = site_network_rows(rng, site, probe_id, names, start, end, interval)
+        write_rows(INSERT_NETWORK_SQL, rows, path)
+        network.extend(rows)
+        counts['network_metrics'] += len(rows)
+
+        scan = site_scan_rows(rng, probe_id, names, bssids, start, end, scan_interval) if scan_interval else []
+        write_rows(INSERT_SCAN_SQL, scan, path)
+        counts['metrics'] += len(scan)
+        print(f"  {probe_id or 'local'}: {len(rows):,} network_metrics rows, {len(scan):,} scan rows")
+
+    # alert จากกฎจริงของ alert_engine (incident แบบเดียวกับที่ collector จะเขียน)
+    network.sort(key=lambda row: row[1])
+    for row in network:
+        engine.process({'ts': row[1], 'download_speed': row[2], 'upload_speed': row[3], 'latency': row[4],
+                        'packet_loss': row[5], 'device_count': row[8], 'ssid': row[9], 'bandwidth': row[10],
+                        'probe_id': row[13]})
+    counts['alerts'] = engine.flush()
+
+    if rollups:
+        counts['rollups'] = sum(rollup.run_rollups(path=path).values())
+        counts['rf_scan_rows'] = rf_analytics.update(path, max_rows=None)
+    return counts
+
+
+# python synthetic.py --db /tmp/load.db --days 30 --sites 50
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fill a new database with synthetic multi-site Wi-Fi metrics')
+    parser.add_argument('--db', required=True, help='database file to create')
+    parser.add_argument('--days', type=float, default=14)
+    parser.add_argument('--sites', type=int, default=3, help='probes (each writes one row per interval)')
+    parser.add_argument('--ssids', type=int, default=3, help='SSIDs per site')
+    parser.add_argument('--bssids', type=int, default=12, help='BSSIDs seen per scan')
+    parser.add_argument('--interval', type=int, default=60, help='seconds between network_metrics rows')
+    parser.add_argument('--scan-interval', type=int, default=60, help='seconds between scans (0 = no scan rows)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-rollups', action='store_true', help='skip rollups and RF analytics')
+    parser.add_argument('--append', action='store_true', help='add to an existing database')
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.db) and not args.append:
+        parser.error(f'{args.db} exists (use --append to add to it)')
+
+    started = time.perf_counter()
+    print(f"Generating {args.days:g} days x {args.sites} site(s) into {args.db}")
+    counts = generate(args.db, args.days, args.sites, args.ssids, args.bssids, args.interval,
+                      args.scan_interval or None, args.seed, not args.no_rollups)
+    elapsed = time.perf_counter() - started
+    total = counts['network_metrics'] + counts['metrics']
+    print(', '.join(f'{table}: {count:,}' for table, count in counts.items()))
+    print(f"{total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+# ให้ import โมดูลระดับบนสุดของ repo ได้ไม่ว่ารัน pytest จากที่ไหน
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# ฐานข้อมูลชั่วคราวต่อ test (ไม่แตะ network_metrics.db ของจริง)
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    import storage
+
+    path = str(tmp_path / 'test.db')
+    monkeypatch.setattr(storage, 'DB_NAME', path)
+    storage.setup_database(path)
+    yield path
+    storage.close_connection(path)
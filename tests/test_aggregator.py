@@ -0,0 +1,103 @@
+import gzip
+import json
+import threading
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+import aggregator
+import storage
+from aggregator import BatchError
+from fleet import TABLE_COLUMNS
+
+NETWORK_COLUMNS = TABLE_COLUMNS['network_metrics']
+
+
+def _metrics_row(ts, ssid='office', download=50e6):
+    values = {'timestamp': '2026-01-01 00:00:00', 'ts': ts, 'download_speed': download, 'upload_speed': 10e6,
+              'latency': 0.02, 'packet_loss': 0.0, 'bytes_sent': 0, 'bytes_recv': 0, 'device_count': 3,
+              'ssid': ssid, 'bandwidth': None, 'rx_rate': None, 'tx_rate': None}
+    return [values[column] for column in NETWORK_COLUMNS]
+
+
+def _batch(rows, batch_id='b1', probe_id='probe-a', columns=NETWORK_COLUMNS):
+    return {'probe_id': probe_id, 'batch_id': batch_id,
+            'tables': {'network_metrics': {'columns': columns, 'rows': rows}}}
+
+
+def _body(batch):
+    return json.dumps(batch).encode('utf-8')
+
+
+@pytest.mark.parametrize('batch, message', [
+    ({'probe_id': 'p', 'batch_id': 'b', 'tables': []}, 'tables must be an object'),
+    ({'probe_id': 'p', 'batch_id': 'b', 'tables': {'network_metrics': []}}, 'columns and rows must be lists'),
+    (_batch({'ts': 1}), 'columns and rows must be lists'),
+    (_batch([[1, 2]]), f'every row must have {len(NETWORK_COLUMNS)} values'),
+    (_batch([_metrics_row(1)], columns=NETWORK_COLUMNS[:-1] + ['ts']), 'columns must be distinct'),
+    (_batch([], columns=['nope']), 'unknown column'),
+    ({'probe_id': 'p', 'batch_id': 'b', 'tables': {'secrets': {'columns': [], 'rows': []}}}, 'unknown table'),
+])
+def test_decode_batch_rejects_bad_shape(batch, message):
+    with pytest.raises(BatchError, match=message):
+        aggregator.decode_batch(_body(batch))
+
+
+def test_ingest_batch_is_idempotent(db_path):
+    batch = aggregator.decode_batch(gzip.compress(_body(_batch([_metrics_row(1000), _metrics_row(1060)]))), 'gzip')
+    assert aggregator.ingest_batch(batch, db_path) == (2, False)
+    assert aggregator.ingest_batch(batch, db_path) == (0, True)
+    assert storage.query("SELECT COUNT(*), MIN(probe_id) FROM network_metrics", (), db_path)[0] == (2, 'probe-a')
+
+
+def test_database_rejection_is_a_batch_error(db_path):
+    row = _metrics_row(1000)
+    row[NETWORK_COLUMNS.index('ssid')] = ['not', 'a', 'scalar']
+    with pytest.raises(BatchError, match='rejected by database'):
+        aggregator.ingest_batch(aggregator.decode_batch(_body(_batch([row]))), db_path)
+    # ทั้ง batch ถูก rollback รวมทั้ง batch_id จึงส่งฉบับที่แก้แล้วด้วย id เดิมได้
+    assert storage.query_one('SELECT COUNT(*) FROM ingest_batches', (), db_path)[0] == 0
+
+
+def test_server_replies_400_for_rejected_batches(db_path):
+    server = aggregator.AggregatorServer(('127.0.0.1', 0), db_path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f'http://127.0.0.1:{server.server_address[1]}/ingest'
+    try:
+        row = _metrics_row(1000)
+        row[0] = {'nested': True}
+        with pytest.raises(HTTPError) as error:
+            urlopen(Request(url, data=_body(_batch([row])), method='POST'), timeout=5)
+        assert error.value.code == 400
+
+        with urlopen(Request(url, data=_body(_batch([_metrics_row(1000)])), method='POST'), timeout=5) as response:
+            assert json.loads(response.read()) == {'rows': 1, 'duplicate': False}
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_maintenance_opens_fleet_incidents(db_path):
+    ts = 1_800_000_000
+    # latency หน่วยวินาที: สอง sample ติดกันเกิน 0.2 เปิด incident high_latency
+    rows = [_metrics_row(ts + i * 60) for i in range(3)]
+    latency = NETWORK_COLUMNS.index('latency')
+    rows[1][latency] = rows[2][latency] = 0.5
+    aggregator.ingest_batch(_batch(rows, probe_id='probe-a'), db_path)
+    aggregator.ingest_batch(_batch([_metrics_row(ts)], batch_id='b2', probe_id='probe-b'), db_path)
+
+    engine = aggregator.AlertEngine(path=db_path, on_event=lambda event, incident: None)
+    assert aggregator.run_alerts(engine, db_path) == 4
+    assert aggregator.run_alerts(engine, db_path) == 0
+    incidents = storage.query('SELECT rule, ssid, probe_id, state, alert_message FROM alerts', (), db_path)
+    assert incidents == [('high_latency', 'office', 'probe-a', 'open',
+                          '[probe-a/office] Latency above 200 ms (worst 500 ms, 2 sample(s))')]
+
+    # latency กลับมาปกติในรอบถัดไป: incident เดิมถูกปิด
+    aggregator.ingest_batch(_batch([_metrics_row(ts + 300)], batch_id='b3', probe_id='probe-a'), db_path)
+    engine = aggregator.AlertEngine(path=db_path, on_event=lambda event, incident: None)
+    engine.load_open()
+    aggregator.run_alerts(engine, db_path)
+    assert storage.query('SELECT state FROM alerts', (), db_path) == [('resolved',)]
@@ -0,0 +1,74 @@
+import time
+
+import storage
+from alert_engine import AlertEngine
+
+TS = 1_800_000_000
+
+
+def _engine(path, events, **kwargs):
+    return AlertEngine(path=path, on_event=lambda event, incident: events.append((event, incident.rule.name)), **kwargs)
+
+
+def _feed(engine, latencies, start=0):
+    events = []
+    for i, latency in enumerate(latencies):
+        events.extend(event for event, _ in engine.process({'ts': TS + (start + i) * 60, 'ssid': 'office',
+                                                            'latency': latency}))
+    return events
+
+
+def _alerts(path):
+    return storage.query('SELECT rule, ssid, state, samples, alert_message FROM alerts ORDER BY id', (), path)
+
+
+def test_incident_opens_after_consecutive_samples_and_clears_with_hysteresis(db_path):
+    engine = _engine(db_path, [])
+    # 0.3 ครั้งเดียวยังไม่เปิด (for_samples = 2), 0.18 อยู่ระหว่าง threshold กับ clear จึงยังเปิดอยู่
+    assert _feed(engine, [0.3, 0.02, 0.3, 0.4, 0.18]) == ['opened']
+    assert engine.flush() == 1
+    assert _alerts(db_path) == [('high_latency', 'office', 'open', 2,
+                                 '[office] Latency above 200 ms (worst 400 ms, 2 sample(s))')]
+
+    assert _feed(engine, [0.1], start=5) == ['resolved']
+    # เกินอีกภายใน cooldown: เปิดแถวเดิมต่อ ไม่สร้างแถวใหม่
+    assert _feed(engine, [0.5, 0.5], start=6) == ['reopened']
+    assert engine.flush() == 1
+    assert _alerts(db_path) == [('high_latency', 'office', 'open', 4,
+                                 '[office] Latency above 200 ms (worst 500 ms, 4 sample(s))')]
+
+
+def test_open_incidents_survive_restart(db_path):
+    engine = _engine(db_path, [])
+    _feed(engine, [0.3, 0.3])
+    engine.flush()
+
+    events = []
+    restarted = _engine(db_path, events)
+    assert restarted.load_open() == 1
+    assert _feed(restarted, [0.3, 0.3], start=2) == []
+    assert _feed(restarted, [0.01], start=4) == ['resolved']
+    restarted.flush()
+    assert [row[2] for row in _alerts(db_path)] == ['resolved']
+
+
+def test_engine_thread_flushes_on_stop(db_path):
+    engine = _engine(db_path, [], flush_interval=0.2).start()
+    for i in range(3):
+        assert engine.submit({'ts': TS + i * 60, 'ssid': 'office', 'latency': 0.3, 'packet_loss': 0.0})
+    engine.stop(timeout=10)
+    assert [row[:3] for row in _alerts(db_path)] == [('high_latency', 'office', 'open')]
+
+
+def test_stop_does_not_wait_for_flush_interval(db_path):
+    engine = _engine(db_path, [], flush_interval=60).start()
+    for i in range(3):
+        assert engine.submit({'ts': TS + i * 60, 'ssid': 'office', 'latency': 0.3, 'packet_loss': 0.0})
+    deadline = time.monotonic() + 5
+    while engine.queue_depth() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    start = time.monotonic()
+    engine.stop(timeout=10)
+    assert time.monotonic() - start < 5
+    assert [row[:3] for row in _alerts(db_path)] == [('high_latency', 'office', 'open')]
@@ -0,0 +1,18 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip('dash')
+
+import app
+
+
+def test_patch_extends_the_trace_of_the_same_probe():
+    keys = ['probe-a/office', 'probe-b/office']
+    df = pd.DataFrame([(20, 'office', 'probe-b', 0.25), (20, 'office', 'probe-c', 0.5)],
+                      columns=['ts', 'ssid', 'probe_id', 'latency'])
+    operations = app.patch_figure(df, 'latency', 'latency Over Time', keys).to_plotly_json()['operations']
+
+    assert [(op['operation'], op['location']) for op in operations] == [
+        ('Extend', ['data', 1, 'x']), ('Extend', ['data', 1, 'y']), ('Append', ['data'])]
+    assert operations[2]['params']['value']['name'] == 'latency Over Time - probe-c/office'
+    assert keys == ['probe-a/office', 'probe-b/office', 'probe-c/office']
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+pytest.importorskip('pyarrow')
+
+import archive
+import storage
+
+DAY = 86400
+DAY_START = 1_700_000_000 // DAY * DAY
+
+
+def _insert(path, rows):
+    storage.executemany_write('INSERT INTO network_metrics (ts, ssid, latency) VALUES (?, ?, ?)', rows, path)
+
+
+def _parts(archive_dir):
+    found = []
+    for root, _, files in os.walk(archive_dir):
+        found.extend(name for name in files if name.endswith('.parquet'))
+    return sorted(found)
+
+
+def test_archive_day_moves_rows(db_path, tmp_path):
+    archive_dir = str(tmp_path / 'archive')
+    _insert(db_path, [(DAY_START + i * 60, 'office', 0.01 * i) for i in range(10)])
+    assert archive.archive_day('network_metrics', DAY_START, db_path, archive_dir) == 10
+    assert storage.query_one('SELECT COUNT(*) FROM network_metrics', (), db_path)[0] == 0
+    assert _parts(archive_dir) == ['part-1-10.parquet']
+
+    history = archive.read_history('network_metrics', ['id', 'ts', 'ssid', 'latency'], path=db_path,
+                                   archive_dir=archive_dir)
+    assert history['id'].tolist() == list(range(1, 11))
+    assert set(history['ssid']) == {'office'}
+
+
+def test_rerun_after_partial_delete_keeps_every_row(db_path, tmp_path, monkeypatch):
+    archive_dir = str(tmp_path / 'archive')
+    _insert(db_path, [(DAY_START + i * 60, 'office', float(i)) for i in range(10)])
+
+    # จำลองรอบที่ลบไม่ครบ: เขียนไฟล์แล้วแต่ลบไปเฉพาะแถวกลาง แถวที่เหลือจึงมีช่วง id เดิม 1..10
+    monkeypatch.setattr(storage, 'with_retry', lambda fn, *args, **kwargs: 0)
+    archive.archive_day('network_metrics', DAY_START, db_path, archive_dir)
+    monkeypatch.undo()
+    storage.execute_write('DELETE FROM network_metrics WHERE id BETWEEN 3 AND 8', (), db_path)
+
+    assert archive.archive_day('network_metrics', DAY_START, db_path, archive_dir) == 4
+    assert _parts(archive_dir) == ['part-1-10-1.parquet', 'part-1-10.parquet']
+    history = archive.read_history('network_metrics', ['id', 'latency'], path=db_path, archive_dir=archive_dir)
+    assert history['id'].tolist() == list(range(1, 11))
@@ -0,0 +1,111 @@
+import json
+import queue
+
+import ddos_detection
+from ddos_detection import StreamingDetector
+
+
+def _row(row_id, ssid, probe_id=None, download=50e6):
+    return {'id': row_id, 'ssid': ssid, 'probe_id': probe_id, 'download_speed': download,
+            'upload_speed': 10e6, 'latency': 0.02, 'packet_loss': 0.0, 'device_count': 5}
+
+
+def test_spike_after_warmup_is_flagged():
+    stats = ddos_detection.RollingStats(size=30)
+    for i in range(ddos_detection.WARMUP_SAMPLES - 1):
+        assert stats.update(0.02 + 0.002 * (i % 2)) == []
+    assert stats.update(0.021) == []
+    anomalies = stats.update(0.5)
+    assert any(a.startswith('z-score') for a in anomalies)
+    assert any(a.startswith('EWMA') for a in anomalies)
+
+
+def test_ring_buffer_keeps_last_window():
+    stats = ddos_detection.RollingStats(size=5)
+    for x in range(1, 11):
+        stats.update(float(x))
+    mean, std = stats.mean_std()
+    assert stats.count == 5
+    assert mean == 8.0
+    assert std == 2.0 ** 0.5
+
+
+def test_detector_reports_anomaly_per_ssid():
+    detector = StreamingDetector()
+    for i in range(20):
+        assert detector.process(_row(i + 1, 'office')) == []
+        detector.process(_row(i + 100, 'lab', download=900e6 + i * 1e6))
+    alerts = detector.process(_row(50, 'office', download=300e6))
+    assert '[office] Detected rapid change in download speed' in alerts
+    assert any(alert.startswith('[office] Anomaly in download_speed') for alert in alerts)
+    assert detector.last_id == 119
+    assert detector.processed == 41
+
+
+def test_flat_series_ignores_tiny_blips():
+    detector = StreamingDetector()
+    for i in range(30):
+        assert detector.process(_row(i + 1, 'office')) == []
+    # packet_loss เป็น 0 และ latency คงที่มาตลอด: เสีย 1% / ช้าขึ้น 1 ms ครั้งเดียวไม่ใช่ความผิดปกติ
+    blip = dict(_row(31, 'office'), packet_loss=0.01, latency=0.021)
+    assert detector.process(blip) == []
+    stats = detector.stats[('', 'office')]['packet_loss']
+    assert (stats.cusum_high, stats.cusum_low) == (0.0, 0.0)
+
+    spike = dict(_row(32, 'office'), packet_loss=0.3, latency=0.25)
+    alerts = detector.process(spike)
+    assert any(alert.startswith('[office] Anomaly in packet_loss') for alert in alerts)
+    assert any(alert.startswith('[office] Anomaly in latency') for alert in alerts)
+
+
+def test_state_is_kept_per_probe():
+    detector = StreamingDetector()
+    detector.process(_row(1, 'office', 'probe-a', download=50e6))
+    # SSID เดียวกันจากอีก probe ไม่ใช่ "แถวก่อนหน้า" ของ probe-a จึงไม่เกิด rapid change
+    alerts = detector.process(_row(2, 'office', 'probe-b', download=500e6))
+    assert not any('rapid change' in alert for alert in alerts)
+    assert set(detector.stats) == {('probe-a', 'office'), ('probe-b', 'office')}
+
+    alerts = detector.process(_row(3, 'office', 'probe-a', download=500e6))
+    assert '[probe-a/office] Detected rapid change in download speed' in alerts
+
+
+def test_checkpoint_round_trip(tmp_path):
+    path = str(tmp_path / 'state.json')
+    detector = StreamingDetector()
+    for i in range(20):
+        detector.process(_row(i + 1, 'office', 'probe-a'))
+        detector.process(_row(i + 100, 'office'))
+    detector.checkpoint(path)
+
+    loaded = StreamingDetector.load(path)
+    assert loaded.last_id == detector.last_id
+    assert loaded.previous == detector.previous
+    assert set(loaded.stats) == {('probe-a', 'office'), ('', 'office')}
+    assert loaded.stats[('', 'office')]['latency'].count == 20
+
+
+def test_load_legacy_checkpoint(tmp_path):
+    path = str(tmp_path / 'state.json')
+    legacy = StreamingDetector()
+    legacy.process(_row(7, 'home'))
+    stats = {metric: s.to_dict() for metric, s in legacy.stats[('', 'home')].items()}
+    with open(path, 'w') as f:
+        json.dump({'window': 60, 'last_id': 7, 'previous': {'home': legacy.previous[('', 'home')]},
+                   'stats': {'home': stats}}, f)
+
+    loaded = StreamingDetector.load(path)
+    assert loaded.last_id == 7
+    assert ('', 'home') in loaded.previous
+    assert loaded.stats[('', 'home')]['download_speed'].count == 1
+
+
+def test_stop_detector_thread_checkpoints(tmp_path):
+    path = str(tmp_path / 'state.json')
+    q = queue.Queue()
+    detector, thread = ddos_detection.start_detector_thread(q, checkpoint_path=path, on_alert=lambda alert: None)
+    q.put(_row(42, 'office', 'probe-a'))
+    ddos_detection.stop_detector_thread(q, thread)
+
+    assert not thread.is_alive()
+    assert StreamingDetector.load(path).last_id == 42
@@ -0,0 +1,56 @@
+import storage
+from device_tracker import DeviceTable, DeviceTracker, packet_observation
+
+
+def _sessions(path):
+    return storage.query('SELECT mac, ip, first_seen, last_seen FROM device_sessions ORDER BY id', (), path)
+
+
+def test_table_expires_least_recently_seen():
+    table = DeviceTable(ttl=100)
+    assert table.observe('AA:AA:AA:AA:AA:01', '10.0.0.1', 0, 'arp')
+    assert table.observe('aa:aa:aa:aa:aa:02', '10.0.0.2', 50, 'arp')
+    assert not table.observe('aa:aa:aa:aa:aa:01', '10.0.0.1', 100, 'arp')
+
+    expired = table.expire(160)
+    assert [d.mac for d in expired] == ['aa:aa:aa:aa:aa:02']
+    assert list(table.devices) == ['aa:aa:aa:aa:aa:01']
+    # เห็นอีกครั้งหลังหมดอายุ = อุปกรณ์ใหม่
+    assert table.observe('aa:aa:aa:aa:aa:02', '10.0.0.2', 170, 'dhcp')
+
+
+def test_table_ignores_broadcast_and_empty_ip():
+    table = DeviceTable()
+    assert not table.observe('ff:ff:ff:ff:ff:ff', '10.0.0.9', 0, 'arp')
+    table.observe('aa:aa:aa:aa:aa:03', '0.0.0.0', 0, 'dhcp')
+    assert len(table) == 1
+    assert table.devices['aa:aa:aa:aa:aa:03'].ip is None
+
+
+def test_flush_upserts_one_session_per_visit(db_path):
+    now = [10]
+    tracker = DeviceTracker(ttl=100, path=db_path, clock=lambda: now[0])
+    tracker.observe('aa:aa:aa:aa:aa:01', '10.0.0.1')
+    assert tracker.flush() == 1
+    assert _sessions(db_path) == [('aa:aa:aa:aa:aa:01', '10.0.0.1', 10, 10)]
+
+    now[0] = 20
+    tracker.observe('aa:aa:aa:aa:aa:01', '10.0.0.5')
+    assert tracker.flush() == 1
+    assert tracker.flush() == 0
+    assert _sessions(db_path) == [('aa:aa:aa:aa:aa:01', '10.0.0.5', 10, 20)]
+
+    # หมดอายุแล้วกลับมาใหม่ = session ใหม่
+    now[0] = 200
+    assert tracker.count() == 0
+    tracker.observe('aa:aa:aa:aa:aa:01', '10.0.0.5')
+    assert tracker.flush() == 2
+    assert _sessions(db_path) == [('aa:aa:aa:aa:aa:01', '10.0.0.5', 10, 20),
+                                  ('aa:aa:aa:aa:aa:01', '10.0.0.5', 200, 200)]
+
+
+def test_arp_packet_observation():
+    from scapy.layers.l2 import ARP, Ether
+
+    pkt = Ether(src='aa:aa:aa:aa:aa:04') / ARP(hwsrc='aa:aa:aa:aa:aa:04', psrc='192.168.1.4')
+    assert packet_observation(pkt) == ('aa:aa:aa:aa:aa:04', '192.168.1.4', 'arp')
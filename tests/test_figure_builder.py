@@ -0,0 +1,29 @@
+import pandas as pd
+
+import figure_builder
+
+
+def _frame(rows):
+    return pd.DataFrame(rows, columns=['ts', 'ssid', 'probe_id', 'latency'])
+
+
+def test_same_ssid_from_each_probe_is_its_own_series():
+    df = _frame([(30, 'office', 'probe-b', 0.3), (10, 'office', None, 0.1), (20, 'office', 'probe-a', 0.2),
+                 (40, 'office', 'probe-a', 0.4), (50, None, 'probe-a', 0.5)])
+    series = figure_builder.split_by_series(df, 'latency')
+    assert [(key, ts.tolist()) for key, ts, _ in series] == [
+        ('office', [10]), ('probe-a/office', [20, 40]), ('probe-a/unknown', [50]), ('probe-b/office', [30])]
+
+    # rollup ไม่มีคอลัมน์ probe_id: key เป็น SSID อย่างเดียว
+    assert [key for key, _, _ in figure_builder.split_by_series(df.drop(columns='probe_id'), 'latency')] == \
+        ['office', 'unknown']
+
+
+def test_build_and_patch_use_the_same_keys():
+    df = _frame([(10, 'office', 'probe-a', 0.1), (10, 'office', 'probe-b', 0.2)])
+    traces, keys, _ = figure_builder.build_traces(df, 'latency', 'UTC', lambda key: f'latency - {key}', 'lines')
+    assert keys == ['probe-a/office', 'probe-b/office']
+    assert [trace.name for trace in traces] == ['latency - probe-a/office', 'latency - probe-b/office']
+
+    updates = figure_builder.patch_series(_frame([(20, 'office', 'probe-b', 0.25)]), 'latency', 'UTC')
+    assert updates == [('probe-b/office', ['1970-01-01T00:00:20'], [0.25])]
@@ -0,0 +1,79 @@
+import time
+
+import storage
+from ingest import ScanIngestor
+
+INSERT_SQL = 'INSERT INTO scan_rows (v) VALUES (?)'
+
+
+def _table(path):
+    storage.execute_write('CREATE TABLE IF NOT EXISTS scan_rows (v INTEGER)', (), path)
+
+
+def _count(path):
+    return storage.query_one('SELECT COUNT(*) FROM scan_rows', (), path)[0]
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_flush_when_batch_reaches_size(db_path):
+    _table(db_path)
+    ingestor = ScanIngestor(flush_interval=1, flush_size=3, sql=INSERT_SQL).start()
+    try:
+        ingestor.submit([(1,), (2,)])
+        ingestor.submit([(3,), (4,)])
+        assert _wait_for(lambda: ingestor.flushes == 1)
+        assert _count(db_path) == 4
+    finally:
+        ingestor.stop(timeout=5)
+
+
+def test_flush_after_interval(db_path):
+    _table(db_path)
+    ingestor = ScanIngestor(flush_interval=0.1, flush_size=1000, sql=INSERT_SQL).start()
+    try:
+        ingestor.submit([(1,)])
+        assert _wait_for(lambda: _count(db_path) == 1)
+        assert ingestor.written_rows == 1
+    finally:
+        ingestor.stop(timeout=5)
+
+
+def test_stop_writes_pending_rows(db_path):
+    _table(db_path)
+    ingestor = ScanIngestor(flush_interval=1, flush_size=1000, sql=INSERT_SQL).start()
+    for i in range(5):
+        ingestor.submit([(i,), (i,)])
+    ingestor.stop(timeout=5)
+    assert _count(db_path) == 10
+    assert ingestor.queue_depth() == 0
+
+
+def test_full_queue_drops_scan(db_path):
+    _table(db_path)
+    ingestor = ScanIngestor(max_queue=1, sql=INSERT_SQL)
+    assert ingestor.submit([(1,)])
+    assert not ingestor.submit([(2,)])
+    assert ingestor.dropped_scans == 1
+
+    ingestor.flush()
+    assert _count(db_path) == 1
+
+
+def test_stop_does_not_wait_for_flush_interval(db_path):
+    _table(db_path)
+    ingestor = ScanIngestor(flush_interval=60, flush_size=1000, sql=INSERT_SQL).start()
+    ingestor.submit([(1,)])
+    assert _wait_for(lambda: ingestor.queue_depth() == 0)
+
+    start = time.monotonic()
+    ingestor.stop(timeout=10)
+    assert time.monotonic() - start < 5
+    assert _count(db_path) == 1
@@ -0,0 +1,42 @@
+import pinger
+from pinger import LoopbackEchoServer
+
+
+def _probe(server, count=10, timeout=0.5):
+    host, port = server.address
+    return pinger.probe_targets([('echo', host)], count=count, interval=0.01, timeout=timeout,
+                                mode='udp', udp_port=port)['echo']
+
+
+def test_echo_rtt():
+    with LoopbackEchoServer() as server:
+        stats = _probe(server)
+    assert stats.sent == 10
+    assert stats.received == 10
+    assert stats.loss == 0
+    assert 0 < stats.min <= stats.avg <= stats.max < 0.5
+    assert stats.jitter >= 0
+
+
+def test_drop_counts_as_loss():
+    with LoopbackEchoServer(drop_every=2) as server:
+        stats = _probe(server)
+    assert server.received == 10
+    assert stats.received == 5
+    assert stats.loss == 0.5
+    assert [rtt is None for rtt in stats.rtts] == [False, True] * 5
+
+
+def test_delay_past_timeout_is_lost():
+    with LoopbackEchoServer(delay=0.3) as server:
+        stats = _probe(server, count=3, timeout=0.1)
+    assert stats.received == 0
+    assert stats.loss == 1.0
+    assert stats.avg is None
+
+
+def test_delay_within_timeout_is_measured():
+    with LoopbackEchoServer(delay=0.05) as server:
+        stats = _probe(server, count=3, timeout=1.0)
+    assert stats.received == 3
+    assert stats.min >= 0.05
@@ -0,0 +1,94 @@
+import pandas as pd
+import pytest
+
+import rf_analytics
+import storage
+
+HOUR = rf_analytics.HOUR
+NOW = 1_800_000_000 // rf_analytics.DAY * rf_analytics.DAY + 12 * HOUR
+
+
+def _insert_scans(path, scans):
+    rows = [(ts, ssid, bssid, signal, '2437 MHz', str(channel))
+            for ts, aps in scans for ssid, bssid, signal, channel in aps]
+    storage.executemany_write('''
+        INSERT INTO metrics (ts, ssid, bssid, signal_strength, frequency, channel) VALUES (?, ?, ?, ?, ?, ?)
+    ''', rows, path)
+
+
+def _summary(path):
+    return (storage.query('SELECT bucket, scans FROM rf_scans ORDER BY bucket', (), path),
+            storage.query('''
+                SELECT bucket, band, channel, bssids, signal_sum, max_signal, ROUND(interference, 6)
+                FROM rf_channels ORDER BY bucket, band, channel
+            ''', (), path))
+
+
+SCAN = [('office', 'aa:00:00:00:00:01', 80, 1), ('office', 'aa:00:00:00:00:02', 60, 6),
+        ('guest', 'aa:00:00:00:00:03', 40, 6), ('lab', 'aa:00:00:00:00:04', 20, 3)]
+
+
+def test_scan_split_across_chunks_is_counted_once(db_path, tmp_path):
+    _insert_scans(db_path, [(NOW + i * 60, SCAN) for i in range(3)])
+    # chunk ละ 5 แถว: ทุก chunk ตัดกลางรอบสแกน (รอบละ 4 แถว)
+    assert rf_analytics.update(db_path, chunk_rows=5, max_rows=None) == 12
+
+    reference = str(tmp_path / 'reference.db')
+    storage.setup_database(reference)
+    try:
+        _insert_scans(reference, [(NOW + i * 60, SCAN) for i in range(3)])
+        assert rf_analytics.update(reference, max_rows=None) == 12
+        assert _summary(db_path) == _summary(reference)
+    finally:
+        storage.close_connection(reference)
+
+    scans, channels = _summary(db_path)
+    assert scans == [(NOW, 3)]
+    assert sum(row[3] for row in channels) == 12
+    assert rf_analytics.update(db_path, chunk_rows=5) == 0
+
+
+def test_empty_candidate_channels_are_scored():
+    result = rf_analytics.scan_channels([('2.4 GHz', 3, 100), ('2.4 GHz', 3, 50)])
+    assert result[('2.4 GHz', 3)][:3] == [2, 150, 100]
+    # ช่อง 1 ห่างจากช่อง 3 สองช่อง (10 MHz จากความกว้าง 22 MHz)
+    assert result[('2.4 GHz', 1)][:3] == [0, 0, None]
+    assert result[('2.4 GHz', 1)][3] == pytest.approx(1.5 * (1 - 10 / 22))
+    assert result[('2.4 GHz', 6)][3] == pytest.approx(1.5 * (1 - 15 / 22))
+    assert result[('2.4 GHz', 11)][3] == 0.0
+    assert ('5 GHz', 36) not in result
+
+
+def test_recommend_least_congested_candidate(db_path):
+    _insert_scans(db_path, [(NOW, SCAN)])
+    rf_analytics.update(db_path)
+    scores = rf_analytics.channel_scores(NOW - HOUR, path=db_path)
+    assert set(scores['channel']) == {1, 3, 6, 11}
+    assert not scores.set_index('channel').loc[3, 'candidate']
+    assert rf_analytics.recommend_channel(scores) == 11
+
+
+def test_nearest_rank_percentile():
+    hist = pd.DataFrame({'bssid': ['a'] * 4 + ['b'],
+                         'signal': [20, 50, 70, 80, 40],
+                         'samples': [1, 4, 4, 1, 3]})
+    hist['cumulative'] = hist.groupby('bssid')['samples'].cumsum()
+    # a มี 10 ตัวอย่าง: อันดับ ceil(q/100 * 10)
+    assert rf_analytics.histogram_percentile(hist, 10).to_dict() == {'a': 20, 'b': 40}
+    assert rf_analytics.histogram_percentile(hist, 50).to_dict() == {'a': 50, 'b': 40}
+    assert rf_analytics.histogram_percentile(hist, 51).to_dict() == {'a': 70, 'b': 40}
+    assert rf_analytics.histogram_percentile(hist, 100).to_dict() == {'a': 80, 'b': 40}
+
+
+def test_neighbour_interference_excludes_own_signal(db_path):
+    _insert_scans(db_path, [(NOW, SCAN)])
+    rf_analytics.update(db_path)
+    df = rf_analytics.neighbours(NOW - HOUR, path=db_path).set_index('bssid')
+
+    assert df.loc['aa:00:00:00:00:01', 'p50'] == 80
+    assert df.loc['aa:00:00:00:00:02', 'co_channel'] == 1
+    assert df.loc['aa:00:00:00:00:04', 'co_channel'] == 0
+    # ช่อง 6: AP อีกตัวบนช่องเดียวกัน + ช่อง 3 ซ้อนทับ 7/22 (ไม่นับสัญญาณของตัวเอง)
+    assert df.loc['aa:00:00:00:00:02', 'interference'] == pytest.approx(0.4 + 0.2 * 7 / 22)
+    assert df.loc['aa:00:00:00:00:04', 'interference'] == pytest.approx(0.8 * 12 / 22 + 1.0 * 7 / 22)
+    assert df.loc['aa:00:00:00:00:01', 'interference'] == pytest.approx(0.2 * 12 / 22)
@@ -0,0 +1,134 @@
+import aggregator
+import migrations
+import rollup
+import storage
+from fleet import TABLE_COLUMNS
+
+DAY = 24 * 3600
+NOW = 1_800_000_000 // DAY * DAY + 12 * 3600
+
+
+def _insert(path, rows):
+    storage.executemany_write('INSERT INTO network_metrics (ts, ssid, latency) VALUES (?, ?, ?)', rows, path)
+
+
+def _rollup(path, tier, bucket, probe_id=''):
+    return storage.query_one('SELECT n, min, max, avg FROM network_rollups WHERE tier = ? AND metric = ? AND bucket = ? AND probe_id = ?',
+                             (tier, 'latency', bucket, probe_id), path)
+
+
+def _batch(batch_id, rows):
+    columns = TABLE_COLUMNS['network_metrics']
+    return {'probe_id': 'probe-a', 'batch_id': batch_id, 'tables': {'network_metrics': {
+        'columns': columns,
+        'rows': [[{'ts': ts, 'ssid': 'office', 'latency': latency}.get(c) for c in columns] for ts, latency in rows],
+    }}}
+
+
+def test_closed_buckets_are_summarized(db_path):
+    bucket = NOW - 2 * 3600
+    _insert(db_path, [(bucket + i * 60, 'office', float(i)) for i in range(1, 21)])
+    _insert(db_path, [(NOW - 30, 'office', 99.0)])  # bucket ที่ยังไม่ปิด
+    rollup.run_rollups(NOW, db_path)
+
+    assert _rollup(db_path, '1h', bucket) == (20, 1.0, 20.0, 10.5)
+    assert _rollup(db_path, '5m', bucket) == (4, 1.0, 4.0, 2.5)
+    assert _rollup(db_path, '1m', bucket + 60) == (1, 1.0, 1.0, 1.0)
+    assert _rollup(db_path, '1m', NOW - 60) is None
+    assert storage.query_one("SELECT p95 FROM network_rollups WHERE tier = '1h' AND bucket = ?", (bucket,), db_path) == (19.0,)
+    last = storage.query_one("SELECT last_bucket FROM rollup_state WHERE tier = '1m'", (), db_path)[0]
+    assert last == (NOW - rollup.LATE_ARRIVAL) // 60 * 60
+
+
+def test_pick_tier_by_range():
+    raw_retention = 50 * 3600
+    assert rollup.pick_tier(3600, raw_retention, 60, 1500) is None
+    assert rollup.pick_tier(3 * DAY, raw_retention, 60, 1500) == '5m'
+    assert rollup.pick_tier(30 * DAY, raw_retention, 60, 1500) == '1h'
+    assert rollup.pick_tier(1000 * DAY, raw_retention, 60, 1500) == '1h'
+
+
+def test_long_gap_is_processed_in_windows(db_path, monkeypatch):
+    _insert(db_path, [(NOW - 3 * DAY + i * 600, 'office', float(i)) for i in range(3 * 24 * 6)])
+    windows = []
+    compute = rollup.compute_rollups
+    monkeypatch.setattr(rollup, 'compute_rollups',
+                        lambda tier, width, start, end, path=None: windows.append((tier, end - start)) or compute(tier, width, start, end, path))
+    rollup.run_rollups(NOW, db_path)
+
+    assert all(size <= rollup.ROLLUP_WINDOW for _, size in windows)
+    assert len([w for w in windows if w[0] == '1h']) >= 3
+    last = storage.query_one("SELECT last_bucket FROM rollup_state WHERE tier = '1h'", (), db_path)[0]
+    assert last == (NOW - rollup.LATE_ARRIVAL) // 3600 * 3600
+    assert _rollup(db_path, '1h', NOW - 2 * DAY)[0] == 6
+
+
+def test_late_batch_recomputes_closed_buckets(db_path):
+    bucket = NOW - 2 * 3600
+    _insert(db_path, [(bucket + 10, 'office', 10.0)])
+    rollup.run_rollups(NOW, db_path)
+    assert _rollup(db_path, '1h', bucket) == (1, 10.0, 10.0, 10.0)
+    assert _rollup(db_path, '1m', bucket) == (1, 10.0, 10.0, 10.0)
+
+    # batch จาก spool ของ probe มาถึงหลัง bucket ปิดแล้ว
+    aggregator.ingest_batch(_batch('late', [(bucket + 20, 30.0), (bucket + 1800, 50.0)]), db_path)
+    assert storage.query_one('SELECT COUNT(*) FROM rollup_dirty', (), db_path)[0] > 0
+
+    written = rollup.run_rollups(NOW + 60, db_path)
+    assert written['1h'] >= 1
+    assert _rollup(db_path, '1h', bucket) == (1, 10.0, 10.0, 10.0)
+    assert _rollup(db_path, '1h', bucket, 'probe-a') == (2, 30.0, 50.0, 40.0)
+    assert _rollup(db_path, '1m', bucket, 'probe-a') == (1, 30.0, 30.0, 30.0)
+    assert _rollup(db_path, '1m', bucket + 1800, 'probe-a') == (1, 50.0, 50.0, 50.0)
+    assert storage.query_one('SELECT COUNT(*) FROM rollup_dirty WHERE bucket < ?', (bucket + 3600,), db_path)[0] == 0
+
+
+def test_read_rollups_filters_by_probe(db_path):
+    bucket = NOW - 2 * 3600
+    _insert(db_path, [(bucket + 10, 'office', 10.0)])
+    aggregator.ingest_batch(_batch('a', [(bucket + 20, 30.0)]), db_path)
+    rollup.run_rollups(NOW, db_path)
+
+    df = rollup.read_rollups('1h', 'latency', bucket, path=db_path, probes=['probe-a'])
+    assert list(zip(df['probe_id'], df['avg'])) == [('probe-a', 30.0)]
+    df = rollup.read_rollups('1h', 'latency', bucket, path=db_path)
+    assert sorted(zip(df['probe_id'], df['avg'])) == [('', 10.0), ('probe-a', 30.0)]
+
+
+def test_marks_added_during_recompute_are_kept(db_path, monkeypatch):
+    bucket = NOW - 2 * 3600
+    _insert(db_path, [(bucket + 10, 'office', 10.0)])
+    rollup.run_rollups(NOW, db_path)
+    storage.execute_write("INSERT INTO rollup_dirty (tier, bucket, marks) VALUES ('1h', ?, 1)", (bucket,), db_path)
+
+    compute = rollup.compute_rollups
+
+    def _compute_then_mark(tier, width, start, end, path=None):
+        results = compute(tier, width, start, end, path)
+        # แถวใหม่เข้ามาหลังอ่านข้อมูลแต่ก่อนเขียนผล
+        with storage.transaction(path) as conn:
+            rollup.mark_dirty(conn, [bucket + 30], 0)
+        return results
+    monkeypatch.setattr(rollup, 'compute_rollups', _compute_then_mark)
+    rollup.recompute_dirty('1h', 3600, db_path)
+
+    assert storage.query_one("SELECT marks FROM rollup_dirty WHERE tier = '1h' AND bucket = ?", (bucket,), db_path) == (2,)
+
+
+def test_rows_older_than_retention_are_not_marked(db_path):
+    with storage.transaction(db_path) as conn:
+        assert rollup.mark_dirty(conn, [NOW - 10 * DAY, None, 'x'], NOW - 2 * DAY) == 0
+        assert rollup.mark_dirty(conn, [NOW - DAY], NOW - 2 * DAY) == len(rollup.TIERS)
+
+
+def test_migration_keeps_existing_rollups(tmp_path, monkeypatch):
+    path = str(tmp_path / 'old.db')
+    monkeypatch.setattr(migrations, 'MIGRATIONS', migrations.MIGRATIONS[:10])
+    storage.setup_database(path)
+    storage.execute_write("INSERT INTO network_rollups (tier, metric, ssid, bucket, n, min, max, avg, p95) "
+                          "VALUES ('1h', 'latency', 'office', ?, 2, 1.0, 3.0, 2.0, 3.0)", (NOW,), path)
+    monkeypatch.undo()
+    migrations.migrate(path)
+
+    assert _rollup(path, '1h', NOW) == (2, 1.0, 3.0, 2.0)
+    storage.close_connection(path)
@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+import scanners
+from scanners import ScanRecord
+
+SCANS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures', 'scans')
+
+
+def _fixture(name):
+    with open(os.path.join(SCANS, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def test_netsh_networks():
+    assert scanners.parse_netsh_networks(_fixture('netsh_networks.txt')) == [
+        ScanRecord('NUT', 'a4:2b:b0:7c:11:02', 92, '802.11ac', '36'),
+        ScanRecord('NUT', 'a4:2b:b0:7c:11:01', 71, '802.11n', '6'),
+        ScanRecord('@JumboPlus', '00:1a:2b:3c:4d:5e', 48, '802.11n', '11'),
+        ScanRecord('', '3c:84:6a:90:aa:10', 20, '802.11ax', '1'),
+    ]
+
+
+def test_netsh_interfaces():
+    assert scanners.parse_netsh_interfaces(_fixture('netsh_interfaces.txt')) == \
+        ScanRecord('NUT', 'a4:2b:b0:7c:11:02', 92, '802.11ac', '36')
+
+
+def test_netsh_ssid_with_spaces_and_colon():
+    text = ('SSID 1 : Cafe: Guest Wi-Fi \r\n'
+            '    BSSID 1                 : 11:22:33:44:55:66\r\n'
+            '         Signal             : 35%\r\n'
+            '         Channel            : 149\r\n')
+    assert scanners.parse_netsh_networks(text) == [
+        ScanRecord('Cafe: Guest Wi-Fi', '11:22:33:44:55:66', 35, 'unknown', '149')]
+
+
+def test_iw_scan():
+    assert scanners.parse_iw(_fixture('iw_scan.txt')) == [
+        ScanRecord('NUT', 'a4:2b:b0:7c:11:02', 92, '5180 MHz', '36'),
+        ScanRecord('NUT', 'a4:2b:b0:7c:11:01', 68, '2437 MHz', '6'),
+        ScanRecord('@JumboPlus', '00:1a:2b:3c:4d:5e', 48, '2462 MHz', '11'),
+        ScanRecord('', '3c:84:6a:90:aa:10', 20, '2412 MHz', '1'),
+    ]
+
+
+def test_iw_link():
+    assert scanners.parse_iw_link(_fixture('iw_link.txt')) == \
+        ScanRecord('NUT', 'a4:2b:b0:7c:11:02', 92, '5180 MHz', '36')
+    assert scanners.parse_iw_link('Not connected.\n') is None
+
+
+def test_iw_ssid_with_spaces_and_colon():
+    text = ('BSS 11:22:33:44:55:66(on wlan0)\n'
+            '\tfreq: 5745\n'
+            '\tsignal: -82.50 dBm\n'
+            '\tSSID: Cafe: Guest Wi-Fi\n')
+    assert scanners.parse_iw(text) == [ScanRecord('Cafe: Guest Wi-Fi', '11:22:33:44:55:66', 35, '5745 MHz', '149')]
+
+
+def test_nmcli():
+    records, connected = scanners.parse_nmcli(_fixture('nmcli_wifi.txt'))
+    assert records == [
+        ScanRecord('NUT', 'a4:2b:b0:7c:11:02', 92, '5180 MHz', '36'),
+        ScanRecord('NUT', 'a4:2b:b0:7c:11:01', 71, '2437 MHz', '6'),
+        ScanRecord('@JumboPlus', '00:1a:2b:3c:4d:5e', 48, '2462 MHz', '11'),
+        ScanRecord('', '3c:84:6a:90:aa:10', 20, '2412 MHz', '1'),
+        ScanRecord('Cafe: Guest', '11:22:33:44:55:66', 35, '5745 MHz', '149'),
+    ]
+    assert connected == records[0]
+
+
+@pytest.mark.parametrize('dbm, percent', [(-30, 100), (-50, 100), (-54, 92), (-66, 68), (-75.5, 49), (-100, 0), (-110, 0)])
+def test_dbm_to_percent(dbm, percent):
+    assert scanners.dbm_to_percent(dbm) == percent
+
+
+@pytest.mark.parametrize('freq, channel', [(2412, 1), (2484, 14), (5180, 36), (5745, 149), (5955, 1), (900, None)])
+def test_freq_to_channel(freq, channel):
+    assert scanners.freq_to_channel(freq) == channel
+
+
+def test_replay_scanner_cycles_files():
+    scanner = scanners.ReplayScanner('nmcli', [os.path.join(SCANS, 'nmcli_wifi.txt')])
+    assert len(scanner.scan()) == 5
+    assert len(scanner.scan()) == 5
+    assert scanner.current() is None
+    channels = scanners.group_by_channel(scanners.parse_nmcli(_fixture('nmcli_wifi.txt'))[0])
+    assert [n['BSSID'] for n in channels['36']] == ['a4:2b:b0:7c:11:02']
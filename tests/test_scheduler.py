@@ -0,0 +1,75 @@
+import random
+import threading
+import time
+
+import pytest
+
+from scheduler import Job, LaneScheduler
+
+
+def test_backoff_doubles_up_to_max():
+    job = Job('probe', lambda: None, interval=10, jitter=0, backoff_max=60)
+    rng = random.Random(0)
+    delays = []
+    for failures in range(1, 6):
+        job.failures = failures
+        delays.append(job.delay_after(False, rng))
+    assert delays == [10, 20, 40, 60, 60]
+    assert job.delay_after(True, rng) == 10
+
+
+def test_failing_job_backs_off():
+    ran = threading.Event()
+
+    def _fail():
+        ran.set()
+        raise RuntimeError('boom')
+
+    scheduler = LaneScheduler({'cheap': 1}, seed=1)
+    scheduler.every(100, _fail, name='flaky', jitter=0)
+    scheduler.start()
+    try:
+        assert ran.wait(5)
+        for _ in range(100):
+            status = scheduler.status()['flaky']
+            if status['next_in'] is not None:
+                break
+            time.sleep(0.01)
+    finally:
+        scheduler.stop()
+    assert status['failures'] == 1
+    assert status['last_error'] == 'boom'
+    assert status['next_in'] == pytest.approx(100, abs=1)
+
+
+def test_trigger_runs_early_and_respects_min_gap():
+    runs = []
+    ran = threading.Event()
+
+    def _test():
+        runs.append(1)
+        ran.set()
+
+    scheduler = LaneScheduler({'expensive': 1}, seed=1)
+    scheduler.every(3600, _test, name='throughput', lane='expensive', run_at_start=False, min_gap=600)
+    scheduler.start()
+    try:
+        assert scheduler.status()['throughput']['runs'] == 0
+        assert scheduler.trigger('throughput', reason='latency spike')
+        assert ran.wait(5)
+        for _ in range(100):
+            if scheduler.status()['throughput']['next_in'] is not None:
+                break
+            time.sleep(0.01)
+
+        # รอบถัดไปถูกเลื่อนมาได้ไม่เร็วกว่า min_gap หลังรอบที่แล้ว
+        assert scheduler.trigger('throughput', reason='again')
+        status = scheduler.status()['throughput']
+        assert status['next_in'] == pytest.approx(600, abs=1)
+        # ถ้ารอบถัดไปเร็วกว่านั้นอยู่แล้ว trigger ไม่เปลี่ยนอะไร
+        assert not scheduler.trigger('throughput')
+    finally:
+        scheduler.stop()
+    assert len(runs) == 1
+    assert status['runs'] == 1
+    assert status['triggered_runs'] == 1
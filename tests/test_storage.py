@@ -0,0 +1,22 @@
+import sqlite3
+
+import pytest
+
+import storage
+
+
+def test_failed_commit_rolls_back(db_path):
+    conn = storage.get_connection(db_path)
+    conn.execute('PRAGMA foreign_keys=ON')
+    conn.execute('CREATE TABLE parent (id INTEGER PRIMARY KEY)')
+    conn.execute('CREATE TABLE child (parent_id INTEGER REFERENCES parent (id) DEFERRABLE INITIALLY DEFERRED)')
+
+    # foreign key แบบ deferred ถูกตรวจตอน commit
+    with pytest.raises(sqlite3.IntegrityError):
+        with storage.transaction(db_path) as tx:
+            tx.execute('INSERT INTO child (parent_id) VALUES (1)')
+    assert not conn.in_transaction
+
+    storage.execute_write('INSERT INTO parent (id) VALUES (1)', (), db_path)
+    assert storage.query('SELECT * FROM child', (), db_path) == []
+    assert storage.query('SELECT id FROM parent', (), db_path) == [(1,)]
@@ -0,0 +1,29 @@
+from urllib.error import HTTPError
+
+import pytest
+
+import throughput
+from throughput import LocalThroughputServer
+
+
+def test_http_throughput_against_local_server():
+    with LocalThroughputServer() as server:
+        download, upload = throughput.http_throughput(server.url, download_bytes=2 * 1024 * 1024,
+                                                      upload_bytes=1024 * 1024, timeout=5)
+        assert server.requests == 2
+    assert download > 0
+    assert upload > 0
+
+
+def test_measure_throughput_uses_url():
+    with LocalThroughputServer() as server:
+        download, upload = throughput.measure_throughput(server.url + '/')
+        assert server._server.downloads == 1
+        assert server._server.uploads == 1
+    assert download > 0 and upload > 0
+
+
+def test_unknown_path_is_an_error():
+    with LocalThroughputServer() as server:
+        with pytest.raises(HTTPError):
+            throughput.http_throughput(server.url + '/missing', download_bytes=1024, upload_bytes=1024, timeout=5)
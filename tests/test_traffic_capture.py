@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+import traffic_capture
+from traffic_capture import TrafficAggregator, TrafficCapture
+
+pytest.importorskip('scapy')
+
+PCAP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures', 'pcap', 'syn_flood.pcap')
+
+
+def test_replay_pcap_counts():
+    summaries, packets = traffic_capture.replay_pcap(PCAP, interval=10)
+    assert packets == 1500
+    assert [s.packets for s in summaries] == [100, 100, 100, 1200]
+    assert [s.syn for s in summaries] == [0, 0, 0, 1200]
+    assert sum(s.bytes for s in summaries) == 3 * 5400 + 64800
+    assert summaries[-1].top_sources[0] == ('203.0.113.66', 400)
+
+
+def test_on_summary_runs_outside_lock_and_errors_do_not_escape():
+    calls = []
+
+    def _on_summary(summary):
+        calls.append(aggregator._lock.locked())
+        raise RuntimeError('database is locked')
+
+    aggregator = TrafficAggregator(interval=10, on_summary=_on_summary)
+    aggregator.add(100.0, 60, '10.0.0.1', syn=True)
+    aggregator.add(111.0, 60, '10.0.0.1')  # ปิดช่วงแรก on_summary โยน error แต่ add() ต้องไม่ล้ม
+    aggregator.add(112.0, 60, '10.0.0.2')
+    aggregator.flush()
+    assert calls == [False, False]
+    assert aggregator.total_packets == 3
+
+
+def test_capture_writes_summaries_on_writer_thread():
+    written = []
+    capture = TrafficCapture(interval=10, on_summary=written.append)
+    capture._writer.start()
+    for i in range(25):
+        capture.aggregator.add(1000.0 + i, 100, '10.0.0.1', syn=i % 2 == 0)
+    capture.stop()
+    assert [(s.ts, s.packets, s.syn) for s in written] == [(1000, 10, 5), (1010, 10, 5), (1020, 5, 3)]
@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.request import Request, urlopen
+
+# ขนาดข้อมูลที่ใช้วัดกับ HTTP target (ไบต์) และ timeout ต่อคำขอ (วินาที)
+HTTP_DOWNLOAD_BYTES = 25 * 1024 * 1024
+HTTP_UPLOAD_BYTES = 10 * 1024 * 1024
+HTTP_TIMEOUT = 30
+CHUNK = 64 * 1024
+
+# ถ้าตั้ง THROUGHPUT_URL (เช่น http://127.0.0.1:8088) จะวัดกับ HTTP server นั้นแทน speedtest.net
+THROUGHPUT_URL = os.environ.get('THROUGHPUT_URL')
+
+
+# วัดด้วย speedtest.net (ใช้แบนด์วิดธ์จริงของลิงก์มาก จึงรันใน lane งานหนักเท่านั้น) คืนค่า bps
+def speedtest_throughput():
+    import speedtest
+
+    st = speedtest.Speedtest(secure=True)
+    return st.download(), st.upload()
+
+
+# วัดกับ HTTP server ที่รองรับ GET /download?bytes=N และ POST /upload คืนค่า bps
+def http_throughput(base_url, download_bytes=HTTP_DOWNLOAD_BYTES, upload_bytes=HTTP_UPLOAD_BYTES, timeout=HTTP_TIMEOUT):
+    base_url = base_url.rstrip('/')
+
+    start = time.perf_counter()
+    received = 0
+    with urlopen(f'{base_url}/download?bytes={download_bytes}', timeout=timeout) as response:
+        while True:
+            chunk = response.read(CHUNK)
+            if not chunk:
+                break
+            received += len(chunk)
+    download = received * 8 / (time.perf_counter() - start)
+
+    payload = bytes(upload_bytes)
+    start = time.perf_counter()
+    request = Request(f'{base_url}/upload', data=payload, method='POST',
+                      headers={'Content-Type': 'application/octet-stream'})
+    with urlopen(request, timeout=timeout) as response:
+        response.read()
+    upload = upload_bytes * 8 / (time.perf_counter() - start)
+    return download, upload
+
+
+# วัด throughput ตาม target ที่ตั้งไว้ (error ถูกส่งต่อให้ scheduler ทำ backoff)
+def measure_throughput(url=None):
+    url = url or THROUGHPUT_URL
+    if url:
+        return http_throughput(url)
+    return speedtest_throughput()
+
+
+class _ThroughputHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if not self.path.startswith('/download'):
+            self.send_error(404)
+            return
+        size = HTTP_DOWNLOAD_BYTES
+        if 'bytes=' in self.path:
+            size = int(self.path.split('bytes=', 1)[1].split('&', 1)[0])
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(size))
+        self.end_headers()
+        block = bytes(CHUNK)
+        remaining = size
+        while remaining > 0:
+            self.wfile.write(block[:min(CHUNK, remaining)])
+            remaining -= CHUNK
+        self.server.downloads += 1
+
+    def do_POST(self):
+        if self.path != '/upload':
+            self.send_error(404)
+            return
+        remaining = int(self.headers.get('Content-Length', 0))
+        while remaining > 0:
+            chunk = self.rfile.read(min(CHUNK, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+        self.server.uploads += 1
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+# HTTP server ภายในเครื่องสำหรับเป็น target ของการวัด throughput ตอนทดสอบ (ไม่ใช้เน็ตจริง)
+class LocalThroughputServer:
+    def __init__(self, host='127.0.0.1', port=0):
+        self._server = ThreadingHTTPServer((host, port), _ThroughputHandler)
+        self._server.downloads = 0
+        self._server.uploads = 0
+        self.address = self._server.server_address
+        self.url = f'http://{self.address[0]}:{self.address[1]}'
+        self._thread = threading.Thread(target=self._server.serve_forever, name='throughput-server', daemon=True)
+
+    @property
+    def requests(self):
+        return self._server.downloads + self._server.uploads
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+
+# รัน server ค้างไว้ให้ collector ใช้เป็น target: python throughput.py [port]
+if __name__ == '__main__':
+    import sys
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8088
+    with LocalThroughputServer('0.0.0.0', port) as server:
+        print(f"Throughput stand-in server on {server.url} (set THROUGHPUT_URL to use it)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,299 @@
+import functools
+import html
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# เปิดด้วย WIFI_TRACE=1 หรือ enable() ตอนรัน เมื่อปิด span() คืน object ว่างตัวเดียวกันทุกครั้ง (ไม่จับเวลา ไม่จองหน่วยความจำ)
+ENABLED = os.environ.get('WIFI_TRACE') == '1'
+RING_SIZE = 5000            # span ล่าสุดที่เก็บไว้
+DEBUG_PORT = 8001           # หน้า /debug/timings ของ collector (เปิดเฉพาะ localhost)
+PROFILE_INTERVAL = 0.005    # วินาทีระหว่างการสุ่ม stack
+PROFILE_MAX_SECONDS = 60
+
+MAX_ATTR_LENGTH = 120       # ตัดค่า attribute (เช่นข้อความ SQL) ตอนแสดงผล
+
+_spans = deque(maxlen=RING_SIZE)
+_local = threading.local()
+_pid = os.getpid()
+
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+def clear():
+    _spans.clear()
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def end(self):
+        pass
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    __slots__ = ('name', 'attrs', 'start', 'duration', 'thread', 'depth', 'error')
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.thread = threading.get_ident()
+        stack = getattr(_local, 'depth', 0)
+        self.depth = stack
+        _local.depth = stack + 1
+        self.error = None
+        self.duration = None
+        self.start = time.perf_counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        self.end()
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def end(self):
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self.start
+        _local.depth = self.depth
+        _spans.append(self)
+
+
+# เปิด span: ใช้เป็น context manager หรือเรียก .end() เอง
+def span(name, **attrs):
+    if not ENABLED:
+        return _NOOP
+    return Span(name, attrs)
+
+
+# decorator วัดเวลาทั้งฟังก์ชัน (เช็ก ENABLED ทุกครั้งที่เรียก จึงเปิด/ปิดได้ตอนรัน)
+def traced(name=None):
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            with Span(span_name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ค่า attribute สำหรับแสดงผล (ยุบช่องว่างและตัดความยาว ทำตอนแสดงเท่านั้น ไม่ใช่ตอนบันทึก span)
+def _attr_text(value):
+    return ' '.join(str(value).split())[:MAX_ATTR_LENGTH]
+
+
+def recent(limit=None):
+    spans = list(_spans)
+    return spans[-limit:] if limit else spans
+
+
+# สรุปต่อชื่อ span: จำนวน, รวม, p50, p95, สูงสุด (วินาที)
+def summary(spans=None):
+    by_name = {}
+    for s in spans if spans is not None else recent():
+        by_name.setdefault(s.name, []).append(s.duration)
+    rows = []
+    for name, durations in by_name.items():
+        durations.sort()
+        n = len(durations)
+        rows.append({
+            'name': name,
+            'count': n,
+            'total': sum(durations),
+            'p50': durations[n // 2],
+            'p95': durations[min(n - 1, int(n * 0.95))],
+            'max': durations[-1],
+        })
+    rows.sort(key=lambda row: row['total'], reverse=True)
+    return rows
+
+
+# แปลง span เป็นรูปแบบ Chrome trace (เปิดใน chrome://tracing หรือ ui.perfetto.dev)
+def chrome_trace(spans=None):
+    events = []
+    for s in spans if spans is not None else recent():
+        event = {'name': s.name, 'ph': 'X', 'pid': _pid, 'tid': s.thread,
+                 'ts': round(s.start * 1e6, 1), 'dur': round(s.duration * 1e6, 1)}
+        args = {key: _attr_text(value) for key, value in s.attrs.items()}
+        if s.error:
+            args['error'] = s.error
+        if args:
+            event['args'] = args
+        events.append(event)
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def export_chrome_trace(path, spans=None):
+    with open(path, 'w') as f:
+        json.dump(chrome_trace(spans), f)
+    return path
+
+
+# หน้า HTML สรุปเวลา (ตารางต่อชื่อ span และ span ล่าสุด)
+def timings_page(limit=50):
+    spans = recent()
+    lines = [
+        '<html><head><title>Timings</title><style>body{font-family:monospace}td,th{padding:2px 8px;text-align:right}'
+        'td:first-child,th:first-child{text-align:left}</style></head><body>',
+        f"<h3>Tracing {'enabled' if ENABLED else 'disabled'} ({len(spans)} spans in ring)</h3>",
+        '<p><a href="?on=1">enable</a> | <a href="?on=0">disable</a> | <a href="?clear=1">clear</a> | '
+        '<a href="trace.json">Chrome trace</a> | <a href="profile?seconds=10">profile 10 s</a></p>',
+        '<table><tr><th>span</th><th>count</th><th>total ms</th><th>p50 ms</th><th>p95 ms</th><th>max ms</th></tr>',
+    ]
+    for row in summary(spans):
+        lines.append(f"<tr><td>{html.escape(row['name'])}</td><td>{row['count']}</td><td>{row['total'] * 1000:.1f}</td>"
+                     f"<td>{row['p50'] * 1000:.2f}</td><td>{row['p95'] * 1000:.2f}</td><td>{row['max'] * 1000:.2f}</td></tr>")
+    lines.append('</table><h4>Recent spans</h4><table><tr><th>span</th><th>ms</th><th>thread</th><th>attrs</th></tr>')
+    for s in reversed(spans[-limit:]):
+        attrs = ', '.join(f'{key}={_attr_text(value)}' for key, value in s.attrs.items())
+        if s.error:
+            attrs += f' error={s.error}'
+        lines.append(f"<tr><td>{'&nbsp;' * 2 * s.depth}{html.escape(s.name)}</td><td>{s.duration * 1000:.2f}</td>"
+                     f"<td>{s.thread}</td><td>{html.escape(attrs)}</td></tr>")
+    lines.append('</table></body></html>')
+    return '\n'.join(lines)
+
+
+# จัดการ query string ของหน้า timings (เปิด/ปิด/ล้าง)
+def apply_controls(params):
+    if params.get('on') == '1':
+        enable()
+    elif params.get('on') == '0':
+        disable()
+    if params.get('clear') == '1':
+        clear()
+
+
+# sampling profiler: สุ่ม stack ของทุก thread ทุก interval วินาที แล้วนับเป็น folded stack
+# (รูปแบบเดียวกับ flamegraph.pl / speedscope) ไม่ต้อง trace ทุกการเรียกฟังก์ชัน
+class SamplingProfiler:
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self):
+        return '\n'.join(f'{stack} {count}' for stack, count in self.stacks.most_common())
+
+    # ฟังก์ชันที่อยู่บนสุดของ stack บ่อยที่สุด (เวลาที่ใช้เองไม่รวมฟังก์ชันที่เรียกต่อ)
+    def top(self, limit=20):
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return leaves.most_common(limit)
+
+
+_profile_lock = threading.Lock()
+
+
+# profile ทั้ง process เป็นเวลา seconds วินาที คืนค่าข้อความสรุป + folded stacks (ทีละหนึ่งคำขอ)
+def profile(seconds):
+    seconds = max(0.1, min(float(seconds), PROFILE_MAX_SECONDS))
+    if not _profile_lock.acquire(blocking=False):
+        return 'profiler already running\n'
+    try:
+        profiler = SamplingProfiler().start()
+        time.sleep(seconds)
+        profiler.stop()
+    finally:
+        _profile_lock.release()
+    header = [f'# {profiler.samples} samples over {seconds:.1f}s', '# top self time:']
+    header.extend(f'#   {count:6d}  {frame}' for frame, count in profiler.top())
+    return '\n'.join(header) + '\n' + profiler.folded() + '\n'
+
+
+class _DebugHandler(BaseHTTPRequestHandler):
+    def _reply(self, body, content_type):
+        body = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if url.path == '/debug/timings':
+            apply_controls(params)
+            self._reply(timings_page(), 'text/html; charset=utf-8')
+        elif url.path == '/debug/trace.json':
+            self._reply(json.dumps(chrome_trace()), 'application/json')
+        elif url.path == '/debug/profile':
+            self._reply(profile(params.get('seconds', 10)), 'text/plain; charset=utf-8')
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# เปิดหน้า debug ของ process ที่ไม่มี web server ของตัวเอง (เช่น collector)
+def serve_debug(port=DEBUG_PORT, host='127.0.0.1'):
+    server = ThreadingHTTPServer((host, port), _DebugHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='debug-http', daemon=True).start()
+    return server
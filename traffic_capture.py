@@ -0,0 +1,433 @@
+import argparse
+import json
+import math
+import queue
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import deque, namedtuple
+
+import storage
+
+CAPTURE_INTERVAL = 10     # วินาทีต่อหนึ่งแถวสรุป
+CAPTURE_FILTER = 'ip or ip6'
+SKETCH_WIDTH = 2048       # ขนาดของ count-min sketch (หน่วยความจำคงที่ width x depth)
+SKETCH_DEPTH = 4
+SUMMARY_QUEUE_SIZE = 100  # สรุปที่รอเขียนได้สูงสุด (ถ้าเต็มจะทิ้ง ไม่ให้ sniffer ค้าง)
+TOP_SOURCES = 10          # จำนวน source IP ที่เก็บเป็น heavy hitter
+DISTINCT_BITS = 1 << 14   # bitmap สำหรับประมาณจำนวน source ที่ไม่ซ้ำ (linear counting)
+
+_PRIME = (1 << 61) - 1
+
+# สรุปหนึ่งช่วงเวลา (ts = วินาทีเริ่มช่วง, peak_* = วินาทีที่สูงสุดในช่วง)
+TrafficSummary = namedtuple('TrafficSummary', [
+    'ts', 'interval', 'packets', 'bytes', 'syn', 'peak_pps', 'peak_bps', 'distinct_sources', 'top_sources'])
+
+
+# แปลง IP เป็นจำนวนเต็ม 64 บิตสำหรับ hash
+def ip_key(ip):
+    family = socket.AF_INET6 if ':' in ip else socket.AF_INET
+    value = int.from_bytes(socket.inet_pton(family, ip), 'big')
+    return (value ^ (value >> 64)) & 0xFFFFFFFFFFFFFFFF
+
+
+# count-min sketch: ประมาณจำนวนครั้งของแต่ละ key ในหน่วยความจำคงที่ (ค่าประมาณไม่ต่ำกว่าค่าจริง)
+class CountMinSketch:
+    def __init__(self, width=SKETCH_WIDTH, depth=SKETCH_DEPTH, seed=1):
+        rng = random.Random(seed)
+        self.width = width
+        self.depth = depth
+        # list ของ int ธรรมดาเร็วกว่า numpy เมื่ออัปเดตทีละช่อง
+        self.table = [[0] * width for _ in range(depth)]
+        self._hashes = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(depth)]
+
+    def _columns(self, key):
+        return [((a * key + b) % _PRIME) % self.width for a, b in self._hashes]
+
+    # เพิ่มค่าแล้วคืนค่าประมาณใหม่ของ key นั้น
+    def add(self, key, count=1):
+        estimate = None
+        for row, (a, b) in zip(self.table, self._hashes):
+            column = ((a * key + b) % _PRIME) % self.width
+            value = row[column] = row[column] + count
+            if estimate is None or value < estimate:
+                estimate = value
+        return estimate
+
+    def estimate(self, key):
+        return min(row[column] for row, column in zip(self.table, self._columns(key)))
+
+    def clear(self):
+        self.table = [[0] * self.width for _ in range(self.depth)]
+
+
+# เก็บ source ที่ส่งแพ็กเก็ตมากที่สุด k ตัวโดยใช้ค่าประมาณจาก sketch (หน่วยความจำ O(k))
+class HeavyHitters:
+    def __init__(self, k=TOP_SOURCES):
+        self.k = k
+        self.counts = {}
+        self._floor = 0
+
+    def offer(self, item, estimate):
+        if item in self.counts:
+            self.counts[item] = estimate
+        elif len(self.counts) < self.k:
+            self.counts[item] = estimate
+            self._floor = min(self.counts.values())
+        elif estimate > self._floor:
+            del self.counts[min(self.counts, key=self.counts.get)]
+            self.counts[item] = estimate
+            self._floor = min(self.counts.values())
+
+    def top(self):
+        return sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+
+    def clear(self):
+        self.counts.clear()
+        self._floor = 0
+
+
+# ประมาณจำนวน key ที่ไม่ซ้ำด้วย bitmap ขนาดคงที่ (linear counting)
+class DistinctCounter:
+    def __init__(self, bits=DISTINCT_BITS):
+        self.bits = bits
+        self.bitmap = bytearray(bits)
+        self.zeros = bits
+
+    def add(self, key):
+        index = (key * 0x9E3779B97F4A7C15 & 0xFFFFFFFFFFFFFFFF) % self.bits
+        if not self.bitmap[index]:
+            self.bitmap[index] = 1
+            self.zeros -= 1
+
+    def estimate(self):
+        if self.zeros == 0:
+            return self.bits  # bitmap เต็ม ค่าจริงมากกว่านี้
+        return int(round(self.bits * math.log(self.bits / self.zeros)))
+
+    def clear(self):
+        self.bitmap = bytearray(self.bits)
+        self.zeros = self.bits
+
+
+# รวมแพ็กเก็ตเป็นสรุปต่อช่วงเวลา ไม่เก็บตัวแพ็กเก็ต ใช้หน่วยความจำคงที่ไม่ขึ้นกับอัตราแพ็กเก็ต
+# on_summary ถูกเรียกทุกครั้งที่ปิดช่วงเวลา (เวลาอ้างอิงจาก timestamp ของแพ็กเก็ต จึงใช้กับ pcap ได้)
+# on_summary ถูกเรียกนอก lock และ error ของมันไม่หลุดออกไปถึงผู้เรียก add() (thread ของ sniffer)
+class TrafficAggregator:
+    def __init__(self, interval=CAPTURE_INTERVAL, on_summary=None, top_n=TOP_SOURCES):
+        self.interval = interval
+        self.on_summary = on_summary
+        self.sketch = CountMinSketch()
+        self.hitters = HeavyHitters(top_n)
+        self.distinct = DistinctCounter()
+        self._lock = threading.Lock()
+        self._window = None   # เวลาเริ่มของช่วงปัจจุบัน
+        self._second = None   # วินาทีปัจจุบัน
+        self._ready = deque()  # สรุปที่ปิดแล้ว รอส่งให้ on_summary หลังปล่อย lock
+        self._reset_window()
+        self.total_packets = 0
+
+    def _reset_window(self):
+        self.packets = self.bytes = self.syn = 0
+        self.peak_pps = self.peak_bps = 0
+        self._second_packets = self._second_bytes = 0
+        self.sketch.clear()
+        self.hitters.clear()
+        self.distinct.clear()
+
+    def _close_second(self):
+        self.peak_pps = max(self.peak_pps, self._second_packets)
+        self.peak_bps = max(self.peak_bps, self._second_bytes * 8)
+        self._second_packets = self._second_bytes = 0
+
+    def _close_window(self):
+        self._close_second()
+        summary = TrafficSummary(self._window, self.interval, self.packets, self.bytes, self.syn,
+                                 self.peak_pps, self.peak_bps, self.distinct.estimate(), self.hitters.top())
+        self._reset_window()
+        if self.on_summary is not None:
+            self._ready.append(summary)
+        return summary
+
+    # ส่งสรุปที่ค้างให้ on_summary (เรียกหลังปล่อย lock แล้วเท่านั้น)
+    def _deliver(self):
+        while self._ready:
+            try:
+                summary = self._ready.popleft()
+            except IndexError:
+                return  # thread อื่นส่งไปแล้ว
+            try:
+                self.on_summary(summary)
+            except Exception as e:
+                print(f"Traffic summary error: {e}")
+
+    # ปิดช่วงเวลาที่จบไปแล้วจนถึง now (ใช้ตอน live capture ที่ไม่มีแพ็กเก็ตเข้ามา)
+    def advance(self, now):
+        with self._lock:
+            self._advance(int(now))
+        if self._ready:
+            self._deliver()
+
+    def _advance(self, second):
+        if self._window is None:
+            self._window = second - second % self.interval
+            self._second = second
+            return
+        if second != self._second:
+            self._close_second()
+            self._second = second
+        window = second - second % self.interval
+        if window > self._window:
+            # ช่วงที่ไม่มีแพ็กเก็ตเลยไม่ต้องเขียนแถว
+            if self.packets:
+                self._close_window()
+            self._window = window
+
+    # เพิ่มหนึ่งแพ็กเก็ต (เวลาเป็น epoch วินาที, src เป็นข้อความ IP หรือ None)
+    def add(self, when, length, src=None, syn=False):
+        with self._lock:
+            self._advance(int(when))
+            self.packets += 1
+            self.bytes += length
+            self._second_packets += 1
+            self._second_bytes += length
+            self.total_packets += 1
+            if syn:
+                self.syn += 1
+            if src is not None:
+                key = ip_key(src)
+                self.hitters.offer(src, self.sketch.add(key))
+                self.distinct.add(key)
+        if self._ready:
+            self._deliver()
+
+    def add_packet(self, pkt):
+        features = packet_features(pkt)
+        if features is not None:
+            self.add(*features)
+
+    # ปิดช่วงที่ค้างอยู่ (ตอนจบ pcap หรือหยุด capture)
+    def flush(self):
+        summary = None
+        with self._lock:
+            if self._window is not None and self.packets:
+                summary = self._close_window()
+        self._deliver()
+        return summary
+
+
+# ดึงข้อมูลที่ต้องใช้จากแพ็กเก็ต scapy: (เวลา, ขนาด, source IP, เป็น SYN ที่ไม่มี ACK หรือไม่)
+def packet_features(pkt):
+    from scapy.layers.inet import IP, TCP
+    from scapy.layers.inet6 import IPv6
+
+    if IP in pkt:
+        src = pkt[IP].src
+    elif IPv6 in pkt:
+        src = pkt[IPv6].src
+    else:
+        return None
+    syn = False
+    if TCP in pkt:
+        flags = int(pkt[TCP].flags)
+        syn = bool(flags & 0x02) and not flags & 0x10
+    return float(pkt.time), len(pkt), src, syn
+
+
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+_ETH_VLAN = (0x8100, 0x88A8)
+
+
+# parse header จาก bytes โดยตรง (ไม่ผ่าน dissector ของ scapy) สำหรับอ่าน pcap ให้เร็ว
+# คืนค่า (ขนาด, source IP, SYN) หรือ None ถ้าไม่ใช่ IP
+def raw_features(data, linktype=LINKTYPE_ETHERNET):
+    if linktype == LINKTYPE_ETHERNET:
+        offset = 14
+        if len(data) < offset:
+            return None
+        ethertype = struct.unpack_from('!H', data, 12)[0]
+        while ethertype in _ETH_VLAN and len(data) >= offset + 4:
+            ethertype = struct.unpack_from('!H', data, offset + 2)[0]
+            offset += 4
+    elif linktype == LINKTYPE_LINUX_SLL:
+        offset = 16
+        if len(data) < offset:
+            return None
+        ethertype = struct.unpack_from('!H', data, 14)[0]
+    elif linktype == LINKTYPE_RAW:
+        offset = 0
+        ethertype = 0x0800 if data and data[0] >> 4 == 4 else 0x86DD
+    else:
+        return None
+
+    if ethertype == 0x0800 and len(data) >= offset + 20:
+        header_len = (data[offset] & 0x0F) * 4
+        protocol = data[offset + 9]
+        src = socket.inet_ntoa(data[offset + 12:offset + 16])
+        transport = offset + header_len
+    elif ethertype == 0x86DD and len(data) >= offset + 40:
+        protocol = data[offset + 6]
+        src = socket.inet_ntop(socket.AF_INET6, data[offset + 8:offset + 24])
+        transport = offset + 40
+    else:
+        return None
+
+    syn = False
+    if protocol == 6 and len(data) >= transport + 14:
+        flags = data[transport + 13]
+        syn = bool(flags & 0x02) and not flags & 0x10
+    return len(data), src, syn
+
+
+INSERT_SUMMARY_SQL = '''
+    INSERT INTO traffic_summaries (ts, interval, packets, bytes, syn, peak_pps, peak_bps, distinct_sources, top_sources)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def summary_row(summary):
+    return (summary.ts, summary.interval, summary.packets, summary.bytes, summary.syn, summary.peak_pps,
+            summary.peak_bps, summary.distinct_sources, json.dumps(summary.top_sources))
+
+
+# บันทึกสรุปหนึ่งช่วงลงตาราง traffic_summaries
+def save_summary(summary, path=None):
+    storage.execute_write(INSERT_SUMMARY_SQL, summary_row(summary), path)
+
+
+# อ่านไฟล์ pcap แบบ streaming (ไม่โหลดทั้งไฟล์เข้าหน่วยความจำ) คืนค่ารายการสรุปและจำนวนแพ็กเก็ต
+# ใช้ RawPcapReader + raw_features แทนการ dissect ทุกแพ็กเก็ตด้วย scapy
+def replay_pcap(path, interval=CAPTURE_INTERVAL, on_summary=None):
+    from scapy.utils import RawPcapReader
+
+    summaries = []
+
+    def _collect(summary):
+        summaries.append(summary)
+        if on_summary is not None:
+            on_summary(summary)
+
+    aggregator = TrafficAggregator(interval, _collect)
+    with RawPcapReader(path) as reader:
+        linktype = reader.linktype
+        for data, meta in reader:
+            features = raw_features(data, linktype)
+            if features is None:
+                continue
+            if hasattr(meta, 'sec'):
+                when = meta.sec + meta.usec / 1e6
+            else:  # pcapng
+                when = ((meta.tshigh << 32) | meta.tslow) / meta.tsresol
+            aggregator.add(when, *features)
+    aggregator.flush()
+    return summaries, aggregator.total_packets
+
+
+# capture สดใน thread พื้นหลังด้วย AsyncSniffer (store=False จึงไม่เก็บแพ็กเก็ต)
+# on_summary (ค่าเริ่มต้นเขียนฐานข้อมูล) รันใน thread writer แยก thread ของ sniffer จึงไม่ต้องรอ I/O
+class TrafficCapture:
+    def __init__(self, interval=CAPTURE_INTERVAL, on_summary=save_summary, iface=None, bpf_filter=CAPTURE_FILTER):
+        self.on_summary = on_summary
+        self.aggregator = TrafficAggregator(interval, self._enqueue)
+        self.iface = iface
+        self.bpf_filter = bpf_filter
+        self._sniffer = None
+        self._stop = threading.Event()
+        self._summaries = queue.Queue(maxsize=SUMMARY_QUEUE_SIZE)
+        self._ticker = threading.Thread(target=self._tick, name='traffic-tick', daemon=True)
+        self._writer = threading.Thread(target=self._write, name='traffic-writer', daemon=True)
+
+    def _enqueue(self, summary):
+        try:
+            self._summaries.put_nowait(summary)
+        except queue.Full:
+            print("Traffic summary queue full, dropping summary")
+
+    # ส่งสรุปให้ on_summary ทีละรายการจนได้ None
+    def _write(self):
+        while True:
+            summary = self._summaries.get()
+            if summary is None:
+                return
+            try:
+                self.on_summary(summary)
+            except Exception as e:
+                print(f"Traffic summary error: {e}")
+
+    # ปิดช่วงเวลาตามนาฬิกาแม้ไม่มีแพ็กเก็ต
+    def _tick(self):
+        while not self._stop.wait(1.0):
+            try:
+                self.aggregator.advance(time.time())
+            except Exception as e:
+                print(f"Traffic summary error: {e}")
+
+    def start(self):
+        from scapy.all import AsyncSniffer
+
+        self._sniffer = AsyncSniffer(iface=self.iface, filter=self.bpf_filter, prn=self.aggregator.add_packet, store=False)
+        self._writer.start()
+        self._sniffer.start()
+        self._ticker.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._sniffer is not None and self._sniffer.running:
+            self._sniffer.stop()
+        self.aggregator.flush()
+        if self._writer.is_alive():
+            self._summaries.put(None)
+            self._writer.join()
+
+
+def format_summary(summary):
+    top = ', '.join(f"{ip}={count}" for ip, count in summary.top_sources[:3])
+    return (f"{time.strftime('%H:%M:%S', time.localtime(summary.ts))} "
+            f"{summary.packets / summary.interval:,.0f} pps, {summary.bytes * 8 / summary.interval / 1e6:.2f} Mbps, "
+            f"peak {summary.peak_pps:,} pps, SYN {summary.syn:,}, sources ~{summary.distinct_sources:,} [{top}]")
+
+
+# python traffic_capture.py --pcap capture.pcap [--interval 10] [--save]
+# python traffic_capture.py --iface wlan0 --seconds 60
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Aggregate packet-level traffic features')
+    parser.add_argument('--pcap', help='read packets from a pcap file instead of capturing')
+    parser.add_argument('--iface', help='interface to capture on (default: scapy default)')
+    parser.add_argument('--seconds', type=float, default=60, help='live capture duration')
+    parser.add_argument('--interval', type=int, default=CAPTURE_INTERVAL)
+    parser.add_argument('--save', action='store_true', help='write summaries to traffic_summaries')
+    args = parser.parse_args(argv)
+
+    if args.save:
+        storage.setup_database()
+
+    def _emit(summary):
+        print(format_summary(summary))
+        if args.save:
+            save_summary(summary)
+
+    if args.pcap:
+        start = time.perf_counter()
+        summaries, packets = replay_pcap(args.pcap, args.interval, _emit)
+        elapsed = time.perf_counter() - start
+        print(f"{packets:,} packets, {len(summaries)} summaries in {elapsed:.2f}s ({packets / elapsed:,.0f} packets/s)")
+        return 0
+
+    capture = TrafficCapture(args.interval, _emit, args.iface)
+    capture.start()
+    try:
+        time.sleep(args.seconds)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        capture.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())